@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# 比較 apply_translation 的兩種實作：
+#   before: bytearray 原地修改，推移模式每次複製整段尾端 (O(n·k))
+#   after : translate_nro.apply_patches 一次往前組出新內容 (O(n + k))
+#
+# 用法: python benchmarks/bench_apply_translation.py [MB] [patch 數]
+
+import os
+import sys
+import time
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import translate_nro
+
+
+def legacy_apply(data, patches, mode):
+    """舊版演算法（以 patch 清單改寫，方便比對結果）"""
+    data = bytearray(data)
+    shift = 0
+    for offset, old_len, new_bytes in patches:
+        offset += shift
+        if len(new_bytes) > old_len:
+            if mode == "truncate":
+                new_bytes = new_bytes[:old_len]
+                data[offset:offset + len(new_bytes)] = new_bytes
+                continue
+            diff = len(new_bytes) - old_len
+            data[offset + old_len:] = b"\x00" * diff + data[offset + old_len:]
+            data[offset:offset + len(new_bytes)] = new_bytes
+            shift += diff
+            continue
+        if len(new_bytes) < old_len:
+            new_bytes += b"\x00" * (old_len - len(new_bytes))
+        data[offset:offset + len(new_bytes)] = new_bytes
+    return bytes(data)
+
+
+def make_case(size, n_patches, seed=0):
+    rng = random.Random(seed)
+    data = rng.randbytes(size)
+    offsets = sorted(rng.sample(range(0, size - 64, 64), n_patches))
+    patches = []
+    for offset in offsets:
+        old_len = rng.randint(4, 32)
+        new_len = rng.randint(1, 48)  # 約一半比原文長
+        patches.append((offset, old_len, bytes(rng.randint(0x41, 0x5A) for _ in range(new_len))))
+    return data, patches
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(size_mb=8, n_patches=5000):
+    data, patches = make_case(size_mb * 1024 * 1024, n_patches)
+    devnull = open(os.devnull, "w")
+    stdout, sys.stdout = sys.stdout, devnull  # 關掉超長警告輸出
+    try:
+        rows = []
+        for mode in ("truncate", "shift"):
+            before, expected = timed(legacy_apply, data, patches, mode)
+            after, result = timed(translate_nro.apply_patches, data, patches, mode)
+            rows.append((mode, before, after, expected == result))
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+    for mode, before, after, same in rows:
+        print(f"{mode:<9} {size_mb} MB {n_patches} patches  "
+              f"before {before * 1000:9.1f} ms  after {after * 1000:7.1f} ms  "
+              f"x{before / after:6.1f}  {'OK' if same else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
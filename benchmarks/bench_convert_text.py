@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# 比較文字檔繁化方式（以大型 zh-Hans 風格 JSON 為例）：
+#   legacy  : 舊版逐行處理（每行定義 replace_url、未編譯的 re.sub、整行查 dict_string 或送一次請求）
+#   per-line: 逐行找中文片段，缺少的片段合併批次送出
+#   file    : convert_text，整個檔案只掃描一次
+# 轉換器為本機 zhconvert_stub；cold 為空快取，warm 為快取已有全部內容。
+#
+# 用法: python benchmarks/bench_convert_text.py [行數]
+
+import io
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from zhconvert_stub import start_stub_server
+from synthetic import make_locale_json
+
+
+def legacy(text, dict_string, dict_url, convert):
+    new_lines = []
+    for line in io.StringIO(text, newline="").readlines():
+        def replace_url(m):
+            url = m.group(0)
+            if url not in dict_url:
+                dict_url[url] = url
+            return dict_url[url]
+        line = re.sub(r"https://dl\.awa\.cool/[^\s\"']+", replace_url, line)
+        if re.search(r"[一-龥]", line) is not None:
+            if line in dict_string:
+                new_line = dict_string[line]
+            else:
+                new_line = convert([line])[0]
+                dict_string[line] = new_line
+            new_lines.append(new_line)
+        else:
+            new_lines.append(line)
+    return "".join(new_lines)
+
+
+def per_line(text, spans, dict_url, convert):
+    from conversion_cache import iter_spans, apply_spans
+    new_lines = []
+    for line in io.StringIO(text, newline="").readlines():
+        def replace_url(m):
+            url = m.group(0)
+            if url not in dict_url:
+                dict_url[url] = url
+            return dict_url[url]
+        line = re.sub(r"https://dl\.awa\.cool/[^\s\"']+", replace_url, line)
+        new_lines.append(line)
+    found = [m.group() for line in new_lines for m in iter_spans(line)]
+    missing = list(dict.fromkeys(span for span in found if span not in spans))
+    if missing:
+        spans.update(zip(missing, convert(missing)))
+    return "".join(apply_spans(line, spans) if re.search(r"[一-龥]", line) else line
+                   for line in new_lines)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main(n_lines):
+    server, url = start_stub_server()
+    os.environ["ZHCONVERT_URL"] = url
+    os.environ["ZHCONVERT_MODE"] = "remote"   # 比較的是請求方式，不使用本機轉換
+    import zhconvert_client
+    import translate_plugins
+
+    def client():
+        c = zhconvert_client.ZhConvertClient(url=url, rate=1e9, burst=1e9)
+        return c
+
+    text = make_locale_json(n_lines)
+    print(f"fixture: {n_lines} 行, {len(text.encode('utf8')) / 1e6:.2f} MB")
+
+    results = {}
+    for mode in ("cold", "warm"):
+        # legacy：每行一次請求（不含原本的 sleep(1)）
+        legacy_client = client()
+        legacy_cache = {}
+        if mode == "warm":
+            legacy(text, legacy_cache, {}, legacy_client.convert_many)
+        before = legacy_client.stats["requests"]
+        t_legacy, _ = timed(legacy, text, legacy_cache, {}, legacy_client.convert_many)
+        r_legacy = legacy_client.stats["requests"] - before
+
+        line_client = client()
+        line_spans = {}
+        if mode == "warm":
+            per_line(text, line_spans, {}, line_client.convert_many)
+        before = line_client.stats["requests"]
+        t_line, out_line = timed(per_line, text, line_spans, {}, line_client.convert_many)
+        r_line = line_client.stats["requests"] - before
+
+        file_client = client()
+        zhconvert_client._clients["Taiwan"] = file_client
+        file_spans = {}
+        result = {"spans": {}, "urls": {}, "hits": 0, "misses": 0}
+        if mode == "warm":
+            translate_plugins.convert_text(text, file_spans, {}, dict(result, spans={}, urls={}))
+        before = file_client.stats["requests"]
+        t_file, out_file = timed(translate_plugins.convert_text, text, file_spans, {}, result)
+        r_file = file_client.stats["requests"] - before
+
+        assert out_file == out_line, "file 與 per-line 結果不同"
+        print(f"{mode}: legacy {t_legacy:8.1f} ms ({r_legacy} 請求)  "
+              f"per-line {t_line:7.1f} ms ({r_line} 請求)  "
+              f"file {t_file:7.1f} ms ({r_file} 請求)  "
+              f"→ {t_legacy / t_file:.1f}× / {t_line / t_file:.1f}×")
+        results[mode] = (t_legacy, t_line, t_file)
+    server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# 比較字典套用方式：
+#   before      : merge_dictionary（逐字串查 dict，只有完全符合）
+#   naive substr: 逐字串 × 逐詞條 `in` 檢查（片段比對的直觀寫法）
+#   matcher     : DictMatcher（雜湊索引 + Aho–Corasick，一次掃描）
+# 並比較編譯字典與讀取磁碟快取的時間。
+#
+# 用法: python benchmarks/bench_dict_matcher.py [NRO/OVL 或含 NRO 的 ZIP ...]
+
+import os
+import sys
+import glob
+import time
+import shutil
+import zipfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import translate_nro
+from dict_matcher import DictMatcher, load_matcher
+from synthetic import make_binary
+
+
+def naive_substring(strings, dictionary):
+    merged = strings.copy()
+    keys = [k for k in dictionary if len(k) >= 2 and not k.isascii()]
+    for offset, text in strings.items():
+        if text in dictionary:
+            merged[offset] = dictionary[text]
+            continue
+        for key in keys:
+            if key in text:
+                merged[offset] = merged[offset].replace(key, dictionary[key])
+    return merged
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def cases(paths):
+    os.chdir(ROOT)
+    for path in paths:
+        if path.endswith(".zip"):
+            with zipfile.ZipFile(path) as z:
+                for name in z.namelist():
+                    if name.lower().endswith((".nro", ".ovl")):
+                        base = os.path.splitext(os.path.basename(name))[0]
+                        dictionary = translate_nro.get_dict(base)
+                        if dictionary:
+                            yield base, z.read(name), dictionary
+        else:
+            base = os.path.splitext(os.path.basename(path))[0]
+            with open(path, "rb") as f:
+                yield base, f.read(), translate_nro.get_dict(base)
+    data, dictionary = make_binary(8 * 1024 * 1024, 10000)
+    yield "synthetic", data, dictionary
+
+
+def main(paths):
+    cache_folder = tempfile.mkdtemp()
+    try:
+        for base, data, dictionary in cases(paths):
+            lengths = {}
+            strings = translate_nro.extract_strings_from_bytes(data, lengths)
+            t_exact, exact = timed(translate_nro.merge_dictionary, strings, dictionary)
+            t_naive, naive = timed(naive_substring, strings, dictionary)
+            t_build, matcher = timed(DictMatcher, dictionary)
+            t_apply, merged = timed(matcher.apply, data, strings, lengths)
+            exact_hits = sum(1 for o in strings if exact[o] != strings[o])
+            hits = sum(1 for o in strings if merged[o] != strings[o])
+            naive_hits = sum(1 for o in strings if naive[o] != strings[o])
+            print(f"{base:<18} {len(strings):6} 字串 {len(dictionary):4} 詞條  "
+                  f"exact {t_exact:7.1f} ms ({exact_hits} 命中)  "
+                  f"naive substr {t_naive:8.1f} ms ({naive_hits})  "
+                  f"matcher {t_apply:7.1f} ms ({hits})  build {t_build:6.1f} ms")
+        # 磁碟快取
+        dict_path = os.path.join(ROOT, "dict", "EdiZon.json")
+        if os.path.exists(dict_path):
+            t_cold, _ = timed(load_matcher, dict_path, cache_folder)
+            t_warm, _ = timed(load_matcher, dict_path, cache_folder)
+            print(f"load_matcher EdiZon.json  cold {t_cold:.1f} ms  cached {t_warm:.1f} ms")
+    finally:
+        shutil.rmtree(cache_folder)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or sorted(glob.glob(os.path.join(ROOT, "Hans", "hahappify", "nro", "*.zip"))))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# 比較每個 NRO 的翻譯成本：
+#   before: subprocess.run(["python", "translate_nro.py", path])
+#   after : translate_nro.translate_binary(data, dictionary)
+#
+# 用法: python benchmarks/bench_translate_nro.py [次數]
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import translate_nro
+from synthetic import make_binary
+
+
+def bench_subprocess(data, dictionary, rounds):
+    work = tempfile.mkdtemp()
+    try:
+        # 直接執行 ROOT 下的 translate_nro.py（ROOT 因此在 sys.path 上，可匯入 dict_matcher 等模組），
+        # 工作目錄為暫存資料夾，讀寫其中的 dict/ 與 translation/
+        os.makedirs(os.path.join(work, "dict"))
+        with open(os.path.join(work, "dict", "bench.json"), "w", encoding="utf-8") as f:
+            json.dump(dictionary, f, ensure_ascii=False, indent=2)
+        path = os.path.join(work, "bench.nro")
+        start = time.perf_counter()
+        for _ in range(rounds):
+            with open(path, "wb") as f:
+                f.write(data)
+            subprocess.run([sys.executable, os.path.join(ROOT, "translate_nro.py"), path], check=True, cwd=work)
+        elapsed = (time.perf_counter() - start) / rounds
+        with open(path, "rb") as f:
+            result = f.read()
+        return elapsed, result
+    finally:
+        shutil.rmtree(work)
+
+
+def bench_in_process(data, dictionary, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = translate_nro.translate_binary(data, dictionary)
+    return (time.perf_counter() - start) / rounds, result
+
+
+def main(rounds=5):
+    for size, n_strings in [(256 * 1024, 500), (2 * 1024 * 1024, 4000), (8 * 1024 * 1024, 10000)]:
+        data, dictionary = make_binary(size, n_strings)
+        before, out_before = bench_subprocess(data, dictionary, rounds)
+        after, out_after = bench_in_process(data, dictionary, rounds)
+        assert out_before == out_after, "in-process 結果與 subprocess 不同"
+        print(f"{size // 1024:>6} KB {n_strings:>6} 字串  "
+              f"subprocess {before * 1000:8.1f} ms  in-process {after * 1000:8.1f} ms  "
+              f"x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# 以本機 zhconvert_stub 比較：
+#   before: 每行一次 requests.post + time.sleep(1)
+#   after : ZhConvertClient 批次 / asyncio
+# 另外以錯誤率 > 0 的伺服器驗證重試與切割結果正確。
+#
+# 用法: python benchmarks/bench_zhconvert.py [行數] [舊版 sleep 秒數]
+
+import os
+import sys
+import time
+import asyncio
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import zhconvert_client
+from zhconvert_client import ZhConvertClient
+from zhconvert_stub import start_stub_server, fake_convert
+from synthetic import make_locale_lines
+
+
+def expected(line):
+    return fake_convert(line, zhconvert_client.USER_PRE_REPLACE,
+                        zhconvert_client.USER_POST_REPLACE, zhconvert_client.USER_PROTECT_REPLACE)
+
+
+def legacy(url, lines, delay):
+    out = []
+    for line in lines:
+        args = {
+            "text": line,
+            "converter": "Taiwan",
+            "modules": zhconvert_client.MODULES,
+            "userPreReplace": zhconvert_client.USER_PRE_REPLACE,
+            "userPostReplace": zhconvert_client.USER_POST_REPLACE,
+            "userProtectReplace": zhconvert_client.USER_PROTECT_REPLACE,
+        }
+        response = requests.post(url, data=args).json()
+        out.append(response["data"]["text"])
+        time.sleep(delay)
+    return out
+
+
+def timed(label, func, lines, server):
+    before = server.stats["requests"]
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    ok = result == [expected(line) for line in lines]
+    print(f"{label:<22} {elapsed:8.2f} s  requests {server.stats['requests'] - before:5}  "
+          f"{len(lines) / elapsed:9.1f} 行/s  {'OK' if ok else 'MISMATCH'}")
+    return elapsed
+
+
+def main(n_lines=30, legacy_delay=1.0):
+    lines = make_locale_lines(n_lines)
+    server, url = start_stub_server(latency=0.02)
+    try:
+        timed("legacy (post+sleep)", lambda: legacy(url, lines, legacy_delay), lines, server)
+        timed("client batch", lambda: ZhConvertClient(url, rate=5).convert_many(lines), lines, server)
+        big = make_locale_lines(n_lines * 100, seed=1)
+        timed(f"client batch x{len(big)}", lambda: ZhConvertClient(url, rate=5, max_items=200).convert_many(big),
+              big, server)
+        timed(f"client async x{len(big)}",
+              lambda: asyncio.run(ZhConvertClient(url, rate=20, burst=4, max_items=200).convert_many_async(big)),
+              big, server)
+    finally:
+        server.shutdown()
+
+    # 錯誤處理：20% code != 0、10% HTTP 500
+    server, url = start_stub_server(error_rate=0.2, http_error_rate=0.1, seed=3)
+    try:
+        client = ZhConvertClient(url, rate=50, burst=10, retries=6, max_items=50)
+        timed("client w/ errors", lambda: client.convert_many(big), big, server)
+        print(f"{'':<22} client stats {client.stats}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 1.0)
@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+# 可重現的效能測試：以合成的 NRO 與外掛 ZIP 測量各階段，並與 baseline.json 比較
+#
+# - 輸入全部由 synthetic.py 以固定種子產生，不需網路
+# - 繁化姬以本機 zhconvert_stub 代替（不限速）
+# - 每個項目取 N 次中最快的一次（300 ms 以下的項目執行 4N 次）；以校準迴圈的時間換算成相對值，
+#   不同機器之間也能比較
+# - 整組測試執行 --runs 次（預設 3），每個項目取各次換算後的中位數，與 baseline 比較；
+#   --update-baseline 同樣寫入中位數
+# - 比 baseline 慢超過 --tolerance（預設 25%）且差距超過 --noise-floor（預設 10 ms）的項目
+#   會標示出來，並以結束碼 1 結束；短的項目只差幾 ms 就超過 25%，不算變慢。
+#   CASE_TOLERANCE 中的項目另有容許比例
+#
+# 用法:
+#   python benchmarks/run_benchmarks.py                    # 執行並與 baseline 比較
+#   python benchmarks/run_benchmarks.py --update-baseline  # 以本次結果更新 baseline.json
+#   python benchmarks/run_benchmarks.py --sweep            # .rodata 大小與修補數量的縮放曲線
+#   python benchmarks/run_benchmarks.py --only nro_         # 只跑名稱含 nro_ 的項目
+
+import gc
+import io
+import os
+import sys
+import json
+import time
+import zlib
+import shutil
+import platform
+import statistics
+import argparse
+import tempfile
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from zhconvert_stub import start_stub_server
+from synthetic import make_nro, make_plugin_zip, make_locale_json, make_bundle_zip
+
+BASELINE_FILE = os.path.join(HERE, "baseline.json")
+TOLERANCE = 0.25
+NOISE_FLOOR = 0.010   # 秒；比 baseline 慢不到這個差距時不算變慢
+SHORT_CASE = 0.3      # 秒；比這個短的項目容易受干擾，
+SHORT_REPEAT = 4      #   執行次數乘以這個倍數
+RUNS = 3
+# 完整流程以暫存檔、執行緒與行程為主，校準迴圈（純 CPU）換算不準，個別放寬
+CASE_TOLERANCE = {"pipeline_cold": 0.6, "pipeline_noop": 0.6, "pipeline_nested": 0.6, "pipeline_watch": 0.6}
+PLUGINS = ["SynthA", "SynthB", "SynthC", "SynthD"]
+BUNDLE = ["NestA", "NestB", "NestC", "NestD"]
+
+# 匯入 translate_plugins 前先指向本機 stub（API_URL 在匯入時決定）
+_server, _stub_url = start_stub_server()
+os.environ["ZHCONVERT_URL"] = _stub_url
+
+import translate_nro
+import translate_plugins
+import warm_cache
+import zhconvert_client
+from dict_matcher import DictMatcher
+
+translate_plugins.REMOTE_DICT_U_URL = _stub_url   # 取遠端 dict_url 時立即失敗，不連外
+
+
+def calibrate():
+    """固定工作量（純 Python 迴圈 + zlib），代表這台機器的速度"""
+    data = bytes(range(256)) * 16384
+    start = time.perf_counter()
+    sum(i * i % 7 for i in range(2000000))
+    zlib.compress(data, 9)
+    return time.perf_counter() - start
+
+
+def measure(func, repeat):
+    """回傳最快一次的秒數（輸出全部丟棄）；短於 SHORT_CASE 的項目執行 repeat × SHORT_REPEAT 次"""
+    best = None
+    runs = 0
+    while runs < repeat or (best < SHORT_CASE and runs < repeat * SHORT_REPEAT):
+        gc.collect()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        runs += 1
+    return best
+
+
+def fresh_client():
+    zhconvert_client._clients["Taiwan"] = zhconvert_client.ZhConvertClient(url=_stub_url, rate=1e9, burst=1e9)
+
+
+# ----------------------------
+# 測試項目：每個函式做好準備，回傳要計時的函式
+# ----------------------------
+def case_nro_extract(ro_size=4 * 1024 * 1024, n_strings=20000):
+    data, _ = make_nro(ro_size, n_strings)
+    return lambda: translate_nro.extract_strings_from_bytes(data, {})
+
+
+def case_nro_spans(ro_size=4 * 1024 * 1024, n_strings=20000):
+    """只找出字串位置，不解碼"""
+    data, _ = make_nro(ro_size, n_strings)
+    return lambda: translate_nro.extract_string_spans(data)
+
+
+def case_nro_translate(ro_size=4 * 1024 * 1024, n_strings=20000):
+    data, dictionary = make_nro(ro_size, n_strings)
+    matcher = DictMatcher(dictionary)
+    return lambda: translate_nro.translate_binary(data, matcher)
+
+
+def case_nro_apply(ro_size=4 * 1024 * 1024, n_strings=20000, n_patches=None):
+    """修補與搬移（含 ADRP/ADD 與 RELR 掃描），不含比對"""
+    data, dictionary = make_nro(ro_size, n_strings)
+    lengths = {}
+    strings = translate_nro.extract_strings_from_bytes(data, lengths)
+    patches = {offset: dictionary[text] for offset, text in strings.items() if text in dictionary}
+    if n_patches is not None:
+        patches = dict(list(patches.items())[:n_patches])
+    return lambda: translate_nro.apply_translation_bytes(data, patches, lengths)
+
+
+def case_text_convert(n_lines=20000):
+    """已有片段快取時，繁化一個大型語系 JSON"""
+    fresh_client()
+    text = make_locale_json(n_lines)
+    spans = {}
+    translate_plugins.convert_text(text, spans, {}, {"spans": {}, "urls": {}, "hits": 0, "misses": 0})
+    return lambda: translate_plugins.convert_text(
+        text, spans, {}, {"spans": {}, "urls": {}, "hits": 0, "misses": 0})
+
+
+def case_classify():
+    import zipfile
+    content, _ = make_plugin_zip("SynthA")
+    zf = zipfile.ZipFile(io.BytesIO(content))
+
+    def run():
+        for info in zf.infolist():
+            spool, _ = translate_plugins.spool_member(zf, info)
+            translate_plugins.classify_member(info.filename, spool)
+            spool.close()
+    return run
+
+
+@contextlib.contextmanager
+def workspace(plugins, bundle=()):
+    """含 Hans/hahappify/nro/*.zip、dict/*.json、dict_url.json 的暫存工作目錄
+
+    bundle 不為空時另外放一個內含這些外掛的 Hans/hahappify/xlcj/qun.zip。
+    """
+    work = tempfile.mkdtemp(prefix="bench-")
+    cwd = os.getcwd()
+    try:
+        folder = os.path.join(work, "Hans", "hahappify", "nro")
+        os.makedirs(folder)
+        os.makedirs(os.path.join(work, "dict"))
+        dict_url = {}
+        for i, name in enumerate(plugins):
+            content, dictionary = make_plugin_zip(name, seed=i, overlay=(i % 4 == 3))
+            with open(os.path.join(folder, f"{name}.zip"), "wb") as f:
+                f.write(content)
+            with open(os.path.join(work, "dict", f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(dictionary, f, ensure_ascii=False, indent=2)
+            url = f"https://dl.awa.cool/hahappify/nro/{name}.zip"
+            dict_url[url] = url
+        if bundle:
+            content, dictionaries = make_bundle_zip(bundle)
+            os.makedirs(os.path.join(work, "Hans", "hahappify", "xlcj"))
+            with open(os.path.join(work, "Hans", "hahappify", "xlcj", "qun.zip"), "wb") as f:
+                f.write(content)
+            for name, dictionary in dictionaries.items():
+                with open(os.path.join(work, "dict", f"{name}.json"), "w", encoding="utf-8") as f:
+                    json.dump(dictionary, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(work, "dict_url.json"), "w", encoding="utf-8") as f:
+            json.dump(dict_url, f, ensure_ascii=False, indent=2)
+        os.chdir(work)
+        yield work
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def reset_outputs(work):
+    for path in ("releases", "build_manifest.json", "string_index.sqlite", "dict_span.jsonl",
+                 os.path.join("dict", ".cache")):
+        path = os.path.join(work, path)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    translate_nro._matcher_cache.clear()
+
+
+def case_pipeline_cold():
+    """完整流程：空的快取與 manifest，所有 ZIP 都要重建"""
+    stack = contextlib.ExitStack()
+    work = stack.enter_context(workspace(PLUGINS))
+
+    def run():
+        reset_outputs(work)
+        fresh_client()
+        translate_plugins.main(jobs=1)
+    run.close = stack.close
+    return run
+
+
+def case_pipeline_noop():
+    """完整流程：第二次執行，全部由 manifest 判斷為無變更"""
+    stack = contextlib.ExitStack()
+    stack.enter_context(workspace(PLUGINS))
+    fresh_client()
+    with contextlib.redirect_stdout(io.StringIO()):
+        translate_plugins.main(jobs=1)
+
+    def run():
+        translate_plugins.main(jobs=1)
+    run.close = stack.close
+    return run
+
+
+def case_pipeline_nested():
+    """完整流程：只有 qun.zip 整合包（內層 ZIP 與兩層巢狀），空的快取與 manifest"""
+    stack = contextlib.ExitStack()
+    work = stack.enter_context(workspace([], BUNDLE))
+
+    def run():
+        reset_outputs(work)
+        fresh_client()
+        translate_plugins.main(jobs=1)
+    run.close = stack.close
+    return run
+
+
+def case_pipeline_watch():
+    """長駐模式 (--watch) 的重建：快取已暖，修改一個 NRO 字典項目後增量重建"""
+    stack = contextlib.ExitStack()
+    work = stack.enter_context(workspace(PLUGINS))
+    stack.callback(setattr, translate_plugins, "_warm", None)
+    translate_plugins._warm = warm_cache.WarmCache()
+    state = {}
+    fresh_client()
+    dict_path = os.path.join(work, "dict", f"{PLUGINS[0]}.json")
+    with open(dict_path, encoding="utf-8") as f:
+        dictionary = json.load(f)
+    key = sorted(dictionary)[0]
+    values = [dictionary[key] + "甲", dictionary[key] + "乙"]
+
+    def edit():
+        values.reverse()
+        dictionary[key] = values[0]
+        with open(dict_path, "w", encoding="utf-8") as f:
+            json.dump(dictionary, f, ensure_ascii=False, indent=2)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        translate_plugins.main(jobs=1, state=state)
+        edit()
+        translate_plugins.main(jobs=1, state=state)   # 第一次重建填入快取
+
+    def run():
+        edit()
+        translate_plugins.main(jobs=1, state=state)
+    run.close = stack.close
+    return run
+
+
+CASES = {
+    "nro_extract": case_nro_extract,
+    "nro_spans": case_nro_spans,
+    "nro_translate": case_nro_translate,
+    "nro_apply": case_nro_apply,
+    "text_convert": case_text_convert,
+    "classify": case_classify,
+    "pipeline_cold": case_pipeline_cold,
+    "pipeline_noop": case_pipeline_noop,
+    "pipeline_nested": case_pipeline_nested,
+    "pipeline_watch": case_pipeline_watch,
+}
+
+
+def run_case(factory, repeat, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        func = factory(**kwargs)
+    try:
+        return measure(func, repeat)
+    finally:
+        close = getattr(func, "close", None)
+        if close is not None:
+            close()
+
+
+# ----------------------------
+# baseline
+# ----------------------------
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, calibration, results):
+    baseline = {
+        "calibration": round(calibration, 6),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {name: round(seconds, 6) for name, seconds in results.items()},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def compare(baseline, calibration, results, tolerance, noise_floor=NOISE_FLOOR):
+    """印出比較表，回傳變慢的項目（比值超過 1 + tolerance 且差距超過 noise_floor 秒）
+
+    CASE_TOLERANCE 中的項目取其容許比例與 tolerance 的較大者。
+    """
+    scale = calibration / baseline["calibration"]
+    slower = []
+    print(f"{'項目':<16}{'本次 ms':>10}{'baseline ms':>13}{'比值':>8}")
+    for name, seconds in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<16}{seconds * 1000:>10.1f}{'-':>13}{'-':>8}")
+            continue
+        ratio = seconds / (base * scale)
+        flag = ""
+        allowed = max(tolerance, CASE_TOLERANCE.get(name, 0))
+        if ratio > 1 + allowed and seconds - base * scale > noise_floor:
+            flag = "  ⚠️ 變慢"
+            slower.append(name)
+        print(f"{name:<16}{seconds * 1000:>10.1f}{base * scale * 1000:>13.1f}{ratio:>8.2f}{flag}")
+    print(f"（baseline 已依校準時間換算：本機 {calibration * 1000:.1f} ms / "
+          f"baseline {baseline['calibration'] * 1000:.1f} ms）")
+    return slower
+
+
+# ----------------------------
+# 縮放曲線
+# ----------------------------
+def sweep(repeat):
+    print(f"{'.rodata MB':>11}{'字串':>8}{'extract ms':>12}{'translate ms':>14}")
+    for mb in (0.25, 1, 4, 16):
+        ro_size = int(mb * 1024 * 1024)
+        n_strings = ro_size // 200
+        extract = run_case(case_nro_extract, repeat, ro_size=ro_size, n_strings=n_strings)
+        translate = run_case(case_nro_translate, repeat, ro_size=ro_size, n_strings=n_strings)
+        print(f"{mb:>11}{n_strings:>8}{extract * 1000:>12.1f}{translate * 1000:>14.1f}")
+
+    print(f"\n{'修補數':>8}{'apply ms':>10}")
+    for n_patches in (10, 100, 1000, 10000):
+        seconds = run_case(case_nro_apply, repeat, ro_size=8 * 1024 * 1024,
+                           n_strings=40000, n_patches=n_patches)
+        print(f"{n_patches:>8}{seconds * 1000:>10.1f}")
+
+
+def run_suite(only, repeat):
+    """執行一次整組測試，回傳 (校準秒數, {項目: 秒數})"""
+    # 校準分散在各項目之間執行，取最快的一次，避免單次受到干擾
+    calibration = min(calibrate() for _ in range(max(repeat, 5)))
+    results = {}
+    for name, factory in CASES.items():
+        if only in name:
+            calibration = min(calibration, calibrate())
+            results[name] = run_case(factory, repeat)
+            print(f"{name:<16}{results[name] * 1000:>10.1f} ms", flush=True)
+    return calibration, results
+
+
+def median_results(runs):
+    """各次 run_suite 的中位數：各項目先以該次的校準時間換算，再換回校準時間的中位數"""
+    calibration = statistics.median(c for c, _ in runs)
+    results = {name: statistics.median(r[name] / c for c, r in runs) * calibration
+               for name in runs[0][1]}
+    return calibration, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成資料的效能測試")
+    parser.add_argument("--repeat", type=int, default=5, help="每個項目執行次數（取最快；短的項目再乘以 4）")
+    parser.add_argument("--runs", type=int, default=RUNS, help="整組測試執行次數（取中位數，預設 3）")
+    parser.add_argument("--only", default="", help="只執行名稱含此字串的項目")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true", help="以本次結果覆寫 baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="容許比 baseline 慢的比例（預設 0.25）")
+    parser.add_argument("--noise-floor", type=float, default=NOISE_FLOOR,
+                        help="比 baseline 慢不到此秒數時不算變慢（預設 0.01）")
+    parser.add_argument("--sweep", action="store_true", help="改為輸出縮放曲線")
+    args = parser.parse_args()
+
+    if args.sweep:
+        sweep(args.repeat)
+        return 0
+
+    runs = []
+    for i in range(args.runs):
+        if args.runs > 1:
+            print(f"第 {i + 1}/{args.runs} 次")
+        runs.append(run_suite(args.only, args.repeat))
+        print()
+    calibration, results = median_results(runs)
+
+    if args.update_baseline:
+        baseline = load_baseline(args.baseline) or {"results": {}}
+        save_baseline(args.baseline, calibration, dict(baseline["results"], **results))
+        print(f"已更新 {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"找不到 {args.baseline}，以 --update-baseline 建立")
+        return 0
+    slower = compare(baseline, calibration, results, args.tolerance, args.noise_floor)
+    if slower:
+        print(f"\n比 baseline 慢超過 {args.tolerance:.0%}: {', '.join(slower)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    code = main()
+    _server.shutdown()
+    sys.exit(code)
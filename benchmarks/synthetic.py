@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# 產生離線測試用的合成資料
+
+import random
+
+WORDS = [
+    "Settings", "Language", "Network", "Download", "Install", "Update",
+    "Error", "Loading", "Cancel", "Confirm", "Overlay", "Battery",
+    "设置", "语言", "网络", "下载", "安装", "更新", "错误", "加载", "取消", "确认",
+]
+
+
+def make_string(rng, words=3):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_binary(size=2 * 1024 * 1024, n_strings=2000, seed=0):
+    """產生含 NUL 結尾字串的假 NRO 內容與對應字典
+
+    回傳 (data, dictionary)，字典涵蓋約一半的字串。
+    """
+    rng = random.Random(seed)
+    out = bytearray()
+    dictionary = {}
+    filler = max(0, size // max(n_strings, 1) - 32)
+    for i in range(n_strings):
+        # 不可打印的雜訊，模擬程式碼區
+        out += bytes(rng.choice((0, 1, 2, 3, 0x90, 0xFF)) for _ in range(filler))
+        text = f"{make_string(rng)} #{i}"
+        out += b"\x00" + text.encode("utf-8") + b"\x00"
+        if i % 2 == 0:
+            dictionary[text] = text.replace("设置", "設定").replace("Settings", "設定")
+    if len(out) < size:
+        out += bytes(size - len(out))
+    return bytes(out), dictionary
+
+
+def make_locale_lines(n_lines=100, seed=0):
+    """產生類似 zh-Hans.json 的行（含縮排、JSON 鍵與換行）"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n_lines):
+        lines.append(f'    "Key{i}": "{make_string(rng)}",\n')
+    return lines
+
+
+# ----------------------------
+# 含標頭的 NRO
+# ----------------------------
+SEGMENT_ALIGN = 0x1000
+NOP = 0xD503201F
+
+
+def _align(value, align=SEGMENT_ALIGN):
+    return (value + align - 1) // align * align
+
+
+def make_nro(ro_size=1024 * 1024, n_strings=2000, seed=0, text_size=256 * 1024,
+             ref_ratio=0.5, long_ratio=0.1):
+    """產生結構完整的 NRO：標頭、MOD0、.text / .rodata / .data、.dynamic 與 RELR
+
+    - .text 為 NOP，其中 ref_ratio 的字串以 ADRP + ADD 參照，另一部分以 .data 的指標 (RELR) 參照
+    - .rodata 前段放字串，尾端約 1/4 保留為 \\x00，供搬移超長翻譯使用
+    - 字典涵蓋約一半的字串，其中 long_ratio 的譯文比原文長
+
+    回傳 (data, dictionary)。
+    """
+    import struct
+    from translate_nro import _encode_adrp
+
+    rng = random.Random(seed)
+    text_size = _align(max(text_size, 0x1000))
+    ro_offset = text_size
+    ro_size = _align(ro_size)
+
+    ro = bytearray()
+    offsets = []
+    dictionary = {}
+    limit = ro_size * 3 // 4
+    for i in range(n_strings):
+        text = f"{make_string(rng)} #{i}"
+        encoded = text.encode("utf-8")
+        if len(ro) + len(encoded) + 2 > limit:
+            break
+        offsets.append(ro_offset + len(ro) + 1)
+        ro += b"\x00" + encoded
+        if i % 2 == 0:
+            new = text.replace("设置", "設定").replace("Settings", "設定").replace("错误", "錯誤")
+            if rng.random() < long_ratio:
+                new += "（已翻譯的較長說明文字）"
+            dictionary[text] = new
+    ro += bytes(ro_size - len(ro))
+
+    # .text：NOP 與 ADRP + ADD
+    words = [NOP] * (text_size // 4)
+    first_word = 0x100 // 4   # 標頭與 MOD0 之後才放指令
+    referenced = [o for o in offsets if rng.random() < ref_ratio]
+    pc_words = rng.sample(range(first_word, len(words) - 1, 2), min(len(referenced), (len(words) - first_word) // 2 - 1))
+    for target, index in zip(referenced, pc_words):
+        pc = index * 4
+        words[index] = _encode_adrp(0x90000000, pc, target)
+        words[index + 1] = 0x91000000 | ((target & 0xFFF) << 10)
+    text = bytearray(struct.pack(f"<{len(words)}I", *words))
+
+    # .data：指標欄位、RELR、.dynamic
+    data_offset = ro_offset + ro_size
+    referenced_set = set(referenced)
+    pointed = [o for o in offsets if o not in referenced_set][:max(1, len(offsets) // 4)]
+    data = bytearray()
+    slots = []
+    for target in pointed:
+        slots.append(data_offset + len(data))
+        data += struct.pack("<Q", target)
+    relr_offset = data_offset + len(data)
+    for slot in slots:
+        data += struct.pack("<Q", slot)
+    relr_size = len(slots) * 8
+    dynamic_offset = data_offset + len(data)
+    data += struct.pack("<qQqQqQ", 36, relr_offset, 35, relr_size, 0, 0)
+    data_size = _align(len(data))
+    data += bytes(data_size - len(data))
+
+    out = text + ro + data
+    # 標頭（NRO 的 .text 從檔案開頭開始，標頭位於其中）
+    mod0 = 0x80
+    struct.pack_into("<II", out, 0, 0, mod0)
+    out[0x10:0x14] = b"NRO0"
+    struct.pack_into("<III", out, 0x14, 0, len(out), 0)
+    struct.pack_into("<IIIIIII", out, 0x20, 0, text_size, ro_offset, ro_size,
+                     data_offset, data_size, 0)
+    out[mod0:mod0 + 4] = b"MOD0"
+    struct.pack_into("<i", out, mod0 + 4, dynamic_offset - mod0)
+    return bytes(out), dictionary
+
+
+# ----------------------------
+# 外掛 ZIP
+# ----------------------------
+def make_locale_json(n_lines=1000, seed=0):
+    """類似 zh-Hans.json 的完整 JSON 文字，偶爾含 dl.awa.cool 網址"""
+    rng = random.Random(seed)
+    lines = ["{\n"]
+    for i, line in enumerate(make_locale_lines(n_lines, seed)):
+        if rng.random() < 0.05:
+            line = f'    "Url{i}": "https://dl.awa.cool/hahappify/nro/Plugin{i % 50}.zip",\n'
+        lines.append(line)
+    lines.append('    "End": ""\n}\n')
+    return "".join(lines)
+
+
+def make_plugin_zip(name, seed=0, locale_lines=1000, ro_size=1024 * 1024, n_strings=2000,
+                    asset_size=256 * 1024, overlay=False):
+    """仿照 Hans/hahappify/nro/*.zip 的結構
+
+    switch/<name>/<name>.nro（或 switch/.overlays/<name>.ovl）、lang/*.json 語系檔、
+    config/<name>/config.ini、圖片與字型。回傳 (zip bytes, NRO 字典)。
+    """
+    import io
+    import zipfile
+
+    rng = random.Random(seed)
+    binary, dictionary = make_nro(ro_size, n_strings, seed)
+    if overlay:
+        binary_name = f"switch/.overlays/{name}.ovl"
+    else:
+        binary_name = f"switch/{name}/{name}.nro"
+    locale = make_locale_json(locale_lines, seed)
+    ini = (f"[{name}]\n; 设置文件\nurl=https://dl.awa.cool/hahappify/nro/{name}.zip\n"
+           f"language=zh-Hans\ntimeout=10\n")
+    members = [
+        (binary_name, binary),
+        (f"switch/{name}/lang/zh-Hans.json", locale.encode("utf-8")),
+        (f"switch/{name}/lang/zh-Hant.json", locale.encode("utf-8")),
+        (f"switch/{name}/lang/en.json", make_locale_json(locale_lines // 4, seed + 1)
+            .replace("设置", "Settings").encode("utf-8")),
+        (f"config/{name}/config.ini", ini.encode("utf-8")),
+        (f"switch/{name}/icon.png", b"\x89PNG\r\n\x1a\n" + rng.randbytes(asset_size)),
+        (f"switch/{name}/font.ttf", b"\x00\x01\x00\x00" + rng.randbytes(asset_size)),
+    ]
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        for member, content in members:
+            z.writestr(zipfile.ZipInfo(member, (2025, 1, 1, 0, 0, 0)), content,
+                       compress_type=zipfile.ZIP_DEFLATED)
+    return buffer.getvalue(), dictionary
+
+
+def make_bundle_zip(names, seed=0, locale_lines=200, ro_size=256 * 1024, n_strings=500):
+    """仿照 xlcj/qun.zip 的整合包：plugin/<name>.zip 外掛 ZIP、說明文字，
+    以及一層再包一層的 plugin/extra.zip（內含最後一個外掛）。回傳 (zip bytes, {name: NRO 字典})。
+    """
+    import io
+    import zipfile
+
+    def pack(members):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as z:
+            for member, content, compress_type in members:
+                z.writestr(zipfile.ZipInfo(member, (2025, 1, 1, 0, 0, 0)), content, compress_type=compress_type)
+        return buffer.getvalue()
+
+    dictionaries = {}
+    plugins = []
+    for i, name in enumerate(names):
+        content, dictionaries[name] = make_plugin_zip(name, seed + i, locale_lines, ro_size, n_strings,
+                                                      asset_size=16 * 1024, overlay=(i % 2 == 1))
+        plugins.append((name, content))
+    last_name, last = plugins.pop()
+    readme = "".join(f"{i}. 插件 {name} 说明\n" for i, (name, _) in enumerate(plugins))
+    members = [(f"plugin/{name}.zip", content, zipfile.ZIP_STORED) for name, content in plugins]
+    members.append(("plugin/extra.zip", pack([(f"{last_name}.zip", last, zipfile.ZIP_STORED)]),
+                    zipfile.ZIP_DEFLATED))
+    members.append(("说明.txt", readme.encode("utf-8"), zipfile.ZIP_DEFLATED))
+    return pack(members), dictionaries
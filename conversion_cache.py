@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# 繁化快取：以「行內中文片段」為鍵，取代以整行為鍵的 dict_string.json
+#
+# 儲存格式為只附加 (append-only) 的 JSON Lines，每行一筆 ["簡體片段", "繁體片段"]，
+# 讀取後放在 dict 中 O(1) 查詢；新增項目直接附加到檔尾，不必重寫整個檔案。
+
+import os
+import re
+import json
+
+CACHE_FILE = "./dict_span.jsonl"
+LEGACY_FILE = "./dict_string.json"
+
+# 中文片段：以中文字或全形標點開頭與結尾，中間不跨越 JSON/設定檔的結構字元
+_WIDE = "\u2018-\u201f\u3000-\u303f\u4e00-\u9fa5\uff00-\uffef"
+SPAN_PATTERN = re.compile(rf'[{_WIDE}](?:[^\x00-\x1f"\\{{}}<>\[\]=]*[{_WIDE}])?')
+HAN_PATTERN = re.compile(r"[\u4e00-\u9fa5]")
+
+
+def iter_spans(text):
+    """列出 text 中需要繁化的片段 (re.Match)"""
+    for m in SPAN_PATTERN.finditer(text):
+        if HAN_PATTERN.search(m.group()):
+            yield m
+
+
+def apply_spans(text, spans):
+    """以 spans 對照表替換 text 內的片段，找不到的保持原樣"""
+    def replace(m):
+        return spans.get(m.group(), m.group())
+    return SPAN_PATTERN.sub(replace, text)
+
+
+def align_spans(src, dst):
+    """由整行對照 (src → dst) 拆出片段對照；結構不一致時回傳空 list"""
+    src_spans = list(iter_spans(src))
+    dst_spans = list(iter_spans(dst))
+    if len(src_spans) != len(dst_spans):
+        return []
+    if SPAN_PATTERN.sub("\x00", src) != SPAN_PATTERN.sub("\x00", dst):
+        return []
+    return [(a.group(), b.group()) for a, b in zip(src_spans, dst_spans)]
+
+
+class ConversionCache:
+    """片段快取（dict 介面 + 檔案附加寫入）"""
+
+    def __init__(self, path=CACHE_FILE, legacy_path=LEGACY_FILE):
+        self.path = path
+        self.spans = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            self._load()
+        elif legacy_path and os.path.exists(legacy_path):
+            self._migrate(legacy_path)
+
+    def _load(self):
+        lines = 0
+        with open(self.path, "r", encoding="utf8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                src, dst = json.loads(line)
+                self.spans[src] = dst
+                lines += 1
+        # 有重複項目時才重寫
+        if lines != len(self.spans):
+            self.compact()
+
+    def _migrate(self, legacy_path):
+        """從舊的 dict_string.json 自動轉換"""
+        with open(legacy_path, "r", encoding="utf8") as f:
+            legacy = json.load(f)
+        pairs = {}
+        for src, dst in legacy.items():
+            for a, b in align_spans(src, dst):
+                pairs.setdefault(a, b)
+        print(f"轉換 {legacy_path}: {len(legacy)} 行 → {len(pairs)} 個片段")
+        self.update(pairs)
+
+    def compact(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf8") as f:
+            for src, dst in self.spans.items():
+                f.write(json.dumps([src, dst], ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+
+    def __contains__(self, src):
+        return src in self.spans
+
+    def __len__(self):
+        return len(self.spans)
+
+    def get(self, src, default=None):
+        return self.spans.get(src, default)
+
+    def update(self, pairs):
+        """新增片段並附加寫入檔案"""
+        new = {src: dst for src, dst in pairs.items() if self.spans.get(src) != dst}
+        if not new:
+            return
+        self.spans.update(new)
+        with open(self.path, "a", encoding="utf8") as f:
+            for src, dst in new.items():
+                f.write(json.dumps([src, dst], ensure_ascii=False) + "\n")
+
+    def record(self, hits, misses):
+        self.hits += hits
+        self.misses += misses
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 100.0
+        return f"片段快取: {len(self.spans)} 筆，命中 {self.hits}/{total} ({rate:.1f}%)，新轉換 {self.misses}"
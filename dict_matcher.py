@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# 字典比對：完全符合用雜湊索引，字串內的片段用 Aho–Corasick 自動機
+#
+# 完全符合的查詢直接讀字典包 (dict_pack)；自動機編譯結果快取在
+# dict/.cache/<base>.matcher.pickle，字典 JSON 內容變更時自動重建。
+
+import os
+import re
+import pickle
+import threading
+
+import dict_pack
+
+CACHE_FOLDER = os.path.join("dict", ".cache")
+CACHE_VERSION = 3
+
+NON_ASCII_PATTERN = re.compile(r"[^\x00-\x7f]")
+
+
+class DictMatcher:
+    """編譯後的字典
+
+    - exact: {原文: 譯文}，整個字串完全符合時使用；可以是 dict 或字典包的 PackSection
+    - 自動機: 只收錄含非 ASCII 字元的鍵（中文），在較長字串內做片段替換；
+      純 ASCII 的鍵（例如 "Error"）可能是程式識別字或格式字串的一部分，只做完全符合
+    """
+
+    def __init__(self, dictionary):
+        if isinstance(dictionary, dict_pack.PackSection):
+            self.attach(dictionary)
+        else:
+            self.exact = dict(dictionary)
+            self.lookup_raw = {key.encode("utf-8"): value for key, value in dictionary.items()}.get
+        self.values = []     # 鍵編號 → (原文 bytes 長度, 譯文 bytes)
+        self.goto = [{}]     # 狀態 → {byte: 狀態}
+        self.fail = [0]
+        self.output = [()]   # 狀態 → (鍵編號, ...)，含 fail 鏈上的輸出
+        for key, value in dictionary.items():
+            if len(key) >= 2 and NON_ASCII_PATTERN.search(key) and key != value:
+                self._add(key.encode("utf-8"), value.encode("utf-8"))
+        self._build()
+        first = sorted(self.goto[0])
+        self.first_bytes = re.compile(b"[" + b"".join(re.escape(bytes([b])) for b in first) + b"]") if first else None
+
+    def attach(self, section):
+        """以字典包的區段做完全符合查詢（不載入整個字典）"""
+        self.exact = section
+        self.lookup_raw = section.get_raw
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if isinstance(self.exact, dict_pack.PackSection):
+            # 字典包以 mmap 讀取，不存進快取；載入後由 load_matcher 接回
+            state["exact"] = state["lookup_raw"] = None
+        return state
+
+    def _add(self, key, value):
+        state = 0
+        for byte in key:
+            nxt = self.goto[state].get(byte)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][byte] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+            state = nxt
+        self.output[state] = self.output[state] + (len(self.values),)
+        self.values.append((len(key), value))
+
+    def _build(self):
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for byte, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and byte not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(byte, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def find(self, data, start, end):
+        """在 data[start:end] 中找出所有鍵，回傳 [(開始, 結束, 鍵編號)]"""
+        hits = []
+        if self.first_bytes is None:
+            return hits
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        pos = start
+        while pos < end:
+            if state == 0:
+                # 在根節點時直接跳到下一個可能的開頭
+                m = self.first_bytes.search(data, pos, end)
+                if m is None:
+                    break
+                pos = m.start()
+            byte = data[pos]
+            while state and byte not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(byte, 0)
+            pos += 1
+            for index in output[state]:
+                hits.append((pos - self.values[index][0], pos, index))
+        return hits
+
+    def replace(self, data, start, end):
+        """以最左、最長且不重疊的片段替換，回傳新 bytes；沒有命中時回傳 None"""
+        hits = self.find(data, start, end)
+        if not hits:
+            return None
+        hits.sort(key=lambda h: (h[0], -(h[1] - h[0])))
+        pieces = []
+        pos = start
+        for hit_start, hit_end, index in hits:
+            if hit_start < pos:
+                continue
+            pieces.append(data[pos:hit_start])
+            pieces.append(self.values[index][1])
+            pos = hit_end
+        pieces.append(data[pos:end])
+        return b"".join(pieces)
+
+    def apply(self, data, strings, lengths):
+        """套用到 extract_strings_from_bytes 的結果，回傳 {offset: 新字串}"""
+        merged = strings.copy()
+        for offset, text in strings.items():
+            if text in self.exact:
+                merged[offset] = self.exact[text]
+                continue
+            if text.isascii():
+                continue  # 自動機只收錄非 ASCII 的鍵
+            new = self.replace(data, offset, offset + lengths[offset])
+            if new is not None:
+                merged[offset] = new.decode("utf-8", errors="ignore")
+        return merged
+
+
+    def apply_spans(self, data, offsets, lengths):
+        """套用到 extract_string_spans 的位置陣列，只解碼有命中的字串
+
+        回傳 {offset: (原字串 bytes 長度, 原文, 新字串)}；結果與 apply 相同，但不含未命中的字串。
+        """
+        changed = {}
+        lookup_raw = self.lookup_raw
+        for offset, size in zip(offsets.tolist(), lengths.tolist()):
+            raw = data[offset:offset + size]
+            value = lookup_raw(raw)
+            if value is not None:
+                changed[offset] = (size, raw.decode("utf-8", errors="ignore"), value)
+                continue
+            if raw.isascii():
+                continue
+            try:
+                raw.decode("utf-8")
+            except UnicodeDecodeError:
+                # 不合法的 UTF-8：與 apply 相同，以忽略錯誤解碼後的文字比對
+                text = raw.decode("utf-8", errors="ignore")
+                if text in self.exact:
+                    changed[offset] = (size, text, self.exact[text])
+                    continue
+                if text.isascii():
+                    continue
+            new = self.replace(data, offset, offset + size)
+            if new is not None:
+                changed[offset] = (size, raw.decode("utf-8", errors="ignore"),
+                                   new.decode("utf-8", errors="ignore"))
+        return changed
+
+
+def load_matcher(dict_path, cache_folder=CACHE_FOLDER):
+    """讀取（或編譯並快取）dict_path 對應的 DictMatcher；字典不存在時回傳 None"""
+    section = dict_pack.get_section(dict_path)
+    if section is None:
+        return None
+    base = os.path.splitext(os.path.basename(dict_path))[0]
+    cache_path = os.path.join(cache_folder, f"{base}.matcher.pickle")
+    try:
+        with open(cache_path, "rb") as f:
+            version, cached_fingerprint, matcher = pickle.load(f)
+        if version == CACHE_VERSION and cached_fingerprint == section.fingerprint:
+            matcher.attach(section)
+            return matcher
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+        pass
+
+    matcher = DictMatcher(section)
+    os.makedirs(cache_folder, exist_ok=True)
+    tmp = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"   # 內層 ZIP 會在執行緒中同時載入
+    with open(tmp, "wb") as f:
+        pickle.dump((CACHE_VERSION, section.fingerprint, matcher), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache_path)
+    return matcher
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# 字典包：把 dict/*.json 編譯成一個可 mmap 的二進位檔
+#
+# JSON 仍是唯一的編輯來源；字典包放在 dict/.cache/dict.pack，開啟時比對各來源的
+# 修改時間與大小，有變更（或新增、刪除檔案）就自動重新編譯。
+#
+# 格式（little-endian）:
+#   "DPAK" | 版本 u32 | 中繼資料長度 u32 | 中繼資料 JSON | 補齊到 8 bytes
+#   項目表: 每筆 (key offset, key 長度, value offset, value 長度) 各 u32，offset 相對於資料區
+#   資料區: UTF-8 的 key / value
+# 每個來源是一個區段 [start, end)，區段內依 key 的 UTF-8 bytes 排序，查詢用二分搜尋。
+#
+# 用法:
+#   python dict_pack.py                        # 編譯並列出各區段
+#   python dict_pack.py dict/EdiZon.json 原文   # 查詢
+
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import threading
+from collections.abc import Mapping
+
+DICT_FOLDER = "./dict"
+PACK_FILE = os.path.join("dict", ".cache", "dict.pack")
+
+MAGIC = b"DPAK"
+VERSION = 1
+HEADER = struct.Struct("<4sII")
+ENTRY = struct.Struct("<IIII")
+
+
+def section_name(path):
+    return os.path.normpath(path)
+
+
+def pack_sources(dict_folder=DICT_FOLDER):
+    """目前存在的所有來源 JSON"""
+    if not os.path.isdir(dict_folder):
+        return []
+    return [os.path.join(dict_folder, f) for f in sorted(os.listdir(dict_folder)) if f.endswith(".json")]
+
+
+def source_stamps(sources):
+    """{區段名稱: [mtime_ns, 大小]}，用來判斷字典包是否過期"""
+    stamps = {}
+    for path in sources:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stamps[section_name(path)] = [st.st_mtime_ns, st.st_size]
+    return stamps
+
+
+def compile_pack(sources, path=PACK_FILE):
+    """編譯字典包（寫入暫存檔後 os.replace），回傳 path"""
+    meta = {"sources": {}, "sections": {}}
+    entries = []
+    blob = bytearray()
+    for source in sources:
+        name = section_name(source)
+        with open(source, "rb") as f:
+            raw = f.read()
+        st = os.stat(source)
+        meta["sources"][name] = [st.st_mtime_ns, st.st_size, hashlib.sha256(raw).hexdigest()]
+        items = json.loads(raw.decode("utf-8")) if raw.strip() else {}
+        pairs = sorted((key.encode("utf-8"), value.encode("utf-8"))
+                       for key, value in items.items() if isinstance(value, str))
+        meta["sections"][name] = [len(entries), len(entries) + len(pairs)]
+        for key, value in pairs:
+            entries.append((len(blob), len(key), len(blob) + len(key), len(value)))
+            blob += key
+            blob += value
+    meta["count"] = len(entries)
+
+    meta_bytes = json.dumps(meta, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    head = HEADER.pack(MAGIC, VERSION, len(meta_bytes)) + meta_bytes
+    head += b"\x00" * (-len(head) % 8)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(head)
+        f.write(b"".join(ENTRY.pack(*entry) for entry in entries))
+        f.write(blob)
+    os.replace(tmp, path)
+    return path
+
+
+class PackSection(Mapping):
+    """字典包中的一個來源，唯讀 dict 介面；查詢時才讀取需要的 key"""
+
+    def __init__(self, pack, name, start, end):
+        self.pack = pack
+        self.name = name
+        self.start = start
+        self.end = end
+        self.fingerprint = pack.meta["sources"][name][2]   # 來源 JSON 的 sha256
+
+    def _entry(self, index):
+        return ENTRY.unpack_from(self.pack.data, self.pack.entries + index * ENTRY.size)
+
+    def _bytes(self, offset, size):
+        start = self.pack.blob + offset
+        return self.pack.data[start:start + size]
+
+    def get_raw(self, key):
+        """以 UTF-8 bytes 查詢，回傳譯文 (str)；沒有時回傳 None"""
+        lo, hi = self.start, self.end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key_offset, key_size, value_offset, value_size = self._entry(mid)
+            current = self._bytes(key_offset, key_size)
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return self._bytes(value_offset, value_size).decode("utf-8")
+        return None
+
+    def __getitem__(self, key):
+        value = self.get_raw(key.encode("utf-8"))
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for index in range(self.start, self.end):
+            key_offset, key_size, _, _ = self._entry(index)
+            yield self._bytes(key_offset, key_size).decode("utf-8")
+
+    def __len__(self):
+        return self.end - self.start
+
+    def items(self):
+        for index in range(self.start, self.end):
+            key_offset, key_size, value_offset, value_size = self._entry(index)
+            yield (self._bytes(key_offset, key_size).decode("utf-8"),
+                   self._bytes(value_offset, value_size).decode("utf-8"))
+
+
+class DictPack:
+    """以 mmap 開啟的字典包"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{path}: 不是版本 {VERSION} 的字典包")
+        self.meta = json.loads(self.data[HEADER.size:HEADER.size + meta_size].decode("utf-8"))
+        self.entries = HEADER.size + meta_size + (-(HEADER.size + meta_size) % 8)
+        self.blob = self.entries + self.meta["count"] * ENTRY.size
+        self.sections = {}
+
+    def close(self):
+        self.sections.clear()
+        self.data.close()
+
+    def stamps(self):
+        return {name: source[:2] for name, source in self.meta["sources"].items()}
+
+    def section(self, path):
+        """來源 JSON 對應的 PackSection；不在字典包中時回傳 None"""
+        name = section_name(path)
+        if name not in self.sections:
+            bounds = self.meta["sections"].get(name)
+            if bounds is None:
+                return None
+            self.sections[name] = PackSection(self, name, *bounds)
+        return self.sections[name]
+
+    def fingerprint(self, path):
+        source = self.meta["sources"].get(section_name(path))
+        return source[2] if source else None
+
+
+_pack = None
+_pack_lock = threading.Lock()   # 內層 ZIP 的執行緒可能同時開啟
+_retired = []                   # 已被取代、尚未關閉的字典包
+
+
+def open_pack(path=PACK_FILE):
+    """開啟字典包（同一行程共用）；來源 JSON 有變更時先重新編譯"""
+    global _pack
+    with _pack_lock:
+        stamps = source_stamps(pack_sources())
+        if _pack is not None and _pack.path == path and _pack.stamps() == stamps:
+            return _pack
+        # 舊的字典包先不關閉，仍在使用的 PackSection（例如已快取的 DictMatcher）繼續有效，
+        # 等沒有人引用後再由 close_retired() 關閉
+        if _pack is not None:
+            _retired.append(_pack)
+        _pack = None
+        try:
+            pack = DictPack(path)
+            if pack.stamps() == stamps:
+                _pack = pack
+                return pack
+            pack.close()
+        except (OSError, ValueError, struct.error):
+            pass
+        compile_pack(pack_sources(), path)
+        _pack = DictPack(path)
+        return _pack
+
+
+def close_retired():
+    """關閉已被取代的字典包，回傳關閉的數量；呼叫端須確定不再使用它們的 PackSection"""
+    with _pack_lock:
+        closed = len(_retired)
+        for pack in _retired:
+            pack.close()
+        _retired.clear()
+        return closed
+
+
+def get_section(path):
+    """dict/<base>.json 等來源的唯讀字典；檔案不存在時回傳 None"""
+    return open_pack().section(path)
+
+
+if __name__ == "__main__":
+    pack = open_pack()
+    if len(sys.argv) >= 3:
+        section = pack.section(sys.argv[1])
+        print(section.get(sys.argv[2]) if section is not None else f"{sys.argv[1]} 不在字典包中")
+    else:
+        print(f"{pack.path}: {pack.meta['count']} 筆，{os.path.getsize(pack.path) / 1e3:.1f} KB")
+        for name, (start, end) in sorted(pack.meta["sections"].items()):
+            print(f"  {name:<40}{end - start:>8}")
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# ZIP 下載器：條件式 GET、串流寫檔、續傳、連線池、有上限的平行下載
+#
+# - 以 <檔案>.etag 的 ETag 送 If-None-Match；沒有 ETag 時以 <檔案>.last-modified 保存的伺服器
+#   Last-Modified 送 If-Modified-Since（不用本地檔案時間：CI checkout 後會變成 checkout 的時間）；
+#   兩者都沒有時不送條件式標頭。回 304 就沿用本地檔案
+# - 分塊寫入 <檔案>.part，完成後 os.replace 換上，中斷不會留下半個 ZIP
+# - 留有 .part 時以 Range + If-Range 續傳
+# - 以最多 jobs 個執行緒同時下載，取代每次請求前 sleep 30 秒
+
+import os
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "SwitchScriptTW_Bot/1.0 (+https://github.com/david082321)"
+CHUNK_SIZE = 256 * 1024
+LAST_MODIFIED_SUFFIX = ".last-modified"
+
+# 下載結果
+NOT_MODIFIED = "not-modified"
+DOWNLOADED = "downloaded"
+FAILED = "failed"
+
+
+def load_validator(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf8") as f:
+            return f.read().strip()
+    return None
+
+
+def save_validator(path, value):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf8") as f:
+        f.write(value)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def quote_etag(etag):
+    # .etag 檔存的是去掉雙引號的值（沿用舊格式）
+    if etag.startswith("W/") or etag.startswith('"'):
+        return etag
+    return f'"{etag}"'
+
+
+class Downloader:
+    """共用連線池的下載器（執行緒安全）"""
+
+    def __init__(self, timeout=30, retries=3, pool_size=8, chunk_size=CHUNK_SIZE):
+        self.timeout = timeout
+        self.retries = retries
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.stats = {NOT_MODIFIED: 0, DOWNLOADED: 0, FAILED: 0, "resumed": 0, "bytes": 0}
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def _count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def _request(self, url, path, etag_path):
+        """送出一次請求並寫入 .part；回傳 NOT_MODIFIED 或 DOWNLOADED，失敗時拋出例外"""
+        part_path = path + ".part"
+        part_etag_path = part_path + ".etag"
+        last_modified_path = path + LAST_MODIFIED_SUFFIX
+        headers = {}
+        if os.path.exists(path):
+            etag_local = load_validator(etag_path)
+            last_modified_local = load_validator(last_modified_path)
+            if etag_local:
+                headers["If-None-Match"] = quote_etag(etag_local)
+            elif last_modified_local:
+                headers["If-Modified-Since"] = last_modified_local
+
+        # 只有知道 .part 對應的 ETag 時才續傳，避免接上不同版本的檔案
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        part_etag = load_validator(part_etag_path) if offset else None
+        if part_etag:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = quote_etag(part_etag)
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as r:
+            if r.status_code == 304:
+                return NOT_MODIFIED
+            if r.status_code == 416:
+                # .part 已不符合遠端檔案，下次從頭開始
+                remove_file(part_path)
+                remove_file(part_etag_path)
+            r.raise_for_status()
+            etag_remote = (r.headers.get("ETag") or "").strip('"')
+            if r.status_code == 206:
+                mode = "ab"
+                self._count("resumed")
+            else:
+                mode = "wb"
+                if etag_remote:
+                    save_validator(part_etag_path, etag_remote)
+                else:
+                    remove_file(part_etag_path)
+            with open(part_path, mode) as f:
+                for chunk in r.iter_content(self.chunk_size):
+                    f.write(chunk)
+                    self._count("bytes", len(chunk))
+            expected = r.headers.get("Content-Length")
+            last_modified = r.headers.get("Last-Modified")
+
+        received = os.path.getsize(part_path) - (offset if mode == "ab" else 0)
+        if expected is not None and received != int(expected):
+            raise requests.ConnectionError(f"incomplete body: {received}/{expected} bytes")
+        os.replace(part_path, path)
+        remove_file(part_etag_path)
+        if etag_remote:
+            save_validator(etag_path, etag_remote)
+        else:
+            remove_file(etag_path)
+        if last_modified:
+            save_validator(last_modified_path, last_modified)
+            try:
+                mtime = parsedate_to_datetime(last_modified).timestamp()
+                os.utime(path, (mtime, mtime))
+            except (TypeError, ValueError):
+                pass
+        else:
+            remove_file(last_modified_path)
+        return DOWNLOADED
+
+    def fetch(self, url, path, etag_path=None):
+        """下載 url 到 path（有更新才下載），回傳 NOT_MODIFIED / DOWNLOADED / FAILED"""
+        etag_path = etag_path or path + ".etag"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        for attempt in range(self.retries):
+            try:
+                status = self._request(url, path, etag_path)
+                self._count(status)
+                return status
+            except (requests.RequestException, OSError) as e:
+                print(f"Download failed ({attempt + 1}/{self.retries}): {url}: {e}")
+                status_code = getattr(getattr(e, "response", None), "status_code", None)
+                if status_code in (403, 404, 410):
+                    break  # 重試也不會成功
+                if attempt + 1 < self.retries:
+                    time.sleep(min(2 ** attempt, 10))
+        self._count(FAILED)
+        return FAILED
+
+    def fetch_all(self, items, jobs=4):
+        """items 為 [(url, path)]，最多 jobs 個同時下載；回傳 {url: 結果}"""
+        items = list(items)
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            results = pool.map(lambda item: self.fetch(*item), items)
+            return {url: status for (url, _), status in zip(items, results)}
+
+    def report(self):
+        s = self.stats
+        return (f"下載: {s[DOWNLOADED]} 個（續傳 {s['resumed']}，{s['bytes'] / 1e6:.1f} MB），"
+                f"未變更 {s[NOT_MODIFIED]} 個，失敗 {s[FAILED]} 個")
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# 執行統計：各階段的耗時、處理量與計數，輸出成 JSON Lines 報告
+#
+# 環境變數:
+#   TRANSLATE_METRICS=路徑       報告輸出位置（預設 ./build_metrics.jsonl，每次執行附加）
+#   TRANSLATE_PROFILE=路徑       以 cProfile 執行主程式並輸出 .prof（只含主行程）
+#   TRANSLATE_TRACEMALLOC=N      以 tracemalloc 記錄記憶體高峰與前 N 個配置位置
+
+import os
+import time
+import json
+import uuid
+import threading
+import contextlib
+
+METRICS_FILE = os.environ.get("TRANSLATE_METRICS", "./build_metrics.jsonl")
+
+
+class Metrics:
+    """一個工作單位（一次執行、一個 ZIP）的統計（執行緒安全）
+
+    stages: {階段: {"seconds", "bytes", "calls"}}，同一階段可累加多次
+    counters: {名稱: 數值}
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name, nbytes=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, nbytes)
+
+    def add(self, name, seconds, nbytes=0, calls=1):
+        with self.lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "bytes": 0, "calls": 0})
+            stage["seconds"] += seconds
+            stage["bytes"] += nbytes
+            stage["calls"] += calls
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, record):
+        """加入另一個 to_dict() 的結果（例如子行程回傳的 ZIP 統計）"""
+        for name, stage in record["stages"].items():
+            self.add(name, stage["seconds"], stage["bytes"], stage["calls"])
+        for name, n in record["counters"].items():
+            self.count(name, n)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "name": self.name,
+                "seconds": round(time.perf_counter() - self.started, 6),
+                "stages": {k: dict(v, seconds=round(v["seconds"], 6)) for k, v in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+
+# 目前的統計對象；底層函式以 stage() / count() 記錄，不需一路傳遞參數
+_active = Metrics("default")
+
+
+@contextlib.contextmanager
+def collect(name):
+    """在區塊內以新的 Metrics 作為目前的統計對象"""
+    global _active
+    previous, _active = _active, Metrics(name)
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+def active():
+    return _active
+
+
+def stage(name, nbytes=0):
+    return _active.stage(name, nbytes)
+
+
+def count(name, n=1):
+    _active.count(name, n)
+
+
+def write_report(records, path=None):
+    """附加到 JSON Lines 報告，同一次執行的紀錄有相同的 run 編號"""
+    path = path or METRICS_FILE
+    run = uuid.uuid4().hex[:12]
+    when = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    with open(path, "a", encoding="utf8") as f:
+        for record in records:
+            f.write(json.dumps(dict(record, run=run, time=when), ensure_ascii=False) + "\n")
+    return path
+
+
+def format_stages(record):
+    """每個階段一行的摘要，給 CI 記錄看
+
+    秒數為各次呼叫的累計；平行處理時（--jobs、壓縮執行緒）會超過實際經過的時間。
+    """
+    lines = [f"{'階段':<12}{'累計秒':>10}{'MB':>10}{'次數':>8}  (總經過 {record['seconds']:.3f} s)"]
+    stages = sorted(record["stages"].items(), key=lambda item: -item[1]["seconds"])
+    for name, s in stages:
+        lines.append(f"{name:<12}{s['seconds']:>10.3f}{s['bytes'] / 1e6:>10.1f}{s['calls']:>8}")
+    if record["counters"]:
+        lines.append(", ".join(f"{k}={v}" for k, v in sorted(record["counters"].items())))
+    return "\n".join(lines)
+
+
+def run_profiled(func, *args, **kwargs):
+    """依環境變數以 cProfile / tracemalloc 執行 func"""
+    profile_path = os.environ.get("TRANSLATE_PROFILE")
+    trace_top = os.environ.get("TRANSLATE_TRACEMALLOC")
+    if trace_top:
+        import tracemalloc
+        tracemalloc.start()
+    try:
+        if profile_path:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(func, *args, **kwargs)
+            finally:
+                profiler.dump_stats(profile_path)
+                print(f"cProfile: {profile_path}")
+        return func(*args, **kwargs)
+    finally:
+        if trace_top:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"tracemalloc: 目前 {current / 1e6:.1f} MB，高峰 {peak / 1e6:.1f} MB")
+            for stat in snapshot.statistics("lineno")[:int(trace_top) or 10]:
+                print(f"  {stat}")
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# 離線測試用：模擬 dl.awa.cool 的本機檔案伺服器
+#
+# 支援 ETag / Last-Modified、If-None-Match / If-Modified-Since（回 304）、
+# Range / If-Range（回 206），並可在傳送途中斷線以測試續傳。
+#
+# 用法:
+#   python mirror_stub.py --root ./Hans --port 8766 --drop-after 100000
+#   MIRROR_URL=http://127.0.0.1:8766/ python translate_plugins.py --download
+
+import os
+import re
+import time
+import argparse
+import threading
+from urllib.parse import unquote, urlsplit
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RANGE_PATTERN = re.compile(r"bytes=(\d+)-$")
+
+
+def make_etag(path):
+    """與 nginx 相同格式：<mtime hex>-<size hex>"""
+    st = os.stat(path)
+    return f'"{int(st.st_mtime):x}-{st.st_size:x}"'
+
+
+class MirrorHandler(BaseHTTPRequestHandler):
+    server_version = "mirror-stub/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, key):
+        with self.server.lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+    def _not_modified(self, etag, mtime):
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            # If-None-Match 優先，此時忽略 If-Modified-Since
+            tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+            return etag in tags or "*" in tags
+        ims = self.headers.get("If-Modified-Since")
+        if ims:
+            try:
+                return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _range_start(self, etag, size):
+        """回傳續傳起點；沒有 Range 或 If-Range 不符時回傳 None"""
+        match = RANGE_PATTERN.match(self.headers.get("Range", ""))
+        if match is None:
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range != etag:
+            return None
+        start = int(match.group(1))
+        return start if start < size else -1
+
+    def _send(self, head_only):
+        server = self.server
+        self._count("requests")
+        name = unquote(urlsplit(self.path).path).lstrip("/")
+        path = os.path.realpath(os.path.join(server.root, name))
+        if not path.startswith(server.root + os.sep) or not os.path.isfile(path):
+            self._count("404")
+            self.send_error(404)
+            return
+        if server.latency:
+            time.sleep(server.latency)
+
+        st = os.stat(path)
+        etag = make_etag(path)
+        headers = {"ETag": etag, "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+                   "Accept-Ranges": "bytes"}
+        if self._not_modified(etag, st.st_mtime):
+            self._count("304")
+            self.send_response(304)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            return
+
+        start = self._range_start(etag, st.st_size)
+        if start == -1:
+            self._count("416")
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{st.st_size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if start is None:
+            self._count("200")
+            self.send_response(200)
+            start = 0
+        else:
+            self._count("206")
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{st.st_size - 1}/{st.st_size}")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(st.st_size - start))
+        self.end_headers()
+        if head_only:
+            return
+
+        # 每個檔案第一次完整傳送時，在 drop_after bytes 後斷線
+        limit = None
+        with server.lock:
+            if server.drop_after and start == 0 and name not in server.dropped:
+                server.dropped.add(name)
+                limit = server.drop_after
+        with open(path, "rb") as f:
+            f.seek(start)
+            sent = 0
+            while True:
+                chunk = f.read(64 * 1024)
+                if not chunk:
+                    break
+                if limit is not None and sent + len(chunk) > limit:
+                    self.wfile.write(chunk[:limit - sent])
+                    self.wfile.flush()
+                    self._count("dropped")
+                    self.close_connection = True
+                    return
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                with server.lock:
+                    server.stats["bytes"] = server.stats.get("bytes", 0) + len(chunk)
+
+    def do_GET(self):
+        self._send(head_only=False)
+
+    def do_HEAD(self):
+        self._send(head_only=True)
+
+
+def start_mirror_server(root, port=0, latency=0.0, drop_after=0):
+    """在背景執行緒啟動伺服器，回傳 (server, base_url)；用畢呼叫 server.shutdown()"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MirrorHandler)
+    server.daemon_threads = True
+    server.root = os.path.realpath(root)
+    server.latency = latency
+    server.drop_after = drop_after
+    server.dropped = set()
+    server.lock = threading.Lock()
+    server.stats = {"requests": 0, "bytes": 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}/"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="dl.awa.cool 離線替身")
+    parser.add_argument("--root", default="./Hans", help="提供下載的資料夾")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求延遲秒數")
+    parser.add_argument("--drop-after", type=int, default=0,
+                        help="每個檔案第一次下載時在此 bytes 數後斷線（0 = 不斷線）")
+    args = parser.parse_args()
+    server, url = start_mirror_server(args.root, args.port, args.latency, args.drop_after)
+    print(f"mirror stub: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+# 離線簡體 → 繁體（台灣）轉換：最長匹配的詞語 / 單字對照表，不必連線繁化姬
+#
+# 對照表來源（同一階段內前者優先）:
+#   1. 專案規則：zhconvert_client 的 USER_PRE_REPLACE（轉換前替換）、USER_PROTECT_REPLACE（保護字詞）、
+#      USER_POST_REPLACE（轉換後替換），與送到繁化姬的規則相同
+#   2. 從片段快取 (dict_span.jsonl，含由 dict_string.json 轉換來的內容) 學到的詞語與單字，
+#      也就是繁化姬過去的轉換結果
+#   3. OpenCC 的 s2twp 資料：STPhrases / STCharacters → TWPhrases → TWVariants；
+#      OPENCC_DATA 指定的目錄，或已安裝 opencc-python-reimplemented 時使用其 dictionary/
+# 編譯後的對照表快取在 dict/.cache/offline_converter.pickle，來源有變更時重建。
+#
+# 轉換模式（環境變數 ZHCONVERT_MODE，translate_plugins.py 的 --converter / --offline 會設定）:
+#   hybrid  : 預設。片段中的每個中文字都有把握（詞語命中，或單字只有一種轉法）時在本機轉換，
+#             其餘送繁化姬；繁化姬失敗時使用本機結果。沒有 OpenCC 資料時只有學到的詞語算有把握
+#   offline : 只在本機轉換，沒有把握的字照對照表的第一個候選轉換
+#   remote  : 全部送繁化姬
+#
+# 用法:
+#   python offline_converter.py 简体文字 ...    # 顯示轉換結果與是否有把握
+
+import os
+import re
+import sys
+import json
+import pickle
+import hashlib
+import threading
+from collections import Counter
+
+from conversion_cache import HAN_PATTERN
+from zhconvert_client import (get_client, ZhConvertError,
+                              USER_PRE_REPLACE, USER_POST_REPLACE, USER_PROTECT_REPLACE)
+
+CACHE_FILE = os.path.join("dict", ".cache", "offline_converter.pickle")
+CACHE_VERSION = 1
+MODE = os.environ.get("ZHCONVERT_MODE", "hybrid")
+MODES = ("hybrid", "offline", "remote")
+
+OPENCC_STAGES = [
+    ["STPhrases.txt", "STCharacters.txt"],
+    ["TWPhrases.txt", "TWPhrasesIT.txt", "TWPhrasesName.txt", "TWPhrasesOther.txt"],
+    ["TWVariants.txt"],
+]
+MAX_LEARNED_PHRASE = 8     # 從片段快取學習的詞語長度上限
+MIN_CHAR_AGREEMENT = 0.9   # 學到的單字轉法須佔該字出現次數的比例，才算有把握
+HAN_RUN_PATTERN = re.compile(HAN_PATTERN.pattern + "+")
+# MODULES 啟用的 QuotationMark：彎引號轉成直角引號
+QUOTATION_MARKS = {"“": "「", "”": "」", "‘": "『", "’": "』"}
+
+
+def parse_rules(text):
+    return [tuple(line.split("=", 1)) for line in text.splitlines() if "=" in line]
+
+
+def opencc_folder():
+    """OpenCC 文字格式字典所在目錄；沒有時回傳 None"""
+    folder = os.environ.get("OPENCC_DATA")
+    if not folder:
+        try:
+            import opencc
+        except ImportError:
+            return None
+        folder = os.path.join(os.path.dirname(opencc.__file__), "dictionary")
+    return folder if os.path.isfile(os.path.join(folder, "STCharacters.txt")) else None
+
+
+def read_opencc(path):
+    """OpenCC 文字字典：每行「原文<TAB>候選1 候選2 ...」，回傳 {原文: [候選]}"""
+    table = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            key, _, values = line.rstrip("\n").partition("\t")
+            if key and values and key not in table:
+                table[key] = values.split(" ")
+    return table
+
+
+class Table:
+    """最長匹配對照表
+
+    prefixes 收錄所有 key 的前綴，逐字延伸時遇到不是前綴的字串即可停止，
+    走訪方式等同 trie，但只用 dict / set，編譯與 pickle 都很快。
+    value 為 (譯文, 是否為最終結果, 是否有把握)。
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.prefixes = set()
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, key, value):
+        """已有的 key 不覆蓋：先加入的來源優先"""
+        if key in self.values:
+            return
+        self.values[key] = value
+        for i in range(1, len(key)):
+            self.prefixes.add(key[:i])
+
+    def match(self, text, start):
+        """text[start:] 開頭最長的 key：(長度, value)；沒有時 (0, None)"""
+        values, prefixes = self.values, self.prefixes
+        best = (0, None)
+        for end in range(start + 1, len(text) + 1):
+            piece = text[start:end]
+            value = values.get(piece)
+            if value is not None:
+                best = (end - start, value)
+            if piece not in prefixes:
+                break
+        return best
+
+
+def learn_pairs(spans):
+    """由片段快取學習：中文字連續段落的詞語對照，以及每個非 ASCII 字元最常見的轉法
+
+    只使用轉換前後長度相同的片段（逐字對齊）；詞語以出現次數最多的轉法為準。
+    """
+    phrases = {}
+    chars = {}
+    for src, dst in spans.items():
+        if len(src) != len(dst):
+            if len(src) <= MAX_LEARNED_PHRASE and HAN_RUN_PATTERN.fullmatch(src):
+                phrases.setdefault(src, Counter())[dst] += 1
+            continue
+        for m in HAN_RUN_PATTERN.finditer(src):
+            run, out = m.group(), dst[m.start():m.end()]
+            if 2 <= len(run) <= MAX_LEARNED_PHRASE:
+                phrases.setdefault(run, Counter())[out] += 1
+        for a, b in zip(src, dst):
+            if not a.isascii():
+                chars.setdefault(a, Counter())[b] += 1
+    learned_phrases = {run: counter.most_common(1)[0][0] for run, counter in phrases.items()}
+    learned_chars = {}
+    for char, counter in chars.items():
+        target, n = counter.most_common(1)[0]
+        learned_chars[char] = (target, n / sum(counter.values()) >= MIN_CHAR_AGREEMENT)
+    return learned_phrases, learned_chars
+
+
+class OfflineConverter:
+    """最長匹配的多階段轉換器（在本機執行，可 pickle）
+
+    stages[0] 為主要的簡→繁對照（專案學到的詞語與單字、OpenCC STPhrases / STCharacters），
+    其後為 OpenCC 的台灣用語與異體字。學到的詞語已是繁化姬的最終結果，不再經過後續階段。
+    """
+
+    def __init__(self, spans, opencc=None):
+        self.pre = parse_rules(USER_PRE_REPLACE)
+        self.post = parse_rules(USER_POST_REPLACE)
+        protect = [word for word in USER_PROTECT_REPLACE.splitlines() if word]
+        self.protect = re.compile("(" + "|".join(map(re.escape, protect)) + ")") if protect else None
+        self.has_opencc = opencc is not None
+        self.stages = [Table()]
+
+        learned_phrases, learned_chars = learn_pairs(spans)
+        for src, dst in learned_phrases.items():
+            self.stages[0].add(src, (dst, True, True))
+        for src, (dst, sure) in learned_chars.items():
+            self.stages[0].add(src, (dst, False, sure))
+        for src, dst in QUOTATION_MARKS.items():
+            self.stages[0].add(src, (dst, True, True))
+        if opencc is not None:
+            for i, files in enumerate(OPENCC_STAGES):
+                if i >= len(self.stages):
+                    self.stages.append(Table())
+                for name in files:
+                    path = os.path.join(opencc, name)
+                    if os.path.isfile(path):
+                        for key, values in read_opencc(path).items():
+                            self.stages[i].add(key, (values[0], False, len(key) > 1 or len(values) == 1))
+
+    def _convert_plain(self, text):
+        """沒有保護字詞的片段：回傳 (譯文, 是否有把握)"""
+        first = self.stages[0]
+        pieces = []   # [(文字, 是否為最終結果)]
+        sure = True
+        pos = 0
+        while pos < len(text):
+            length, value = first.match(text, pos)
+            if length:
+                out, final, confident = value
+                if not final and not self.has_opencc:
+                    # 沒有 OpenCC 的詞語資料就無法判斷台灣用語（例如 内存 → 記憶體），逐字轉換一律沒把握
+                    confident = False
+            else:
+                length, out, final = 1, text[pos], False
+                # OpenCC 沒有收錄的字表示簡繁相同
+                confident = self.has_opencc or not HAN_PATTERN.match(out)
+            sure = sure and confident
+            if pieces and pieces[-1][1] == final:
+                pieces[-1] = (pieces[-1][0] + out, final)
+            else:
+                pieces.append((out, final))
+            pos += length
+        result = []
+        for out, final in pieces:
+            if not final:
+                # 簡→繁之後才出現的保護字詞（例如 用户 → 用戶）也不再套用台灣用語
+                parts = self.protect.split(out) if self.protect else [out]
+                for i in range(0, len(parts), 2):
+                    for stage in self.stages[1:]:
+                        parts[i] = apply_table(stage, parts[i])
+                out = "".join(parts)
+            result.append(out)
+        return "".join(result), sure
+
+    def convert(self, text):
+        """回傳 (譯文, 是否有把握)"""
+        for old, new in self.pre:
+            text = text.replace(old, new)
+        sure = True
+        parts = self.protect.split(text) if self.protect else [text]
+        # split 的結果: [一般文字, 保護字詞, 一般文字, ...]
+        for i in range(0, len(parts), 2):
+            parts[i], confident = self._convert_plain(parts[i])
+            sure = sure and confident
+        text = "".join(parts)
+        for old, new in self.post:
+            text = text.replace(old, new)
+        return text, sure
+
+
+def apply_table(table, text):
+    """以 table 最長匹配替換 text"""
+    out = []
+    pos = 0
+    while pos < len(text):
+        length, value = table.match(text, pos)
+        if length:
+            out.append(value[0])
+            pos += length
+        else:
+            out.append(text[pos])
+            pos += 1
+    return "".join(out)
+
+
+def source_fingerprint(spans, opencc):
+    h = hashlib.sha256(f"{CACHE_VERSION}\n{USER_PRE_REPLACE}\n{USER_POST_REPLACE}\n{USER_PROTECT_REPLACE}".encode())
+    h.update(json.dumps(spans, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    if opencc is not None:
+        for files in OPENCC_STAGES:
+            for name in files:
+                path = os.path.join(opencc, name)
+                if os.path.isfile(path):
+                    st = os.stat(path)
+                    h.update(f"{name}:{st.st_mtime_ns}:{st.st_size}\n".encode())
+    return h.hexdigest()
+
+
+def build_converter(spans, cache_path=CACHE_FILE, fingerprint=None):
+    """讀取（或編譯並快取）對照表；spans 為片段快取的內容"""
+    opencc = opencc_folder()
+    fingerprint = fingerprint or source_fingerprint(spans, opencc)
+    try:
+        with open(cache_path, "rb") as f:
+            cached_fingerprint, converter = pickle.load(f)
+        if cached_fingerprint == fingerprint:
+            return converter
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+        pass
+    converter = OfflineConverter(spans, opencc)
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    tmp = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump((fingerprint, converter), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache_path)
+    return converter
+
+
+def load_converter(cache_path=CACHE_FILE):
+    """載入主行程以 build_converter 建好的對照表（子行程用）；沒有快取時以磁碟上的片段快取建立"""
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)[1]
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+        from conversion_cache import ConversionCache
+        return build_converter(ConversionCache(legacy_path=None).spans, cache_path)
+
+
+class HybridClient:
+    """與 ZhConvertClient 相同介面的轉換器：依 mode 在本機轉換或送繁化姬
+
+    stats 沿用繁化姬用戶端的計數，另外加上本機轉換 (offline) 與改送繁化姬 (fallback) 的片段數。
+    """
+
+    def __init__(self, converter, mode=MODE, remote=None):
+        if mode not in MODES:
+            raise ValueError(f"未知的轉換模式: {mode}")
+        self.converter = converter
+        self.mode = mode
+        self._remote = remote
+        self.counts = {"offline": 0, "fallback": 0}
+        self.lock = threading.Lock()
+
+    @property
+    def remote(self):
+        """繁化姬用戶端；offline 模式為 None"""
+        if self.mode == "offline":
+            return None
+        return self._remote if self._remote is not None else get_client()
+
+    @property
+    def stats(self):
+        stats = dict(self.remote.stats) if self.remote is not None else {"requests": 0}
+        with self.lock:
+            stats.update(self.counts)
+        return stats
+
+    def convert(self, text):
+        return self.convert_many([text])[0]
+
+    def convert_many(self, texts):
+        """依順序回傳轉換結果；remote 模式下繁化姬失敗時拋出 ZhConvertError"""
+        texts = list(texts)
+        if self.mode == "remote":
+            return self.remote.convert_many(texts)
+        results = []
+        unsure = []
+        for i, text in enumerate(texts):
+            converted, sure = self.converter.convert(text)
+            results.append(converted)
+            if not sure and self.mode == "hybrid":
+                unsure.append(i)
+        with self.lock:
+            self.counts["offline"] += len(texts) - len(unsure)
+            self.counts["fallback"] += len(unsure)
+        if unsure:
+            try:
+                remote = self.remote.convert_many([texts[i] for i in unsure])
+            except ZhConvertError as e:
+                print(f"繁化姬無法使用，改用本機轉換結果: {e}")
+            else:
+                for i, converted in zip(unsure, remote):
+                    results[i] = converted
+        return results
+
+
+_converter = None
+_fingerprint = None
+_clients = {}
+
+
+def prepare(spans):
+    """主行程在分派工作前呼叫：以目前的片段快取建立對照表並寫入快取檔
+
+    同一個行程再次呼叫（長駐模式）且來源沒變時，沿用已載入的對照表。
+    """
+    global _converter, _fingerprint
+    fingerprint = source_fingerprint(spans, opencc_folder())
+    if _converter is not None and fingerprint == _fingerprint:
+        return _converter
+    _converter = build_converter(spans, fingerprint=fingerprint)
+    _fingerprint = fingerprint
+    _clients.clear()
+    return _converter
+
+
+def get_converter(mode=None):
+    """每個行程、每種模式共用一個 HybridClient"""
+    global _converter
+    mode = mode or os.environ.get("ZHCONVERT_MODE", MODE)
+    if mode not in _clients:
+        if _converter is None and mode != "remote":
+            _converter = load_converter()
+        _clients[mode] = HybridClient(_converter, mode)
+    return _clients[mode]
+
+
+if __name__ == "__main__":
+    from conversion_cache import ConversionCache
+    converter = build_converter(ConversionCache(legacy_path=None).spans)
+    print(f"OpenCC: {opencc_folder() or '無'}，"
+          f"對照表: {', '.join(str(len(stage)) for stage in converter.stages)} 筆")
+    for text in sys.argv[1:]:
+        converted, sure = converter.convert(text)
+        print(f"{text} → {converted}{'' if sure else '  (沒有把握)'}")
@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+# 反向索引：原文字串 → 出現的 (ZIP, 檔案, offset)
+#
+# - NRO / OVL 記錄 extract_string_spans 找到的每個 C 字串（bytes offset）
+# - 文字檔記錄需要繁化的中文片段與站內網址（字元 offset）
+# 建置時由 translate_plugins 更新；來源檔案 (sha256) 沒變的檔案不會重新索引。
+#
+# 另外保存每次建置結束時的字典內容（dict/<base>.json、片段快取、dict_url），
+# 以「世代」記錄每個項目何時新增或失效。比對某個檔案上次建置的世代之後變更的項目，
+# 就能知道字典修改後哪些檔案真的需要重新翻譯，其餘沿用上次的輸出。
+#
+# 用法:
+#   python string_index.py query "原文"     # 哪些 ZIP / 檔案用到這個字串
+#   python string_index.py diff             # 目前字典與上次建置的差異，以及需要重新處理的檔案
+#   python string_index.py stats
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+
+INDEX_FILE = "./string_index.sqlite"
+
+# 字典來源名稱：NRO 字典為 "nro:<base>"、翻譯庫為 "store:<base>"，文字檔為片段快取與 dict_url
+SOURCE_SPANS = "spans"
+SOURCE_URLS = "urls"
+NRO_SOURCE_PREFIX = "nro:"
+STORE_SOURCE_PREFIX = "store:"
+
+KIND_NRO = "nro"
+KIND_TEXT = "text"
+
+MAX_CHANGED_KEYS = 500   # 變更太多時不逐一比對，直接視為需要重建
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    id INTEGER PRIMARY KEY,
+    archive TEXT NOT NULL,
+    member TEXT NOT NULL,
+    source TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    generation INTEGER,
+    UNIQUE (archive, member)
+);
+CREATE TABLE IF NOT EXISTS strings (
+    string BLOB NOT NULL,
+    member_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS strings_by_string ON strings (string);
+CREATE INDEX IF NOT EXISTS strings_by_member ON strings (member_id);
+CREATE TABLE IF NOT EXISTS generations (
+    generation INTEGER PRIMARY KEY,
+    code TEXT NOT NULL,
+    time TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    source TEXT NOT NULL,
+    key BLOB NOT NULL,
+    value BLOB NOT NULL,
+    since INTEGER NOT NULL,
+    until INTEGER
+);
+CREATE INDEX IF NOT EXISTS entries_live ON entries (source, until);
+CREATE INDEX IF NOT EXISTS entries_changed ON entries (since, until);
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL
+);
+"""
+
+
+def nro_source(base):
+    return NRO_SOURCE_PREFIX + base
+
+
+def store_source(base):
+    return STORE_SOURCE_PREFIX + base
+
+
+def dictionary_fingerprint(dictionary):
+    """字典包的區段直接用來源 JSON 的 sha256，其餘（片段快取、dict_url）以排序後的內容計算"""
+    fingerprint = getattr(dictionary, "fingerprint", None)
+    if fingerprint is not None:
+        return fingerprint
+    return hashlib.sha256(json.dumps(dictionary, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def member_base(member):
+    """NRO / OVL 檔名（不含副檔名），即對應的 dict/<base>.json"""
+    return os.path.splitext(os.path.basename(member))[0]
+
+
+class StringIndex:
+    """SQLite 反向索引；只由主行程寫入"""
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----------------------------
+    # 檔案與字串
+    # ----------------------------
+    def sources(self, archive):
+        """{檔案: 索引時的來源 sha256}"""
+        rows = self.db.execute("SELECT member, source FROM members WHERE archive = ?", (archive,))
+        return dict(rows)
+
+    def update_archive(self, archive, indexed, names):
+        """寫入 build_archive 回傳的索引，並移除 ZIP 中已不存在的檔案
+
+        indexed: {檔案: {"source", "kind", "strings": [(bytes, offset)]}}
+        names: 本次 ZIP 內的所有檔案
+        """
+        with self.db:
+            for member, entry in indexed.items():
+                old = self.db.execute("SELECT id FROM members WHERE archive = ? AND member = ?",
+                                      (archive, member)).fetchone()
+                if old is not None:
+                    self.db.execute("DELETE FROM strings WHERE member_id = ?", old)
+                    self.db.execute("DELETE FROM members WHERE id = ?", old)
+                member_id = self.db.execute(
+                    "INSERT INTO members (archive, member, source, kind) VALUES (?, ?, ?, ?)",
+                    (archive, member, entry["source"], entry["kind"])).lastrowid
+                self.db.executemany("INSERT INTO strings (string, member_id, offset) VALUES (?, ?, ?)",
+                                    ((string, member_id, offset) for string, offset in entry["strings"]))
+            names = set(names)
+            for member_id, member in self.db.execute(
+                    "SELECT id, member FROM members WHERE archive = ?", (archive,)).fetchall():
+                if member not in names:
+                    self.db.execute("DELETE FROM strings WHERE member_id = ?", (member_id,))
+                    self.db.execute("DELETE FROM members WHERE id = ?", (member_id,))
+
+    def locate(self, string):
+        """字串出現的位置：[(ZIP, 檔案, offset)]"""
+        rows = self.db.execute(
+            "SELECT m.archive, m.member, s.offset FROM strings s JOIN members m ON m.id = s.member_id "
+            "WHERE s.string = ? ORDER BY m.archive, m.member, s.offset", (string.encode("utf-8"),))
+        return rows.fetchall()
+
+    def locate_substring(self, string):
+        """包含 string 的字串：[(ZIP, 檔案, offset, 完整字串)]（全表掃描）"""
+        rows = self.db.execute(
+            "SELECT m.archive, m.member, s.offset, s.string FROM strings s JOIN members m ON m.id = s.member_id "
+            "WHERE instr(s.string, ?) > 0 ORDER BY m.archive, m.member, s.offset", (string.encode("utf-8"),))
+        return [(a, m, o, s.decode("utf-8", errors="ignore")) for a, m, o, s in rows]
+
+    # ----------------------------
+    # 字典世代
+    # ----------------------------
+    def current_generation(self):
+        row = self.db.execute("SELECT MAX(generation) FROM generations").fetchone()
+        return row[0] or 0
+
+    def _diff_source(self, source, dictionary):
+        """最新記錄與 dictionary 的差異：(失效的 key, 新增或修改的 (key, value))"""
+        live = {key: value for key, value in self.db.execute(
+            "SELECT key, value FROM entries WHERE source = ? AND until IS NULL", (source,))}
+        current = {key.encode("utf-8"): value.encode("utf-8") for key, value in dictionary.items()}
+        gone = [key for key, value in live.items() if current.get(key) != value]
+        added = [(key, value) for key, value in current.items() if live.get(key) != value]
+        return gone, added
+
+    def _changed_sources(self, dictionaries):
+        """與最新記錄的指紋不同（或已刪除）的來源：{來源名稱: (目前的字典, 指紋)}"""
+        recorded = dict(self.db.execute("SELECT source, fingerprint FROM sources"))
+        changed = {}
+        for source in recorded.keys() | dictionaries.keys():
+            dictionary = dictionaries.get(source, {})
+            fingerprint = dictionary_fingerprint(dictionary) if source in dictionaries else None
+            if recorded.get(source) != fingerprint:
+                changed[source] = (dictionary, fingerprint)
+        return changed
+
+    def record_dictionaries(self, dictionaries, code):
+        """記錄建置結束時的字典內容，回傳世代編號；字典與程式碼都沒變時沿用目前的世代
+
+        dictionaries: {來源名稱: {原文: 譯文}}；不在其中的來源視為已刪除。
+        """
+        with self.db:
+            changed = self._changed_sources(dictionaries)
+            generation = self.current_generation()
+            latest = self.db.execute("SELECT code FROM generations WHERE generation = ?", (generation,)).fetchone()
+            if not changed and latest is not None and latest[0] == code:
+                return generation
+            generation += 1
+            self.db.execute("INSERT INTO generations VALUES (?, ?, ?)",
+                            (generation, code, time.strftime("%Y-%m-%dT%H:%M:%S%z")))
+            for source, (dictionary, fingerprint) in changed.items():
+                gone, added = self._diff_source(source, dictionary)
+                self.db.executemany(
+                    "UPDATE entries SET until = ? WHERE source = ? AND key = ? AND until IS NULL",
+                    ((generation, source, key) for key in gone))
+                self.db.executemany(
+                    "INSERT INTO entries (source, key, value, since) VALUES (?, ?, ?, ?)",
+                    ((source, key, value, generation) for key, value in added))
+                if fingerprint is None:
+                    self.db.execute("DELETE FROM sources WHERE source = ?", (source,))
+                else:
+                    self.db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?)", (source, fingerprint))
+        return generation
+
+    def mark_built(self, archive, names, generation):
+        """這些檔案的輸出與 generation 的字典一致"""
+        with self.db:
+            self.db.executemany("UPDATE members SET generation = ? WHERE archive = ? AND member = ?",
+                                ((generation, archive, name) for name in names))
+
+    def changed_keys(self, generation):
+        """generation 之後（到最新一次記錄）新增、修改或刪除的項目：{來源名稱: set(bytes)}"""
+        changed = {}
+        rows = self.db.execute("SELECT source, key FROM entries WHERE since > ? OR until > ?",
+                               (generation, generation))
+        for source, key in rows:
+            changed.setdefault(source, set()).add(key)
+        return changed
+
+    def diff_keys(self, dictionaries):
+        """目前的字典與最新一次記錄的差異：{來源名稱: set(bytes)}"""
+        changed = {}
+        for source, (dictionary, _) in self._changed_sources(dictionaries).items():
+            gone, added = self._diff_source(source, dictionary)
+            keys = set(gone).union(key for key, _ in added)
+            if keys:
+                changed[source] = keys
+        return changed
+
+    # ----------------------------
+    # 需要重新處理的檔案
+    # ----------------------------
+    def _uses_any(self, member_id, keys, substring):
+        """檔案是否用到 keys 中任一項；substring 時非 ASCII 的項目也比對字串內的片段"""
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            found = self.db.execute(
+                f"SELECT 1 FROM strings WHERE member_id = ? AND string IN ({','.join('?' * len(batch))}) LIMIT 1",
+                [member_id, *batch]).fetchone()
+            if found:
+                return True
+        if substring:
+            for key in keys:
+                if key.isascii() or len(key.decode("utf-8", errors="ignore")) < 2:
+                    continue  # DictMatcher 只以非 ASCII 的項目做片段替換
+                found = self.db.execute(
+                    "SELECT 1 FROM strings WHERE member_id = ? AND instr(string, ?) > 0 LIMIT 1",
+                    (member_id, key)).fetchone()
+                if found:
+                    return True
+        return False
+
+    def affected(self, member_id, kind, member, changed):
+        """changed 中的變更是否影響這個檔案"""
+        if kind == KIND_NRO:
+            keys = changed.get(nro_source(member_base(member)), ())
+            # 翻譯庫只比對完整字串
+            stored = changed.get(store_source(member_base(member)), ())
+            if len(keys) + len(stored) > MAX_CHANGED_KEYS:
+                return True
+            return ((bool(keys) and self._uses_any(member_id, keys, True))
+                    or (bool(stored) and self._uses_any(member_id, stored, False)))
+        elif kind == KIND_TEXT:
+            keys = set(changed.get(SOURCE_SPANS, ())) | set(changed.get(SOURCE_URLS, ()))
+            substring = False
+        else:
+            return False   # 原樣複製的檔案不受字典影響
+        if len(keys) > MAX_CHANGED_KEYS:
+            return True
+        return bool(keys) and self._uses_any(member_id, keys, substring)
+
+    def clean_members(self, archive, code, pending):
+        """字典雖有變更、但沒有用到變更項目的檔案：{檔案: 來源 sha256}
+
+        變更為檔案建置時的世代之後記錄的項目，加上 pending（diff_keys：最新記錄後尚未建置的修改）。
+        只有以相同程式碼建置過（世代的 code 相同）的檔案才列入。
+        """
+        codes = dict(self.db.execute("SELECT generation, code FROM generations"))
+        changed_by_generation = {}
+        clean = {}
+        rows = self.db.execute("SELECT id, member, source, kind, generation FROM members WHERE archive = ?",
+                               (archive,)).fetchall()
+        for member_id, member, source, kind, generation in rows:
+            if generation is None or codes.get(generation) != code:
+                continue
+            if generation not in changed_by_generation:
+                changed = self.changed_keys(generation)
+                for name, keys in pending.items():
+                    changed.setdefault(name, set()).update(keys)
+                changed_by_generation[generation] = changed
+            if not self.affected(member_id, kind, member, changed_by_generation[generation]):
+                clean[member] = source
+        return clean
+
+    def affected_members(self, changed):
+        """changed（例如 diff_keys 的結果）會影響的檔案：[(ZIP, 檔案)]"""
+        rows = self.db.execute("SELECT id, archive, member, kind FROM members ORDER BY archive, member").fetchall()
+        return [(archive, member) for member_id, archive, member, kind in rows
+                if self.affected(member_id, kind, member, changed)]
+
+    def stats(self):
+        members = self.db.execute("SELECT kind, COUNT(*) FROM members GROUP BY kind").fetchall()
+        strings = self.db.execute("SELECT COUNT(*) FROM strings").fetchone()[0]
+        return {"members": dict(members), "strings": strings, "generation": self.current_generation()}
+
+
+def current_dictionaries(dict_folder="./dict", span_file="./dict_span.jsonl", url_file="./dict_url.json",
+                         store_folder="./translation"):
+    """目前磁碟上的字典內容，來源名稱同 record_dictionaries"""
+    import dict_pack
+    import translation_store
+    from conversion_cache import ConversionCache
+
+    dictionaries = {}
+    pack = dict_pack.open_pack()
+    for path in dict_pack.pack_sources(dict_folder):
+        dictionaries[nro_source(member_base(path))] = pack.section(path)
+    for base in translation_store.store_bases(store_folder):
+        dictionaries[store_source(base)] = translation_store.load_store(base, store_folder).index_entries()
+    dictionaries[SOURCE_SPANS] = ConversionCache(span_file, legacy_path=None).spans
+    if os.path.exists(url_file):
+        with open(url_file, "r", encoding="utf8") as f:
+            dictionaries[SOURCE_URLS] = json.load(f)
+    return dictionaries
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if not os.path.exists(INDEX_FILE):
+        print(f"找不到 {INDEX_FILE}，請先執行 translate_plugins.py")
+        sys.exit(1)
+    with StringIndex() as index:
+        if command == "query" and len(sys.argv) > 2:
+            text = sys.argv[2]
+            for archive, member, offset in index.locate(text):
+                print(f"{archive}\t{member}\t{offset}")
+            if "--substring" in sys.argv:
+                for archive, member, offset, string in index.locate_substring(text):
+                    print(f"{archive}\t{member}\t{offset}\t{string}")
+        elif command == "diff":
+            changed = index.diff_keys(current_dictionaries())
+            for source, keys in sorted(changed.items()):
+                print(f"{source}: {len(keys)} 項變更")
+            members = index.affected_members(changed)
+            for archive, member in members:
+                print(f"  {archive}\t{member}")
+            print(f"需要重新處理 {len(members)} 個檔案，{len({a for a, _ in members})} 個 ZIP")
+        else:
+            print(index.stats())
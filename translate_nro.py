@@ -7,6 +7,22 @@
 import os
 import re
 import json
+import mmap
+import array
+import struct
+import threading
+import contextlib
+
+try:
+    import numpy as np
+except ImportError:   # 沒有 NumPy 時以正規表示式掃描，結果相同
+    np = None
+
+import metrics
+import dict_pack
+import warm_cache
+import translation_store
+from dict_matcher import DictMatcher, load_matcher
 
 DICT_FOLDER = "./dict"
 TRANS_FOLDER = "./translation"
@@ -15,43 +31,247 @@ TRANS_FOLDER = "./translation"
 # 工具區
 ###############################################
 
-def extract_strings(nro_path):
+STRING_PATTERN = re.compile(
+    b'(?:[\x20-\x7E]|[\xC2-\xF4][\x80-\xBF]+){2,}'
+)
+# C 字串：前後必須是 \x00 或控制字元（\n、\t 等），多行字串以行為單位
+CSTRING_PATTERN = re.compile(
+    b'(?<=[\x00-\x1F])(?:[\x20-\x7E]|[\xC2-\xF4][\x80-\xBF]+){2,}(?=[\x00-\x1F])'
+)
+SKIP_PATTERN = re.compile(r'[@{}\[\]\(\)#!\*`,\'^]+\|\<')  # 略過的奇怪字元
+
+MEANINGFUL_PATTERN = re.compile(r'[A-Za-z0-9\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7af]')
+
+# 翻譯超過原長度時的處理方式：relocate（搬移並改寫指標）/ truncate / shift
+DEFAULT_MODE = "relocate"
+
+
+SCAN_CHUNK = 4 * 1024 * 1024   # NumPy 掃描每次處理的大小，限制暫存陣列的記憶體
+CUT_SEARCH = 64 * 1024         # 在區塊尾端這個範圍內找切點
+
+
+@contextlib.contextmanager
+def open_mapped(path):
+    """以唯讀 mmap 開啟檔案（空檔案回傳 b""），不把整個檔案讀進記憶體"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def extract_strings(nro_path, lengths=None):
     """從 NRO 讀取可打印字串 (UTF-8/ASCII)"""
+    with open_mapped(nro_path) as data:
+        return extract_strings_from_bytes(data, lengths)
+
+
+def extract_strings_from_bytes(data, lengths=None):
+    """從記憶體中的 NRO 內容讀取可打印字串
+
+    NRO 只掃描 .rodata / .data 與 RomFS 中的 C 字串，以及 NACP 標題，
+    跳過程式碼與圖示；無法解析的檔案退回整個檔案掃描。
+    若傳入 lengths (dict)，同時記錄每個字串的原始 bytes 長度。
+    """
+    offsets, sizes = extract_string_spans(data)
+    return decode_spans(data, offsets, sizes, lengths)
+
+
+def extract_string_spans(data):
+    """同 extract_strings_from_bytes，但只回傳位置：(offsets, lengths) 兩個整數陣列，不解碼"""
+    header = parse_nro_header(data)
+    if header is None:
+        return find_string_spans(data, 0, len(data), cstring=False)
+    parts = []
+    for segment in ("ro", "data"):
+        offset, size = header[segment]
+        parts.append(find_string_spans(data, offset, offset + size))
+    assets = parse_nro_assets(data, header)
+    if assets:
+        parts.append(nacp_spans(data, assets))
+        # RomFS 內的語系檔等文字檔（例如 JSON）以行為單位
+        offset, size = assets["romfs"]
+        parts.append(find_string_spans(data, offset, offset + size))
+    offsets = concat_spans([p[0] for p in parts])
+    sizes = concat_spans([p[1] for p in parts])
+    return offsets, sizes
+
+
+def decode_spans(data, offsets, sizes, lengths=None):
+    """把位置陣列解碼成 {offset: 字串}"""
     strings = {}
-    with open(nro_path, "rb") as f:
-        data = f.read()
-    pattern = re.compile(
-        b'(?:[\x20-\x7E]|[\xC2-\xF4][\x80-\xBF]+){2,}'
-    )
-    for match in pattern.finditer(data):
-        offset = match.start()
-        text = match.group().decode("utf-8", errors="ignore")
-        strings[offset] = text
+    for offset, size in zip(offsets.tolist(), sizes.tolist()):
+        strings[offset] = data[offset:offset + size].decode("utf-8", errors="ignore")
+        if lengths is not None:
+            lengths[offset] = size
     return strings
 
 
+def concat_spans(parts):
+    if np is not None:
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+    result = array.array("q")
+    for part in parts:
+        result.extend(part)
+    return result
+
+
+def extract_asset_strings(data):
+    """列出 NRO 資源區 (NACP / RomFS) 的字串，與程式字串分開處理
+
+    回傳 {"nacp": {offset: text}, "romfs": {offset: text}}，offset 為檔案絕對位置。
+    """
+    result = {"nacp": {}, "romfs": {}}
+    header = parse_nro_header(data)
+    assets = parse_nro_assets(data, header) if header else None
+    if not assets:
+        return result
+    result["nacp"] = decode_spans(data, *nacp_spans(data, assets))
+    romfs_offset, romfs_size = assets["romfs"]
+    if romfs_size:
+        result["romfs"] = decode_spans(data, *find_string_spans(data, romfs_offset, romfs_offset + romfs_size))
+    return result
+
+
+def nacp_spans(data, assets):
+    """NACP 標題：16 種語言，每組 name(0x200) + publisher(0x100)，\x00 結尾"""
+    offsets = []
+    sizes = []
+    nacp_offset, nacp_size = assets["nacp"]
+    if nacp_size >= NACP_LANG_ENTRIES * NACP_ENTRY_SIZE:
+        for i in range(NACP_LANG_ENTRIES):
+            entry = nacp_offset + i * NACP_ENTRY_SIZE
+            for field, size in ((entry, 0x200), (entry + 0x200, 0x100)):
+                length = data[field:field + size].find(b"\x00")
+                if length == -1:
+                    length = size
+                if length >= 2:
+                    offsets.append(field)
+                    sizes.append(length)
+    if np is not None:
+        return np.array(offsets, dtype=np.int64), np.array(sizes, dtype=np.int64)
+    return array.array("q", offsets), array.array("q", sizes)
+
+
+def find_string_spans(data, start, end, cstring=True):
+    """找出 data[start:end] 中的字串，回傳 (offsets, lengths) 兩個整數陣列
+
+    cstring=True 時與 CSTRING_PATTERN 相同（前後必須是控制字元），否則與 STRING_PATTERN 相同。
+    有 NumPy 時以向量化的位元組分類找出區段，不為每個字串建立 Python 物件。
+    """
+    start = max(start, 0)
+    end = min(end, len(data))
+    if np is None:
+        pattern = CSTRING_PATTERN if cstring else STRING_PATTERN
+        offsets = array.array("q")
+        sizes = array.array("q")
+        for match in pattern.finditer(data, start, end):
+            offsets.append(match.start())
+            sizes.append(match.end() - match.start())
+        return offsets, sizes
+
+    offsets = []
+    sizes = []
+    pos = start
+    while pos < end:
+        # 在控制字元之後切開，字串與 UTF-8 字元都不會跨兩個區塊
+        size = SCAN_CHUNK
+        while True:
+            cut = min(pos + size, end)
+            if cut == end:
+                break
+            tail = max(pos, cut - CUT_SEARCH)
+            controls = np.flatnonzero(np.frombuffer(data, np.uint8, cut - tail, tail) < 0x20)
+            if len(controls):
+                cut = tail + int(controls[-1]) + 1
+                break
+            size *= 2
+        # CSTRING_PATTERN 的 lookbehind 會看到 start 前一個位元組
+        lo = pos - 1 if cstring and pos > 0 else pos
+        window_offsets, window_sizes = _window_spans(data, lo, cut, cstring)
+        offsets.append(window_offsets)
+        sizes.append(window_sizes)
+        pos = cut
+    if not offsets:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(offsets), np.concatenate(sizes)
+
+
+def _window_spans(data, lo, hi, cstring):
+    """data[lo:hi] 內的字串區段（NumPy）
+
+    字元：可打印 ASCII，或開頭位元組 [\xC2-\xF4] 接一個以上的接續位元組 [\x80-\xBF]。
+    字串為連續的字元且至少 2 個；cstring 時前後位元組必須是控制字元且在範圍內。
+    """
+    arr = np.frombuffer(data, np.uint8, hi - lo, lo)
+    count = len(arr)
+    lead = (arr >= 0xC2) & (arr <= 0xF4)
+    cont = (arr >= 0x80) & (arr <= 0xBF)
+    first = (arr >= 0x20) & (arr <= 0x7E)    # 每個字元的第一個位元組
+    first[:-1] |= lead[:-1] & cont[1:]
+    token = first | _chained(lead, cont)
+    edges = np.diff(token.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if not len(starts):
+        return starts, ends
+    keep = np.add.reduceat(first, starts, dtype=np.int32) >= 2
+    if cstring:
+        control = arr < 0x20
+        keep &= (starts > 0) & control[np.maximum(starts - 1, 0)]
+        keep &= (ends < count) & control[np.minimum(ends, count - 1)]
+    return (starts[keep] + lo).astype(np.int64), (ends - starts)[keep].astype(np.int64)
+
+
+def _chained(lead, cont, rounds=8):
+    """屬於某個開頭位元組的接續位元組
+
+    UTF-8 字元最多 3 個接續位元組，通常幾輪位移就完成；
+    連續接續位元組過長時（二進位資料）改用前綴最大值計算。
+    """
+    chained = np.zeros_like(cont)
+    chained[1:] = cont[1:] & lead[:-1]
+    frontier = chained
+    for _ in range(rounds):
+        grown = np.zeros_like(cont)
+        grown[1:] = frontier[:-1] & cont[1:]
+        if not grown.any():
+            return chained
+        chained |= grown
+        frontier = grown
+    index = np.arange(len(cont), dtype=np.int64)
+    last = np.maximum.accumulate(np.where(cont, -1, index))
+    return cont & (last >= 0) & lead[np.maximum(last, 0)]
+
+
 def save_translation_file(strings, out_path):
     # """輸出 translation.txt 到資料夾"""
     # with open(out_path, "w", encoding="utf-8") as f:
     #     for offset, text in strings.items():
     #         f.write(f"{offset}:{text}\n")
     """輸出 translation.txt 到資料夾，略過不符合規則的字串"""
-    skip_pattern = re.compile(r'[@{}\[\]\(\)#!\*`,\'^]+\|\<')  # 略過的奇怪字元
-
     with open(out_path, "w", encoding="utf-8") as f:
         for offset, text in strings.items():
-            # if len(text.strip()) <= 3:
-            #     continue
-
-            # 包含奇怪字元略過
-            if skip_pattern.search(text):
-                # continue
-                # 3 個字元內略過
-                if len(text.strip()) <= 3:
-                    continue
+            if not is_exported(text):
+                continue
             f.write(f"{offset}:{text}\n")
 
 
+def is_exported(text):
+    """是否寫入 translation.txt（未寫入的字串不會被修改）"""
+    # if len(text.strip()) <= 3:
+    #     return False
+
+    # 包含奇怪字元略過
+    if SKIP_PATTERN.search(text):
+        # return False
+        # 3 個字元內略過
+        if len(text.strip()) <= 3:
+            return False
+    return True
+
+
 def load_translation_file(path):
     """讀取 translation.txt"""
     trans = {}
@@ -64,87 +284,658 @@ def load_translation_file(path):
     return trans
 
 
-def apply_translation(nro_path, translations):
-    """將翻譯套用到 NRO，支援長度超過截斷或推移"""
-    with open(nro_path, "rb") as f:
-        data = bytearray(f.read())
-
-    offsets_sorted = sorted(translations.keys())
-    shift = 0  # 累計推移量
-
-    for offset in offsets_sorted:
-        orig_offset = offset
-        offset += shift  # 調整 offset
-
-        new_text = translations[orig_offset]
-        new_bytes = new_text.encode("utf-8")
-
-        # 使用原始字串長度，而非遇到 \x00 停止
-        old_text = translations.get(orig_offset, None)
-        if old_text is None:
-            # 若 translations 裡不存在原字串，就從 data 裡讀 1~255 bytes 假設長度
-            old_len = 1
-            while offset + old_len < len(data) and data[offset + old_len] != 0:
-                old_len += 1
-            old_bytes = data[offset:offset + old_len]
-        else:
-            old_bytes = translations[orig_offset].encode("utf-8")
-
-        # 如果 new_bytes 長度超過原本
-        if len(new_bytes) > len(old_bytes):
-            print(f"\n⚠️ 長度超過原文（原:{len(old_bytes)} / 新:{len(new_bytes)}），offset {offset}")
-            # choice = input("是否截斷寫入？(Y=截斷, N=推移資料) [預設 Y]: ").strip().lower()
-            choice = "y"  # 預設截斷寫入
-
-            if choice == "" or choice == "y":
-                # 截斷寫入
-                new_bytes = new_bytes[:len(old_bytes)]
-                data[offset:offset + len(new_bytes)] = new_bytes
-                continue
-            else:
-                # 推移資料模式
-                diff = len(new_bytes) - len(old_bytes)
-                data[offset + len(old_bytes):] = b"\x00" * diff + data[offset + len(old_bytes):]
-                data[offset:offset + len(new_bytes)] = new_bytes
-                shift += diff  # 累計偏移
-                continue
-
-        # 正常覆蓋（小於原長補零）
-        if len(new_bytes) < len(old_bytes):
-            new_bytes += b"\x00" * (len(old_bytes) - len(new_bytes))
-        data[offset:offset + len(new_bytes)] = new_bytes
+def apply_translation(nro_path, translations, lengths=None, mode=DEFAULT_MODE):
+    """將翻譯套用到 NRO 檔案（直接覆蓋原檔）"""
+    with open_mapped(nro_path) as data:
+        data = apply_translation_bytes(data, translations, lengths, mode)
 
     # 直接覆蓋原檔
     with open(nro_path, "wb") as f:
         f.write(data)
 
 
+def build_patches(data, translations, lengths=None):
+    """整理成依 offset 排序的 (offset, 原長度, 新 bytes) 清單
+
+    lengths 為 extract_strings_from_bytes 記錄的原字串長度；
+    沒有記錄時，從 data 讀到 \x00 為止當作原長度。
+    """
+    patches = []
+    for offset in sorted(translations):
+        old_len = lengths.get(offset) if lengths else None
+        if old_len is None:
+            end = data.find(b"\x00", offset)
+            old_len = (end if end != -1 else len(data)) - offset
+        patches.append((offset, old_len, translations[offset].encode("utf-8")))
+    return patches
+
+
+def apply_patches(data, patches, mode="truncate"):
+    """由排序好的 patch 清單一次往前組出新內容（線性時間）
+
+    mode="truncate": 超過原長度截斷（不切斷 UTF-8 字元），總長度不變
+    mode="shift"   : 超過原長度時插入，後面的資料往後推移
+    較短的翻譯一律補 \x00 到原長度。
+    """
+    view = memoryview(data)
+    pieces = []
+    pos = 0
+    for offset, old_len, new_bytes in patches:
+        if offset < pos:
+            continue  # 與前一筆重疊
+        pieces.append(view[pos:offset])
+        if len(new_bytes) > old_len:
+            print(f"\n⚠️ 長度超過原文（原:{old_len} / 新:{len(new_bytes)}），offset {offset}")
+            if mode == "truncate":
+                new_bytes = truncate_utf8(new_bytes, old_len)
+        if len(new_bytes) < old_len:
+            new_bytes += b"\x00" * (old_len - len(new_bytes))
+        pieces.append(new_bytes)
+        pos = offset + old_len
+    pieces.append(view[pos:])
+    return b"".join(pieces)
+
+
+def truncate_utf8(data, size):
+    """截斷到 size bytes 以內，且不切在 UTF-8 多位元組字元中間"""
+    if len(data) <= size:
+        return data
+    while size > 0 and (data[size] & 0xC0) == 0x80:
+        size -= 1
+    return data[:size]
+
+
+def apply_translation_bytes(data, translations, lengths=None, mode=DEFAULT_MODE):
+    """將翻譯套用到記憶體中的 NRO，支援長度超過時搬移、截斷或推移"""
+    # choice = input("是否截斷寫入？(Y=截斷, N=推移資料) [預設 Y]: ").strip().lower()
+    patches = build_patches(data, translations, lengths)
+    if mode == "relocate":
+        return relocate_patches(data, patches)
+    return apply_patches(data, patches, mode)
+
+
+###############################################
+# NRO 格式
+###############################################
+
+NRO_MAGIC = b"NRO0"
+ASSET_MAGIC = b"ASET"
+NRO_HEADER_SIZE = 0x80
+NACP_LANG_ENTRIES = 16
+NACP_ENTRY_SIZE = 0x300
+
+
+def parse_nro_header(data):
+    """解析 NRO 標頭，回傳各段 (offset, size)；不是 NRO 時回傳 None
+
+    NRO 檔案即記憶體映像，段落的檔案 offset 等於載入後的相對位址。
+    """
+    if len(data) < NRO_HEADER_SIZE or data[0x10:0x14] != NRO_MAGIC:
+        return None
+    size = struct.unpack_from("<I", data, 0x18)[0]
+    text, ro, rw = (struct.unpack_from("<II", data, 0x20 + i * 8) for i in range(3))
+    bss_size = struct.unpack_from("<I", data, 0x38)[0]
+    mod0_offset = struct.unpack_from("<I", data, 0x04)[0]
+    for offset, seg_size in (text, ro, rw):
+        if offset + seg_size > min(size, len(data)):
+            return None
+    return {
+        "size": size,
+        "text": text,
+        "ro": ro,
+        "data": rw,
+        "bss_size": bss_size,
+        "mod0": mod0_offset,
+    }
+
+
+def parse_nro_assets(data, header):
+    """解析 NRO 後面的 ASET 資源區，回傳 icon / nacp / romfs 的絕對 (offset, size)"""
+    base = header["size"]
+    if data[base:base + 4] != ASSET_MAGIC:
+        return None
+    icon, nacp, romfs = (struct.unpack_from("<QQ", data, base + 8 + i * 16) for i in range(3))
+    return {name: (base + offset, size) for name, (offset, size) in
+            (("icon", icon), ("nacp", nacp), ("romfs", romfs))}
+
+
+###############################################
+# 字串搬移（超過原長度時）
+###############################################
+#
+# NRO 載入後即為檔案本身的映像，位址 = 檔案 offset。
+# 超長字串寫到 .rodata 尾端的空白區，再把指向原字串的參照改到新位置：
+#   - .text 內的 ADRP + ADD 與 ADR。編譯器常把 ADD 排在幾個指令之後，因此 ADRP 之後
+#     追蹤目的暫存器最多 ADRP_WINDOW 個指令：中間沒有分支、分支目標或其他讀取，
+#     且 ADD 之後該暫存器被覆寫（或 ADD 直接寫回同一暫存器），才算這個 ADD 專用的 ADRP
+#   - .rela.dyn 內 R_AARCH64_RELATIVE 的 addend（及其指向的指標欄位）
+#   - .relr.dyn 列出的指標欄位
+# 原位置仍寫入截斷後的翻譯，萬一有未找到的參照也不會顯示亂碼。
+# 空白區不使用程式碼可能讀取的頁面：無法配對 ADD 的 ADRP（ADRP + LDR 等）與 LDR (literal)
+# 的目標所在的 4 KB 頁面都排除，避免搬來的字串蓋掉程式以這些方式讀取的 \x00 資料。
+# 改寫後逐一解碼每個參照，確認都指向搬移後的字串。
+
+DT_NULL = 0
+DT_RELA = 7
+DT_RELASZ = 8
+DT_RELRSZ = 35
+DT_RELR = 36
+R_AARCH64_RELATIVE = 1027
+RELOCATE_ALIGN = 16
+PAGE_SIZE = 0x1000
+ADRP_WINDOW = 32   # ADRP 之後追蹤目的暫存器的指令數
+
+# 直接分支：(mask, value, 位移欄位起點, 位元數)
+BRANCH_FORMS = (
+    (0x7C000000, 0x14000000, 0, 26),   # B / BL
+    (0xFF000010, 0x54000000, 5, 19),   # B.cond
+    (0x7E000000, 0x34000000, 5, 19),   # CBZ / CBNZ
+    (0x7E000000, 0x36000000, 5, 14),   # TBZ / TBNZ
+)
+
+
+def _sign_extend(value, bits):
+    if value & (1 << (bits - 1)):
+        value -= 1 << bits
+    return value
+
+
+def _adr_offset(word):
+    """ADR / ADRP 的 21 位元有號立即值"""
+    return _sign_extend((((word >> 5) & 0x7FFFF) << 2) | ((word >> 29) & 3), 21)
+
+
+def _adrp_page(word, pc):
+    return (pc & ~0xFFF) + (_adr_offset(word) << 12)
+
+
+def _is_branch(word):
+    if (word & 0xFE000000) == 0xD6000000:   # BR / BLR / RET
+        return True
+    return any((word & mask) == value for mask, value, _, _ in BRANCH_FORMS)
+
+
+def _branch_targets(words, base):
+    """.text 內直接分支的目標位址（可能從別處跳進來的位置）"""
+    if np is not None and len(words):
+        w = np.frombuffer(words, dtype=np.uint32).astype(np.int64)
+        pcs = base + np.arange(len(w), dtype=np.int64) * 4
+        targets = []
+        for mask, value, shift, bits in BRANCH_FORMS:
+            selected = (w & mask) == value
+            imm = (w[selected] >> shift) & ((1 << bits) - 1)
+            imm = np.where(imm >= 1 << (bits - 1), imm - (1 << bits), imm)
+            targets.append(pcs[selected] + imm * 4)
+        return set(np.concatenate(targets).tolist())
+    targets = set()
+    for i, word in enumerate(words):
+        for mask, value, shift, bits in BRANCH_FORMS:
+            if (word & mask) == value:
+                targets.add(base + i * 4 + (_sign_extend((word >> shift) & ((1 << bits) - 1), bits) << 2))
+                break
+    return targets
+
+
+def _register_fields(word):
+    """指令中通用暫存器欄位的位移（無法辨識的類別保守地回傳全部四個欄位）"""
+    if (word & 0x0E000000) == 0x0E000000:
+        # 浮點 / SIMD 資料處理：只有與通用暫存器互轉的 FMOV、FCVT*、SCVTF 和 DUP、INS、SMOV、UMOV 用到通用暫存器
+        if (word & 0x5F20FC00) == 0x1E200000 or (word & 0x9FE08400) == 0x0E000400:
+            return (0, 5)
+        return ()
+    if (word & 0x0A000000) == 0x08000000:                 # 載入 / 儲存
+        register_offset = (word & 0x3B200C00) == 0x38200800
+        if word & 0x04000000:                             # 浮點 / SIMD：Rt、Rt2 是向量暫存器
+            return (5, 16) if register_offset else (5,)
+        if register_offset:
+            return (0, 5, 16)
+        if (word & 0x3B000000) == 0x18000000:             # LDR (literal)
+            return (0,)
+        if (word & 0x3B000000) == 0x39000000 or (word & 0x3B200000) == 0x38000000:
+            return (0, 5)                                 # 無號 / 有號 offset、pre / post-index
+        if (word & 0x3A000000) == 0x28000000:             # LDP / STP
+            return (0, 5, 10)
+        return (0, 5, 10, 16)
+    if (word & 0x1C000000) == 0x10000000:                 # 立即值資料處理
+        if (word & 0x1F000000) == 0x10000000 or (word & 0x1F800000) == 0x12800000:
+            return (0,)                                   # ADR / ADRP、MOVZ / MOVN / MOVK
+        if (word & 0x1F800000) == 0x13800000:             # EXTR
+            return (0, 5, 16)
+        return (0, 5)
+    if (word & 0x0E000000) == 0x0A000000:                 # 暫存器資料處理
+        if (word & 0x1F000000) == 0x1B000000:             # 三來源（MADD 等）
+            return (0, 5, 10, 16)
+        return (0, 5, 16)
+    return (0, 5, 10, 16)
+
+
+def _touches(word, reg):
+    """指令的任一通用暫存器欄位是 reg"""
+    return any((word >> shift) & 0x1F == reg for shift in _register_fields(word))
+
+
+def _overwrites(word, reg):
+    """指令只寫入 reg、不讀取它（常見的幾種）"""
+    rd = word & 0x1F
+    rn = (word >> 5) & 0x1F
+    if rd != reg:
+        return False
+    if (word & 0x7F800000) in (0x52800000, 0x12800000):   # MOVZ / MOVN
+        return True
+    if (word & 0x1F000000) == 0x10000000:                 # ADR / ADRP
+        return True
+    if (word & 0xBF000000) == 0x18000000:                 # LDR (literal)
+        return True
+    if (word & 0x1F000000) == 0x11000000:                 # ADD / SUB (立即值)
+        return rn != reg
+    if (word & 0xBFC00000) == 0xB9400000:                 # LDR (無號 offset)
+        return rn != reg
+    if (word & 0x7FE0FFE0) == 0x2A0003E0:                 # MOV (ORR Xd, XZR, Xm)
+        return (word >> 16) & 0x1F != reg
+    return False
+
+
+def _adrp_add(words, i, targets, base):
+    """追蹤 words[i] 的 ADRP 的目的暫存器，回傳唯一使用它的 ADD Xd, Xn, #imm 的索引；無法確定時回傳 None
+
+    ADRP 到 ADD、以及 ADD 之後到暫存器被覆寫為止，不能有分支、分支目標或其他用到該暫存器的指令；
+    ADD 寫回同一個暫存器時不必再往後看。
+    """
+    reg = words[i] & 0x1F
+    add = None
+    for j in range(i + 1, min(i + 1 + ADRP_WINDOW, len(words))):
+        word = words[j]
+        if base + j * 4 in targets or _is_branch(word):
+            return None
+        if add is None and (word & 0xFFC00000) == 0x91000000 and (word >> 5) & 0x1F == reg:
+            add = j
+            if word & 0x1F == reg:
+                return add
+            continue
+        if _overwrites(word, reg):
+            return add
+        if _touches(word, reg):
+            return None
+    return None
+
+
+def find_code_references(data, header, pages=None):
+    """掃描 .text，回傳 {目標位址: [(種類, 指令位置, ADD 位置)]}
+
+    ADRP 的參照記錄配對的 ADD 位置，ADR 則為 None。
+    pages 為 set 時，另外加入無法確定實際位址的參照所在的頁面：
+    無法配對 ADD 的 ADRP 的目標頁面，以及 LDR (literal) 讀取的位址所在頁面。
+    """
+    refs = {}
+    text_offset, text_size = header["text"]
+    words = memoryview(data)[text_offset:text_offset + text_size - text_size % 4].cast("I")
+    targets = _branch_targets(words, text_offset)
+    for i in range(len(words)):
+        word = words[i]
+        op = word & 0x9F000000
+        if op == 0x90000000:  # ADRP
+            pc = text_offset + i * 4
+            page = _adrp_page(word, pc)
+            j = _adrp_add(words, i, targets, text_offset) if word & 0x1F != 31 else None
+            if j is None:
+                if pages is not None:
+                    pages.add(page)
+                continue
+            refs.setdefault(page + ((words[j] >> 10) & 0xFFF), []).append(("adrp", pc, text_offset + j * 4))
+        elif op == 0x10000000:  # ADR
+            pc = text_offset + i * 4
+            refs.setdefault(pc + _adr_offset(word), []).append(("adr", pc, None))
+        elif pages is not None and (word & 0x3B000000) == 0x18000000:  # LDR (literal)
+            pc = text_offset + i * 4
+            target = pc + (_sign_extend((word >> 5) & 0x7FFFF, 19) << 2)
+            pages.add(target & ~0xFFF)
+    return refs
+
+
+def find_relative_relocations(data, header):
+    """解析 MOD0 → .dynamic → .rela.dyn / .relr.dyn，回傳 {目標位址: [(種類, 位置)]}
+
+    ("rela", 項目位置)：R_AARCH64_RELATIVE，目標在 addend
+    ("relr", 指標位置)：RELR 壓縮格式，目標直接存在指標欄位
+    """
+    refs = {}
+    mod0 = header["mod0"]
+    if data[mod0:mod0 + 4] != b"MOD0":
+        return refs
+    dynamic = mod0 + struct.unpack_from("<i", data, mod0 + 4)[0]
+    tags = {}
+    pos = dynamic
+    while 0 <= pos and pos + 16 <= len(data):
+        tag, value = struct.unpack_from("<qQ", data, pos)
+        if tag == DT_NULL:
+            break
+        tags[tag] = value
+        pos += 16
+
+    rela, relasz = tags.get(DT_RELA), tags.get(DT_RELASZ)
+    if rela is not None and relasz and rela + relasz <= len(data):
+        for entry in range(rela, rela + relasz, 24):
+            _, r_info, r_addend = struct.unpack_from("<QQq", data, entry)
+            if r_info & 0xFFFFFFFF == R_AARCH64_RELATIVE:
+                refs.setdefault(r_addend, []).append(("rela", entry))
+
+    relr, relrsz = tags.get(DT_RELR), tags.get(DT_RELRSZ)
+    if relr is not None and relrsz and relr + relrsz <= len(data):
+        slots = []
+        base = 0
+        for entry in range(relr, relr + relrsz, 8):
+            value = struct.unpack_from("<Q", data, entry)[0]
+            if value & 1 == 0:
+                slots.append(value)
+                base = value + 8
+            else:
+                for bit in range(1, 64):
+                    if value >> bit & 1:
+                        slots.append(base + (bit - 1) * 8)
+                base += 63 * 8
+        for slot in slots:
+            if slot + 8 <= len(data):
+                refs.setdefault(struct.unpack_from("<Q", data, slot)[0], []).append(("relr", slot))
+    return refs
+
+
+def find_free_space(data, header, refs, relocs, pages=()):
+    """.rodata 尾端連續的 \x00 區域，排除任何被參照到的位址與 pages 中的頁面"""
+    ro_offset, ro_size = header["ro"]
+    end = ro_offset + ro_size
+    start = ro_offset + len(bytes(data[ro_offset:end]).rstrip(b"\x00"))
+    # 保留結尾的 \x00 與對齊空間
+    start = (start + RELOCATE_ALIGN * 2 - 1) // RELOCATE_ALIGN * RELOCATE_ALIGN
+    for target in list(refs) + list(relocs):
+        if start <= target < end:
+            start = (target + 0x100) // RELOCATE_ALIGN * RELOCATE_ALIGN
+    for page in sorted(pages):
+        # 頁面內任何位置都可能被讀取（讀取寬度最多 16 bytes，可能跨到下一頁開頭）
+        if page < end and page + PAGE_SIZE + RELOCATE_ALIGN > start:
+            start = page + PAGE_SIZE + RELOCATE_ALIGN
+    return min(start, end), end
+
+
+def resolve_reference(data, kind, pos, add=None):
+    """解碼參照目前指向的位址；指令已不是預期的形式時回傳 None
+
+    kind: "adrp"（pos 為 ADRP，add 為配對的 ADD）、"adr"、"rela"（pos 為項目，讀 addend）、
+    "pointer"（pos 為 64 位元指標欄位）
+    """
+    if kind == "rela":
+        return struct.unpack_from("<q", data, pos + 16)[0]
+    if kind == "pointer":
+        return struct.unpack_from("<Q", data, pos)[0]
+    word = struct.unpack_from("<I", data, pos)[0]
+    if kind == "adr":
+        return pos + _adr_offset(word) if (word & 0x9F000000) == 0x10000000 else None
+    add_word = struct.unpack_from("<I", data, add)[0]
+    if ((word & 0x9F000000) != 0x90000000 or (add_word & 0xFFC00000) != 0x91000000
+            or (add_word >> 5) & 0x1F != word & 0x1F):
+        return None
+    return _adrp_page(word, pos) + ((add_word >> 10) & 0xFFF)
+
+
+def _encode_adrp(word, pc, target):
+    imm = ((target & ~0xFFF) - (pc & ~0xFFF)) >> 12
+    if not -(1 << 20) <= imm < (1 << 20):
+        return None
+    imm &= 0x1FFFFF
+    return (word & 0x9F00001F) | ((imm & 3) << 29) | ((imm >> 2) << 5)
+
+
+def _encode_adr(word, pc, target):
+    imm = target - pc
+    if not -(1 << 20) <= imm < (1 << 20):
+        return None
+    imm &= 0x1FFFFF
+    return (word & 0x9F00001F) | ((imm & 3) << 29) | ((imm >> 2) << 5)
+
+
+def relocate_patches(data, patches):
+    """超過原長度的字串搬到空白區並改寫參照；無法搬移時才截斷
+
+    最後解碼每個改寫過的參照，確認都指向搬移後的字串。
+    """
+    header = parse_nro_header(data)
+    if header is None:
+        return apply_patches(data, patches, "truncate")
+
+    out = bytearray(data)
+    moved = []    # 搬移後的 (位址, 內容)
+    checks = []   # 改寫過的 (種類, 位置, ADD 位置, 應指向的位址)
+    refs = relocs = None
+    free = free_end = None
+
+    for offset, old_len, new_bytes in patches:
+        if len(new_bytes) > old_len:
+            if refs is None:
+                pages = set()
+                refs = find_code_references(data, header, pages)
+                relocs = find_relative_relocations(data, header)
+                free, free_end = find_free_space(data, header, refs, relocs, pages)
+            code_refs = refs.get(offset, [])
+            rela_refs = relocs.get(offset, [])
+            size = len(new_bytes) + 1
+            if (code_refs or rela_refs) and free + size <= free_end:
+                new_words = []
+                for kind, pc, add_pc in code_refs:
+                    word = struct.unpack_from("<I", data, pc)[0]
+                    if kind == "adrp":
+                        add = struct.unpack_from("<I", data, add_pc)[0]
+                        new_words.append((pc, _encode_adrp(word, pc, free)))
+                        new_words.append((add_pc, (add & ~(0xFFF << 10)) | ((free & 0xFFF) << 10)))
+                    else:
+                        new_words.append((pc, _encode_adr(word, pc, free)))
+                if all(word is not None for _, word in new_words):
+                    for pc, word in new_words:
+                        struct.pack_into("<I", out, pc, word)
+                    checks.extend((kind, pc, add_pc, free) for kind, pc, add_pc in code_refs)
+                    for kind, pos in rela_refs:
+                        if kind == "rela":
+                            struct.pack_into("<q", out, pos + 16, free)
+                            checks.append(("rela", pos, None, free))
+                            slot = struct.unpack_from("<Q", data, pos)[0]
+                            if slot + 8 > len(data) or struct.unpack_from("<Q", data, slot)[0] != offset:
+                                continue
+                        else:
+                            slot = pos
+                        struct.pack_into("<Q", out, slot, free)
+                        checks.append(("pointer", slot, None, free))
+                    out[free:free + size] = new_bytes + b"\x00"
+                    moved.append((free, new_bytes + b"\x00"))
+                    free = (free + size + RELOCATE_ALIGN - 1) // RELOCATE_ALIGN * RELOCATE_ALIGN
+            else:
+                print(f"\n⚠️ 長度超過原文且無法搬移（原:{old_len} / 新:{len(new_bytes)}），offset {offset}，截斷寫入")
+            new_bytes = truncate_utf8(new_bytes, old_len)
+        new_bytes += b"\x00" * (old_len - len(new_bytes))
+        out[offset:offset + old_len] = new_bytes
+
+    if not verify_relocations(out, moved, checks):
+        print("\n⚠️ 搬移驗證失敗，改用截斷模式")
+        return apply_patches(data, patches, "truncate")
+    return bytes(out)
+
+
+def verify_relocations(data, moved, checks):
+    """解碼每個改寫過的 ADRP/ADD、ADR、RELA、指標欄位，確認都指向搬移後的字串，且字串完整"""
+    for target, content in moved:
+        if data[target:target + len(content)] != content:
+            return False
+    return all(resolve_reference(data, kind, pos, add) == target for kind, pos, add, target in checks)
+
+
 ###############################################
 # 字典機制
 ###############################################
 
 def load_dict(dict_path):
-    if os.path.isfile(dict_path):
-        with open(dict_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    """讀取字典（經由字典包，不解析 JSON）；不存在時回傳空 dict"""
+    section = dict_pack.get_section(dict_path)
+    return dict(section.items()) if section is not None else {}
+
+
+def get_dict(base):
+    """取得 dict/<base>.json 的唯讀字典（字典包的區段，查詢時才讀取）"""
+    section = dict_pack.get_section(os.path.join(DICT_FOLDER, f"{base}.json"))
+    return section if section is not None else {}
+
+
+MATCHER_ENTRIES = 64   # 行程內保留的 DictMatcher 數量上限
+STORE_ENTRIES = 64     # 行程內保留的翻譯庫數量上限
+
+_matcher_cache = warm_cache.LRUCache(MATCHER_ENTRIES)   # 字典路徑 → (字典指紋, DictMatcher)
+_matcher_lock = threading.Lock()
+
+
+def get_matcher(base):
+    """取得 dict/<base>.json 編譯後的 DictMatcher（磁碟快取 + 行程內快取）；沒有字典時回傳 None"""
+    dict_path = os.path.join(DICT_FOLDER, f"{base}.json")
+    with _matcher_lock:
+        section = dict_pack.get_section(dict_path)
+        if section is None:
+            return None
+        cached = _matcher_cache.get(dict_path)
+        if cached is None or cached[0] != section.fingerprint:
+            cached = (section.fingerprint, load_matcher(dict_path))
+            _matcher_cache.put(dict_path, cached)
+        elif cached[1].exact is not section:
+            cached[1].attach(section)   # 字典包重新編譯但這個字典沒變：改接新字典包的區段
+        return cached[1]
+
+
+def release_packs():
+    """關閉已被取代的字典包（長駐模式在兩次建置之間呼叫，此時沒有執行中的轉換）
+
+    快取中字典沒變的 DictMatcher 先改接目前字典包的區段，字典已變更的移出快取，
+    之後不再有人引用舊字典包。回傳關閉的數量。
+    """
+    with _matcher_lock:
+        pack = dict_pack.open_pack()
+        for dict_path, (fingerprint, matcher) in _matcher_cache.snapshot():
+            section = pack.section(dict_path)
+            if section is None or section.fingerprint != fingerprint:
+                _matcher_cache.pop(dict_path)
+            elif matcher.exact is not section:
+                matcher.attach(section)
+        return dict_pack.close_retired()
+
+
+_store_cache = warm_cache.LRUCache(STORE_ENTRIES)   # 路徑 → (mtime, entries)
+
+
+def get_store(base):
+    """translation/<base>.store.json 的翻譯庫（行程內快取，依修改時間更新）；沒有或是空的時回傳 None
+
+    每次回傳新的 TranslationStore，共用讀進來的 entries，可在多個執行緒中各自 anchor(learn=False)。
+    """
+    path = translation_store.store_path(base, TRANS_FOLDER)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _matcher_lock:
+        cached = _store_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, translation_store.TranslationStore.load(path).entries)
+            _store_cache.put(path, cached)
+    if not cached[1]:
+        return None
+    return translation_store.TranslationStore(path, cached[1])
 
 
 def save_dict(dict_path, new_pairs):
-    """新增/覆蓋詞典，不清空舊資料"""
+    """新增/覆蓋詞典，不清空舊資料；JSON 是編輯來源，字典包下次開啟時自動重建"""
     old = load_dict(dict_path)
     old.update(new_pairs)
     with open(dict_path, "w", encoding="utf-8") as f:
         json.dump(old, f, ensure_ascii=False, indent=2)
+    _matcher_cache.pop(dict_path)
+
+
+###############################################
+# 函式庫介面
+###############################################
+
+def merge_dictionary(strings, dict_data):
+    """字典完全符合的字串才替換"""
+    merged_strings = strings.copy()
+    for off, text in merged_strings.items():
+        if text in dict_data:
+            merged_strings[off] = dict_data[text]
+    return merged_strings
+
+
+def translate_binary(data, dictionary, spans=None, store=None):
+    """在記憶體中翻譯 NRO / OVL，回傳新的內容
+
+    dictionary 可以是 dict 或已編譯的 DictMatcher。
+    spans 為已算好的 extract_string_spans(data)，省略時在此掃描。
+    store 為 translation_store.TranslationStore（見 get_store），其譯文優先於字典。
+    結果與不匯入 txt 時的 main() 相同，只是不寫任何檔案（翻譯庫也不寫回）。
+    """
+    if not dictionary and not store:
+        return data
+    if dictionary and not isinstance(dictionary, DictMatcher):
+        dictionary = DictMatcher(dictionary)
+
+    if spans is None:
+        with metrics.stage("nro_scan", len(data)):
+            spans = extract_string_spans(data)
+    offsets, sizes = spans
+    changed = {}
+    if dictionary:
+        with metrics.stage("nro_match"):
+            changed = dictionary.apply_spans(data, offsets, sizes)
+    if store:
+        lengths = {}
+        strings = decode_spans(data, offsets, sizes, lengths)
+        with metrics.stage("anchor"):
+            anchored, _, _ = store.anchor(strings, learn=False)
+        for key, value in store.stats.items():
+            metrics.count(f"store_{key}", value)
+        for offset, text in anchored.items():
+            changed[offset] = (lengths[offset], strings[offset], text)
+
+    final_apply = {}
+    lengths = {}
+    for offset, (size, orig_text, text) in changed.items():
+        if not is_exported(text):
+            continue
+        # translation.txt 一行一筆，換行後的內容不會被讀回
+        new_text = text.split("\n", 1)[0]
+        if new_text != orig_text:
+            final_apply[offset] = new_text
+            lengths[offset] = size
+
+    if not final_apply:
+        return data
+    metrics.count("nro_patches", len(final_apply))
+    with metrics.stage("nro_patch", len(data)):
+        return apply_translation_bytes(data, final_apply, lengths)
 
 
 ###############################################
 # 主流程
 ###############################################
 
-def main(nro_path):
-    script_folder = os.path.dirname(os.path.abspath(__file__))  # A 資料夾
+def is_meaningful_text(s):
+    """是否為可翻譯文字（含英數字或中日韓文字）"""
+    if s.strip() == "":
+        return False
+    if MEANINGFUL_PATTERN.search(s):
+        return True
+    return False
+
+
+def main(nro_path, assets=False, export=False, import_txt=None, pending=False):
+    """翻譯 NRO / OVL（直接覆蓋原檔）
 
+    字典與翻譯庫 translation/<base>.store.json 的譯文合併後套用，翻譯庫優先。
+    export     : 另外輸出以 offset 為鍵的 translation/<base>.txt
+    import_txt : 讀取以「這個版本」offset 為鍵的 txt，把修改記入翻譯庫
+    pending    : 輸出翻譯庫對不上的字串（新字串與譯法不唯一者）到 translation/<base>.pending.txt
+    """
     # print("請將 NRO / OVL 檔案拖曳到此視窗，按 Enter:")
     # nro_path = input().strip('"').strip()
 
@@ -157,7 +948,10 @@ def main(nro_path):
         print("❌ 只能處理 .nro 或 .ovl！")
         return
 
-    nro_folder = os.path.dirname(os.path.abspath(nro_path))     # B 資料夾
+    if import_txt and not os.path.isfile(import_txt):
+        print("❌ 翻譯文件不存在！")
+        return
+
     base = os.path.splitext(os.path.basename(nro_path))[0]
     os.makedirs(TRANS_FOLDER, exist_ok=True)
     translation_txt = os.path.join(TRANS_FOLDER, f"{base}.txt")
@@ -165,87 +959,125 @@ def main(nro_path):
     dict_path = os.path.join(DICT_FOLDER, f"{base}.json")
 
     # print("🔍 正在讀取字串...")
-    strings = extract_strings(nro_path)
+    # 以 mmap 讀取，寫回 NRO 前關閉
+    with open_mapped(nro_path) as data:
+        size = len(data)
+        lengths = {}
+        with metrics.stage("nro_scan", len(data)):
+            strings = extract_strings_from_bytes(data, lengths)
 
-    ###############################################
-    # 若字典存在 → 自動套用
-    ###############################################
-    dict_data = load_dict(dict_path)
-    use_dict = False
+        ###############################################
+        # 若字典存在 → 自動套用
+        ###############################################
+        dict_data = dict_pack.get_section(dict_path)
+        use_dict = False
 
-    if dict_data:
-        # print(f"偵測到字典 {base}.json")
-        # print("是否使用字典自動替換？(Y/N)：")
-        # ans = input().strip().lower()
-        use_dict = bool(dict_data)
+        if dict_data:
+            # print(f"偵測到字典 {base}.json")
+            # print("是否使用字典自動替換？(Y/N)：")
+            # ans = input().strip().lower()
+            use_dict = bool(dict_data)
+
+        merged_strings = strings.copy()
+
+        # 若使用字典 → 完全符合行替換，中文詞條也會替換字串內的片段
+        if use_dict:
+            with metrics.stage("nro_match"):
+                merged_strings = load_matcher(dict_path).apply(data, strings, lengths)
+
+        if assets:
+            asset_strings = extract_asset_strings(data)
+            with open(os.path.join(TRANS_FOLDER, f"{base}.assets.txt"), "w", encoding="utf-8") as f:
+                for section, section_strings in asset_strings.items():
+                    f.write(f"# {section}\n")
+                    for offset, text in section_strings.items():
+                        f.write(f"{offset}:{text}\n")
 
     ###############################################
-    # 產生 translation.txt
+    # 翻譯庫：依內容與上下文對回這個版本的 offset
     ###############################################
-    merged_strings = strings.copy()
+    store = translation_store.load_store(base, TRANS_FOLDER)
+    with metrics.stage("anchor"):
+        anchored, ambiguous, new = store.anchor(strings)
+    merged_strings.update(anchored)
+    for key, value in store.stats.items():
+        metrics.count(f"store_{key}", value)
+    if len(store):
+        print(f"翻譯庫: 沿用 {store.stats['hit']}，位置變動 {store.stats['moved']}，"
+              f"待確認 {store.stats['ambiguous']}")
 
-    # 若使用字典 → 完全符合行才會替換
-    if use_dict:
-        for off, text in merged_strings.items():
-            if text in dict_data:
-                merged_strings[off] = dict_data[text]
+    ###############################################
+    # 匯入使用者修改的 txt → 記入翻譯庫
+    ###############################################
+    if import_txt:
+        with metrics.stage("import"):
+            user_trans = load_translation_file(import_txt)
+        skipped = 0
+        for offset, new_text in user_trans.items():
+            orig_text = strings.get(offset)
+            if orig_text is None:
+                skipped += 1   # 不是這個版本的字串開頭
+                continue
+            merged_strings[offset] = new_text
+            # 只對「可翻譯文字」記入翻譯庫
+            if is_meaningful_text(orig_text):
+                store.record(strings, offset, new_text)
+        if skipped:
+            print(f"⚠️ {import_txt}: {skipped} 行的 offset 不在這個版本中，已略過")
 
-    save_translation_file(merged_strings, translation_txt)
+    if store.save():
+        print(f"📘 已更新翻譯庫: {store.path}（{len(store)} 筆）")
 
     ###############################################
-    # 自動匯入翻譯後的 txt
+    # 匯出 translation.txt / 待確認清單（選用）
     ###############################################
-    input_txt = translation_txt
-    if not os.path.isfile(input_txt):
-        print("❌ 翻譯文件不存在！")
-        return
+    if export:
+        with metrics.stage("export"):
+            save_translation_file(merged_strings, translation_txt)
 
-    user_trans = load_translation_file(input_txt)
+    if pending:
+        flagged = sorted(set(ambiguous).union(
+            offset for offset in new
+            if merged_strings[offset] == strings[offset] and is_meaningful_text(strings[offset])))
+        save_translation_file({offset: strings[offset] for offset in flagged},
+                              os.path.join(TRANS_FOLDER, f"{base}.pending.txt"))
 
     ###############################################
-    # 變更偵測：只有使用者有改的才加入 + 必須是可翻譯文字
+    # 變更偵測：只有真正不同的才套用
     ###############################################
     final_apply = {}
-    dict_add = {}
-
-    def is_meaningful_text(s):
-        if s.strip() == "":
-            return False
-        if re.search(r'[A-Za-z0-9\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7af]', s):
-            return True
-        return False
-
     for offset, orig_text in strings.items():
-        if offset not in user_trans:
-            continue  # 使用者刪掉 → 不修改
-
-        new_text = user_trans[offset].rstrip("\n")
-
-        # 只有「真正不同」才視為翻譯
+        text = merged_strings[offset]
+        if not is_exported(text):
+            continue  # 不輸出的字串不修改
+        # translation.txt 一行一筆，換行後的內容不會被讀回
+        new_text = text.split("\n", 1)[0]
         if new_text != orig_text:
-
-            # 只對「可翻譯文字」加入字典
-            if is_meaningful_text(orig_text):
-                dict_add[orig_text] = new_text
-
             final_apply[offset] = new_text
 
-    ###############################################
-    # 存 dictionary（若有變更）
-    ###############################################
-    # if dict_add:
-    #     print(f"📘 準備更新字典: {dict_path}（新增/修改 {len(dict_add)} 筆）")
-    #     save_dict(dict_path, dict_add)
-    #     print(f"✅ 已更新字典: {dict_path}")
-    # else:
-    #     print("ℹ️ 使用者無修改 → 不更新字典")
-
     ###############################################
     # 輸出 translated.nro
     ###############################################
-    apply_translation(nro_path, final_apply)
+    metrics.count("nro_patches", len(final_apply))
+    with metrics.stage("nro_patch", size):
+        apply_translation(nro_path, final_apply, lengths)
     # print(f"✅ 已生成")
 
 if __name__ == "__main__":
-    import sys
-    main(sys.argv[1])
+    import argparse
+    parser = argparse.ArgumentParser(description="NRO / OVL 字串翻譯")
+    parser.add_argument("nro_path")
+    parser.add_argument("--assets", action="store_true",
+                        help="另外輸出 NACP / RomFS 字串到 translation/<base>.assets.txt")
+    parser.add_argument("--export", action="store_true",
+                        help="另外輸出以 offset 為鍵的 translation/<base>.txt")
+    parser.add_argument("--import", dest="import_txt", metavar="TXT",
+                        help="把 offset:譯文 格式的 txt（offset 須為這個版本）記入翻譯庫")
+    parser.add_argument("--pending", action="store_true",
+                        help="輸出翻譯庫對不上的字串到 translation/<base>.pending.txt")
+    args = parser.parse_args()
+    with metrics.collect(os.path.basename(args.nro_path)) as nro_metrics:
+        metrics.run_profiled(main, args.nro_path, args.assets, args.export, args.import_txt, args.pending)
+    record = dict(nro_metrics.to_dict(), type="nro")
+    print(metrics.format_stages(record))
+    metrics.write_report([record])
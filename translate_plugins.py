@@ -2,28 +2,110 @@
 import os
 import re
 import json
+import mmap
 import time
 import requests
 import zipfile
-import io
 import hashlib
-import subprocess
+import codecs
+import struct
+import zlib
 import shutil
+import tempfile
+import argparse
+import contextlib
+from functools import partial
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+import dict_pack
+import translate_nro
+import string_index
+import translation_store
+import warm_cache
+import offline_converter
+from downloader import Downloader, FAILED
+from zhconvert_client import ZhConvertError
+from conversion_cache import ConversionCache, SPAN_PATTERN, HAN_PATTERN, iter_spans
 
 # ----------------------------
 # 配置
 # ----------------------------
-MAIN_ZIP_URL = "https://dl.awa.cool/hahappify/xlcj/qun.zip"
+MAIN_ZIP_URL = "https://dl.awa.cool/hahappify/xlcj/qun.zip"   # 整合包，內含多個外掛 ZIP
+ARCHIVE_URL_PREFIXES = [
+    "https://dl.awa.cool/hahappify/nro/",
+    "https://dl.awa.cool/hahappify/xlcj/",
+]
+MIRROR_URL = os.environ.get("MIRROR_URL", "https://dl.awa.cool/")   # 下載來源（測試時指向 mirror_stub.py）
 REMOTE_DICT_U_URL = "https://raw.githubusercontent.com/SwitchScriptTW/More/refs/heads/main/dict_url.json"
 # REMOTE_DICT_S_URL = "https://raw.githubusercontent.com/SwitchScriptTW/More/refs/heads/main/dict_string.json"
-TEMP_DIR = "./temp"           # 臨時下載與解壓
+TEMP_DIR = "./temp"           # 大型檔案的暫存
 OUTPUT_DIR_HANS = "./Hans"    # 原始簡體 ZIP
 # OUTPUT_DIR_HANT = "./Hant"    # 繁體 ZIP
 RELEASES_DIR = "./releases"      # 翻譯後 ZIP 檔案 (用於 Releases)
-
-DICT_STRING_FILE = "./dict_string.json"
+DOWNLOAD_JOBS = 4                # 同時下載數量
+SPOOL_THRESHOLD = 8 * 1024 * 1024  # ZIP 內超過此大小的檔案暫存到 TEMP_DIR，其餘留在記憶體
+COPY_CHUNK = 1024 * 1024
+COMPRESS_THREADS = os.cpu_count() or 1   # 每個 ZIP 同時壓縮的檔案數
+NESTED_THREADS = os.cpu_count() or 1     # 每個 ZIP 同時處理的內層 ZIP 數
+NESTED_SEPARATOR = "!/"                  # 內層 ZIP 的檔案在 manifest 展開與反向索引中的檔名: 外層!/內層
+DATA_DESCRIPTOR_FLAG = 0x08
+# write_raw_member / copy_member 直接操作 zipfile 的內部屬性，以 CPython 3.11 測試；
+# 其他版本缺少這些屬性時改走 zipfile 的公開介面（內容相同，但要重新解壓 / 壓縮）
+RAW_ZIP = (all(hasattr(zipfile, name) for name in ("structFileHeader", "sizeFileHeader", "stringFileHeader",
+                                                    "_FH_FILENAME_LENGTH", "_FH_EXTRA_FIELD_LENGTH"))
+           and hasattr(zipfile.ZipFile, "_writecheck"))
+
+DICT_STRING_FILE = "./dict_string.json"   # 舊格式，只用於自動轉換
+SPAN_CACHE_FILE = "./dict_span.jsonl"
+MANIFEST_FILE = "./build_manifest.json"   # 增量建置紀錄
+INDEX_FILE = string_index.INDEX_FILE       # 原文字串 → (ZIP, 檔案, offset) 的反向索引
+
+# 影響輸出結果的程式碼，修改後全部重建
+PIPELINE_SOURCES = [
+    "./translate_plugins.py",
+    "./translate_nro.py",
+    "./dict_matcher.py",
+    "./dict_pack.py",
+    "./conversion_cache.py",
+    "./string_index.py",
+    "./translation_store.py",
+]
 DICT_URL_FILE = "./dict_url.json"
 
+# 長駐模式 (--watch)
+WATCH_PATHS = [translate_nro.DICT_FOLDER, translate_nro.TRANS_FOLDER, DICT_URL_FILE, SPAN_CACHE_FILE, OUTPUT_DIR_HANS]
+WATCH_INTERVAL = 0.5   # 輪詢間隔（秒）
+_warm = None           # warm_cache.WarmCache，只在長駐模式下使用
+
+BLACK_URL = []
+BLACK_ZIP = [
+    "emuiibo.zip", # 已有繁體
+    "ftpsrv.zip", # 無簡體翻譯
+    "KeyX.zip", # 已有繁體
+    "dvr-patches.zip", # 不需要翻譯
+    "DBI.zip", # 不使用，改用 ssky 的版本
+    "Breeze.zip", # 無簡體翻譯
+    "AtmoXL-Titel-Installer.zip", # 已有繁體
+    "BBI.zip", # 無簡體翻譯
+
+    "wiliwili.zip", # 已有繁體
+    "Goldleaf.zip", # 已有繁體
+    "aio-switch-updater.zip", # 已有繁體
+    "battery_desync_fix.zip", # 無簡體翻譯
+    "SwitchThemesNX.zip", # 不處理，字體問題
+    "PPSSPP.zip", # 已有繁體
+
+    "NX-Activity-Log.zip", # 已有繁體，但需要修正
+    "NX-Mod-Manager.zip",  # 已有繁體，但需要修正
+]
+BLACK_FILE = [
+    "Fizeau.nro",
+    "DClight.ovl",
+    "SysDVR.nro",
+]
+
 # ----------------------------
 # 輔助函數
 # ----------------------------
@@ -32,63 +114,16 @@ def ensure_dir(path):
         os.makedirs(path)
 
 def file_hash(path):
+    if _warm is not None:
+        return _warm.file_hash(path, read_hash)   # 長駐模式：檔案沒變時沿用
+    return read_hash(path)
+
+def read_hash(path):
     h = hashlib.sha256()
     with open(path, "rb") as f:
         h.update(f.read())
     return h.hexdigest()
 
-def download_file(url):
-    print(f"Downloading {url}")
-    time.sleep(30)
-    r = requests.get(url)
-    r.raise_for_status()
-    return r.content
-
-def zhconvert(text, lang="Taiwan"):
-    # 詞語模組
-    modules = '{"Computer":1,"Smooth":1,"Unit":1,"ProperNoun":1,"QuotationMark":1,"InternetSlang":1,"Repeat":1,"RepeatAutoFix":1,"GanToZuo":0}'
-    # 保護字詞
-    userProtectReplace = "用戶"
-    # 轉換前替換
-    userPreReplace = "插件=外掛"
-    # 轉換後替換
-    userPostReplace = "獲取=取得\n添加=新增\n下劃線=底線\n相冊=相簿"
-    args = {
-        "text": text,
-        "converter": lang,
-        "modules": modules,
-        "userPreReplace": userPreReplace,
-        "userPostReplace": userPostReplace,
-        "userProtectReplace": userProtectReplace
-    }
-    url = "https://api.zhconvert.org/convert"
-    response = requests.post(url, data=args, headers={'User-Agent': 'SwitchScriptTW_Bot/1.0 (+https://github.com/david082321)'}).content.decode("utf8")
-    try:
-        code = json.loads(response)["code"]
-        if code == 0:
-            return json.loads(response)["data"]["text"]
-        else:
-            print("Error:", response)
-            return text
-    except:
-        print("Error:", response)
-        return text
-
-def extract_zip(content, extract_to):
-    ensure_dir(extract_to)
-    z = zipfile.ZipFile(io.BytesIO(content))
-    z.extractall(extract_to)
-    return [f.filename for f in z.infolist() if not f.is_dir()]
-
-def zip_dir(folder_path, zip_path):
-    ensure_dir(os.path.dirname(zip_path))
-    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as z:
-        for root, _, files in os.walk(folder_path):
-            for f in files:
-                fullpath = os.path.join(root, f)
-                arcname = os.path.relpath(fullpath, folder_path)
-                z.write(fullpath, arcname)
-
 def load_json(path):
     if os.path.exists(path):
         with open(path, "r", encoding="utf8") as f:
@@ -100,24 +135,675 @@ def save_json(path, obj):
     with open(path, "w", encoding="utf8") as f:
         json.dump(obj, f, ensure_ascii=False, indent=2)
 
-def line_contains_chinese(line):
-    return re.search(r"[\u4e00-\u9fa5]", line) is not None
+def url_path_of(url):
+    return url.replace("https://dl.awa.cool/", "")
 
-def load_etag(path):
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf8") as f:
-            return f.read().strip()
+def download_archives(urls, jobs):
+    """以條件式 GET 更新 Hans 下的原始 ZIP；未變更的檔案不會重新下載"""
+    downloader = Downloader(pool_size=max(jobs, 1))
+    items = [(MIRROR_URL + url_path_of(url), os.path.join(OUTPUT_DIR_HANS, url_path_of(url)))
+             for url in urls]
+    try:
+        results = downloader.fetch_all(items, jobs)
+    finally:
+        downloader.close()
+    for url, status in results.items():
+        if status == FAILED:
+            print(f"Download failed: {url}")
+    print(downloader.report())
+    return downloader.stats
+
+# ----------------------------
+# 增量建置 (build manifest)
+# ----------------------------
+def compute_fingerprints(dict_url, spans):
+    """本次建置的字典指紋：文字檔看 dict_url + 片段快取，NRO 看各自的 dict/<base>.json 與翻譯庫
+
+    程式碼本身也算在內，流程修改後會全部重建。
+    """
+    code = hashlib.sha256()
+    for path in PIPELINE_SOURCES:
+        if os.path.exists(path):
+            code.update(file_hash(path).encode())
+    code = code.hexdigest()
+
+    text = hashlib.sha256(code.encode())
+    text.update(json.dumps(dict_url, ensure_ascii=False, sort_keys=True).encode("utf8"))
+    text.update(json.dumps(spans, ensure_ascii=False, sort_keys=True).encode("utf8"))
+
+    # 字典 JSON 的 sha256 記錄在字典包中（同時確保子行程開始前字典包已是最新）
+    pack = dict_pack.open_pack()
+    sources = {}
+    for path in dict_pack.pack_sources(translate_nro.DICT_FOLDER):
+        sources[string_index.member_base(path)] = pack.fingerprint(path)
+    for base in translation_store.store_bases(translate_nro.TRANS_FOLDER):
+        path = translation_store.store_path(base, translate_nro.TRANS_FOLDER)
+        sources[base] = sources.get(base, "") + file_hash(path)
+    dicts = {base: hashlib.sha256((code + fingerprint).encode()).hexdigest()
+             for base, fingerprint in sorted(sources.items())}
+    return {"code": code, "text": text.hexdigest(), "dicts": dicts}
+
+def index_dictionaries(dict_url, spans):
+    """反向索引用的字典內容（來源名稱見 string_index）"""
+    pack = dict_pack.open_pack()
+    dictionaries = {string_index.SOURCE_SPANS: spans, string_index.SOURCE_URLS: dict_url}
+    for path in dict_pack.pack_sources(translate_nro.DICT_FOLDER):
+        dictionaries[string_index.nro_source(string_index.member_base(path))] = pack.section(path)
+    for base in translation_store.store_bases(translate_nro.TRANS_FOLDER):
+        store = translate_nro.get_store(base)
+        dictionaries[string_index.store_source(base)] = store.index_entries() if store else {}
+    return dictionaries
+
+def member_fingerprint(name, fingerprints, member=None):
+    """member 為 manifest 中的項目；內層 ZIP（有 "members"）的指紋是其內部檔案指紋的組合"""
+    if member is not None and "members" in member:
+        return archive_fingerprint(member["members"], fingerprints)
+    f = os.path.basename(name)
+    if f.lower().endswith((".nro", ".ovl")) and f not in BLACK_FILE:
+        base = os.path.splitext(f)[0]
+        return fingerprints["dicts"].get(base, fingerprints["code"])
+    return fingerprints["text"]
+
+def archive_fingerprint(members, fingerprints):
+    """ZIP 內各檔案指紋的組合；只有用到的字典變更才算變更"""
+    h = hashlib.sha256()
+    for name in sorted(members):
+        h.update(f"{name}:{member_fingerprint(name, fingerprints, members[name])}\n".encode())
+    return h.hexdigest()
+
+def finalize_manifest_entry(entry, fingerprints):
+    """以本次建置結束時的指紋寫入 manifest（包含內層 ZIP 的檔案）"""
+    entry["fingerprint"] = archive_fingerprint(entry["members"], fingerprints)
+    for name, member in entry["members"].items():
+        if "members" in member:
+            finalize_manifest_entry(member, fingerprints)
+        else:
+            member["fingerprint"] = member_fingerprint(name, fingerprints)
+    return entry
+
+def flat_members(members, prefix=""):
+    """展開內層 ZIP：[(檔名, manifest 項目)]，內層 ZIP 的檔案命名為 外層檔名!/內層檔名"""
+    flat = []
+    for name, member in members.items():
+        flat.append((prefix + name, member))
+        if "members" in member:
+            flat.extend(flat_members(member["members"], prefix + name + NESTED_SEPARATOR))
+    return flat
+
+def nested_plan(index, name):
+    """反向索引判斷中屬於內層 ZIP name 的部分，去掉檔名前綴"""
+    if index is None:
+        return None
+    prefix = name + NESTED_SEPARATOR
+    return {key: {k[len(prefix):]: v for k, v in index[key].items() if k.startswith(prefix)}
+            for key in ("indexed", "clean")}
+
+# ----------------------------
+# 檔案分類
+# ----------------------------
+# 分類結果與處理方式
+KIND_TEXT = "text"        # 含中文或站內網址的文字檔 → convert_text
+KIND_NRO = "nro"          # NRO / OVL → translate_nro
+KIND_PLAIN = "plain"      # 不含中文與站內網址的文字檔 → 原樣複製
+KIND_BINARY = "binary"    # 圖片、字型、修補檔等 → 原樣複製
+KIND_SKIPPED = "skipped"  # BLACK_FILE 與簡體字典檔 → 原樣複製
+KIND_ARCHIVE = "archive"  # 內層 ZIP → repack_nested 遞迴處理
+
+BINARY_EXTENSIONS = {
+    ".nsp", ".nso", ".nca", ".kip", ".ips", ".bin", ".dat", ".flag", ".zip",
+    ".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".ttf", ".otf", ".bfttf",
+    ".wav", ".mp3", ".ogg",
+}
+MAGIC_NUMBERS = [
+    (0x00, b"\x89PNG"), (0x00, b"\xff\xd8\xff"), (0x00, b"GIF8"), (0x00, b"RIFF"),
+    (0x00, b"PK\x03\x04"), (0x00, b"\x7fELF"), (0x00, b"PFS0"), (0x00, b"NSO0"),
+    (0x00, b"KIP1"), (0x00, b"IPS32"), (0x00, b"PATCH"), (0x00, b"OTTO"),
+    (0x00, b"\x00\x01\x00\x00"), (0x10, b"NRO0"),
+]
+SNIFF_SIZE = 64 * 1024
+# U+4E00–U+9FA5 的 UTF-8 開頭位元組（略寬），或 dl.awa.cool 網址；不需解碼即可判斷
+URL_PATTERN = re.compile(r"https://dl\.awa\.cool/[^\s\"']+")
+SPAN_SPLIT_PATTERN = re.compile(f"({SPAN_PATTERN.pattern})")
+NEEDS_CONVERSION_PATTERN = re.compile(rb"[\xe4-\xe9][\x80-\xbf][\x80-\xbf]|https://dl\.awa\.cool/")
+
+def classify_member(name, spool):
+    """依副檔名、magic bytes 與開頭 SNIFF_SIZE bytes 判斷處理方式
+
+    回傳 (種類, 內容)：NRO 為 bytes、文字檔為 str，其餘不需讀取全部內容，回傳 None。
+    """
+    f = os.path.basename(name)
+    ext = os.path.splitext(f)[1].lower()
+    if f in BLACK_FILE or f.lower() == "zh-hans.json":
+        return KIND_SKIPPED, None
+    if ext in (".nro", ".ovl"):
+        return KIND_NRO, read_binary(spool)
+    if ext == ".zip" and f not in BLACK_ZIP and zipfile.is_zipfile(spool):
+        spool.seek(0)
+        return KIND_ARCHIVE, None
+    if ext in BINARY_EXTENSIONS:
+        return KIND_BINARY, None
+    head = spool.read(SNIFF_SIZE)
+    if b"\x00" in head or any(head.startswith(magic, offset) for offset, magic in MAGIC_NUMBERS):
+        return KIND_BINARY, None
+    try:
+        # 開頭可能切在多位元組字元中間，用 incremental decoder 保留未完成的部分
+        codecs.getincrementaldecoder("utf8")().decode(head)
+    except UnicodeDecodeError:
+        return KIND_BINARY, None
+    data = head + spool.read()
+    if not NEEDS_CONVERSION_PATTERN.search(data):
+        return KIND_PLAIN, None
+    try:
+        return KIND_TEXT, data.decode("utf8")
+    except UnicodeDecodeError:
+        return KIND_BINARY, None
+
+def read_binary(spool):
+    """NRO 內容：已暫存到磁碟的大檔以 mmap 讀取（用完需 close），其餘讀進記憶體"""
+    size = spool.seek(0, os.SEEK_END)
+    spool.seek(0)
+    if size <= SPOOL_THRESHOLD:
+        return spool.read()
+    return mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+
+def count_kind(counters, kind, size, seconds):
+    counter = counters.setdefault(kind, {"files": 0, "bytes": 0, "seconds": 0.0})
+    counter["files"] += 1
+    counter["bytes"] += size
+    counter["seconds"] += seconds
+
+def merge_kinds(counters, other):
+    for kind, counter in other.items():
+        total = counters.setdefault(kind, {"files": 0, "bytes": 0, "seconds": 0.0})
+        for key in total:
+            total[key] += counter[key]
+
+def format_kinds(counters):
+    parts = []
+    for kind in (KIND_TEXT, KIND_NRO, KIND_ARCHIVE, KIND_PLAIN, KIND_BINARY, KIND_SKIPPED):
+        if kind in counters:
+            c = counters[kind]
+            parts.append(f"{kind} {c['files']} 個 ({c['bytes'] / 1e6:.1f} MB, {c['seconds']:.2f} s)")
+    return "檔案分類: " + "，".join(parts) if parts else "檔案分類: 無"
+
+# ----------------------------
+# ZIP 串流重新打包
+# ----------------------------
+def spool_member(zf, info):
+    """讀出 ZIP 內的檔案（超過 SPOOL_THRESHOLD 時暫存到磁碟），回傳 (檔案物件, sha256)"""
+    h = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_THRESHOLD, dir=TEMP_DIR)
+    with zf.open(info) as src:
+        for chunk in iter(lambda: src.read(COPY_CHUNK), b""):
+            h.update(chunk)
+            spool.write(chunk)
+    spool.seek(0)
+    return spool, h.hexdigest()
+
+def new_zinfo(info, compress_type, crc, file_size, compress_size):
+    """固定屬性、沿用原始檔名與時間戳記，相同輸入每次都產生相同的 ZIP"""
+    zinfo = zipfile.ZipInfo(info.filename, info.date_time)
+    zinfo.compress_type = compress_type
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = compress_size
+    zinfo.external_attr = 0o100644 << 16
+    return zinfo
+
+def raw_zip_writable(zout):
+    """zout 是否能直接寫入已壓縮的資料（write_raw_member / copy_member 用到的 zipfile 內部屬性都在）"""
+    return RAW_ZIP and hasattr(zout, "start_dir") and hasattr(zout, "_didModify")
+
+def write_member(zout, zinfo, chunks):
+    """write_raw_member 的備用路徑：解壓後經由 zipfile 的公開介面重新壓縮寫入（stored / deflate）"""
+    decompressor = zlib.decompressobj(-15) if zinfo.compress_type == zipfile.ZIP_DEFLATED else None
+    with zout.open(zinfo, "w") as dst:
+        for chunk in chunks:
+            dst.write(decompressor.decompress(chunk) if decompressor else chunk)
+        if decompressor:
+            dst.write(decompressor.flush())
+
+def write_raw_member(zout, zinfo, chunks):
+    """將已壓縮的資料直接寫入 ZIP，不經過 zipfile 的壓縮器"""
+    if not raw_zip_writable(zout):
+        write_member(zout, zinfo, chunks)
+        return
+    zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    zout._writecheck(zinfo)
+    zout.fp.seek(zout.start_dir)
+    zinfo.header_offset = zout.fp.tell()
+    zout.fp.write(zinfo.FileHeader(zip64))
+    for chunk in chunks:
+        zout.fp.write(chunk)
+    zout.start_dir = zout.fp.tell()
+    zout.filelist.append(zinfo)
+    zout.NameToInfo[zinfo.filename] = zinfo
+    zout._didModify = True
+
+def copy_member(zout, info, src_zip, src_info):
+    """複製 src_zip 內已壓縮的資料（不解壓、不重新壓縮）"""
+    zinfo = new_zinfo(info, src_info.compress_type, src_info.CRC,
+                      src_info.file_size, src_info.compress_size)
+    if not raw_zip_writable(zout):
+        with src_zip.open(src_info) as src, zout.open(zinfo, "w") as dst:
+            shutil.copyfileobj(src, dst, COPY_CHUNK)
+        return
+
+    fp = src_zip.fp
+    fp.seek(src_info.header_offset)
+    header = struct.unpack(zipfile.structFileHeader, fp.read(zipfile.sizeFileHeader))
+    if header[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local file header: {src_info.filename}")
+    fp.seek(header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+
+    # 大小直接寫在本地標頭，不需要 data descriptor
+    zinfo.flag_bits = src_info.flag_bits & ~DATA_DESCRIPTOR_FLAG
+
+    def chunks():
+        remaining = src_info.compress_size
+        while remaining:
+            chunk = fp.read(min(COPY_CHUNK, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated file data: {src_info.filename}")
+            remaining -= len(chunk)
+            yield chunk
+    write_raw_member(zout, zinfo, chunks())
+
+def deflate_member(data):
+    """level 9 壓縮，回傳 (crc, 壓縮後 bytes)；zlib 會釋放 GIL，可在執行緒中平行處理"""
+    with metrics.stage("compress", len(data)):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+        return zlib.crc32(data), compressor.compress(data) + compressor.flush()
+
+def write_deflated(zout, info, size, future):
+    """寫入 deflate_member 的結果"""
+    crc, compressed = future.result()
+    write_raw_member(zout, new_zinfo(info, zipfile.ZIP_DEFLATED, crc, size, len(compressed)), [compressed])
+
+def convert_text(text, spans, dict_url, result):
+    """整個文字檔只掃描一次：替換站內網址、繁化中文片段，回傳新內容
+
+    片段去除重複後才查快取，快取沒有的合併成一個批次送出。
+    """
+    if "https://dl.awa.cool/" in text:
+        def replace_url(m):
+            url = m.group()
+            if url not in dict_url:
+                dict_url[url] = url  # 預設 value 等於原 URL
+                result["urls"][url] = url
+            return dict_url[url]
+        text = URL_PATTERN.sub(replace_url, text)
+
+    # split 的結果: [其他文字, 片段, 其他文字, 片段, ..., 其他文字]
+    parts = SPAN_SPLIT_PATTERN.split(text)
+    found = parts[1::2]
+    if not found:
+        return text
+
+    # 命中與未命中都以出現次數計算
+    counts = Counter(found)
+    han = [span for span in counts if HAN_PATTERN.search(span)]
+    missing = [span for span in han if span not in spans]
+    missed = sum(counts[span] for span in missing)
+    result["hits"] += sum(counts[span] for span in han) - missed
+    result["misses"] += missed
+    if missing:
+        client = offline_converter.get_converter()
+        before = client.stats
+        try:
+            with metrics.stage("converter"):
+                converted = client.convert_many(missing)
+        except ZhConvertError as e:
+            print("Error:", e)
+            converted = []
+        after = client.stats
+        metrics.count("converter_calls")
+        metrics.count("converter_requests", after["requests"] - before["requests"])
+        metrics.count("converter_offline", after["offline"] - before["offline"])
+        metrics.count("converter_fallback", after["fallback"] - before["fallback"])
+        for span, new_span in zip(missing, converted):
+            spans[span] = new_span
+            result["spans"][span] = new_span
+
+    parts[1::2] = [spans.get(span, span) for span in found]
+    return "".join(parts)
+
+def transform_member(kind, name, content, spans, dict_url, result, nro_spans=None, matchers=None):
+    """依 classify_member 的結果翻譯單一檔案，回傳新內容；不需修改時回傳 None
+
+    matchers 為呼叫端事先解析好的 {base: DictMatcher}（見 nro_matchers），沒有時在此解析。
+    """
+    if kind == KIND_NRO:
+        # 自動翻譯 *.nro / *.ovl
+        f = os.path.basename(name)
+        print(f"🔄 正在翻譯 {f} ...")
+        base = os.path.splitext(f)[0]
+        matcher = matchers[base] if matchers is not None and base in matchers else translate_nro.get_matcher(base)
+        new_data = translate_nro.translate_binary(content, matcher, nro_spans, translate_nro.get_store(base))
+        return new_data if new_data is not content else None
+    if kind == KIND_TEXT:
+        with metrics.stage("text", len(content)):
+            new_text = convert_text(content, spans, dict_url, result)
+        return new_text.encode("utf8") if new_text != content else None
     return None
 
-def save_etag(path, etag):
-    ensure_dir(os.path.dirname(path))
-    with open(path, "w", encoding="utf8") as f:
-        f.write(etag)
+def index_member(kind, content, source, nro_spans=None):
+    """反向索引的項目：NRO 為 C 字串與 bytes offset，文字檔為中文片段、站內網址與字元 offset
+
+    NRO 字串與 DictMatcher 相同，以忽略錯誤的方式解碼後再存回 UTF-8。
+    """
+    strings = []
+    with metrics.stage("index"):
+        if kind == KIND_NRO:
+            offsets, sizes = nro_spans if nro_spans is not None else translate_nro.extract_string_spans(content)
+            for offset, size in zip(offsets.tolist(), sizes.tolist()):
+                raw = content[offset:offset + size]
+                strings.append((raw.decode("utf-8", errors="ignore").encode("utf-8"), offset))
+        elif kind == KIND_TEXT:
+            strings.extend((m.group().encode("utf-8"), m.start()) for m in URL_PATTERN.finditer(content))
+            strings.extend((m.group().encode("utf-8"), m.start()) for m in iter_spans(content))
+    return {"source": source, "kind": kind, "strings": strings}
+
+def can_reuse(name, source, old, previous_zip, fingerprints, index):
+    """上次輸出的檔案是否可以直接沿用：來源相同，且字典指紋相同或反向索引確認沒用到變更的項目
+
+    內層 ZIP 只在指紋相同、且內部檔案都已索引時整個沿用，否則由 repack_nested 逐一檢查內部檔案。
+    """
+    if not old or old.get("source") != source or name not in previous_zip.NameToInfo:
+        return False
+    if "members" in old:
+        return (old.get("fingerprint") == member_fingerprint(name, fingerprints, old)
+                and (index is None or indexed_all(index["indexed"], old["members"], name + NESTED_SEPARATOR)))
+    if old.get("fingerprint") == member_fingerprint(name, fingerprints):
+        return True
+    return index is not None and index["clean"].get(name) == source
+
+def indexed_all(indexed, members, prefix=""):
+    """manifest 中的檔案（含內層 ZIP 的內部檔案）是否都已以相同的來源建立索引"""
+    return all(indexed.get(name) == member["source"] for name, member in flat_members(members, prefix))
+
+def new_result():
+    return {"spans": {}, "urls": {}, "hits": 0, "misses": 0, "kinds": {}, "manifest": None, "index": {}}
+
+def merge_nested(result, nested, name):
+    """把內層 ZIP 的結果併入外層；索引的檔名加上內層 ZIP 的檔名"""
+    result["spans"].update(nested["spans"])
+    result["urls"].update(nested["urls"])
+    result["hits"] += nested["hits"]
+    result["misses"] += nested["misses"]
+    merge_kinds(result["kinds"], nested["kinds"])
+    for key, entry in nested["index"].items():
+        result["index"][name + NESTED_SEPARATOR + key] = entry
+
+# ----------------------------
+# 單一 ZIP 處理流程
+# ----------------------------
+def process_archive(url, spans, dict_url, previous=None, fingerprints=None, index=None):
+    """讀取、繁化、翻譯 NRO 並重新打包單一 ZIP。
+
+    可在子行程中執行：spans（片段快取）/ dict_url 為呼叫端傳入的副本，
+    本函數只回傳新增的項目，由主行程統一合併寫檔，避免多個 worker 互相覆蓋。
+    previous 為上次建置的 manifest 項目，fingerprints 為本次的字典指紋；
+    來源與指紋都沒變時直接沿用上次的輸出。
+    index 為 StringIndex 對這個 ZIP 的判斷 {"indexed": {檔案: 來源}, "clean": {檔案: 來源}}：
+    clean 中的檔案即使字典指紋不同也沿用；新建或索引過期的檔案放在 result["index"]。
+    各階段的統計放在 result["metrics"]。
+    """
+    with metrics.collect(url_path_of(url)) as archive_metrics:
+        result = build_archive(url, spans, dict_url, previous, fingerprints, index)
+        archive_metrics.count("cache_hits", result["hits"])
+        archive_metrics.count("cache_misses", result["misses"])
+    result["metrics"] = dict(archive_metrics.to_dict(), type="archive")
+    return result
+
+def build_archive(url, spans, dict_url, previous, fingerprints, index):
+    result = new_result()
+
+    print(f"\n讀取網址: {url}")
+    url_path = url_path_of(url)
+    local_path_hans = os.path.join(OUTPUT_DIR_HANS, url_path)
+
+    # 原始簡體 ZIP 由 download_archives 事先下載到 Hans
+    if not os.path.exists(local_path_hans):
+        print(f"找不到 {local_path_hans}，跳過")
+        metrics.count("archive_missing")
+        return result
+
+    # 取得 ZIP 檔案名稱 (例如 DBI.zip)
+    zip_filename = os.path.basename(local_path_hans)
+
+    # 排除不需處理的 zip
+    if zip_filename in BLACK_ZIP:
+        # zip 複製到 releases
+        release_zip_path = os.path.join(RELEASES_DIR, url_path) # ./releases/hahappify/nro/DBI.zip
+        ensure_dir(os.path.dirname(release_zip_path))
+        with metrics.stage("copy", os.path.getsize(local_path_hans)):
+            shutil.copy2(local_path_hans, release_zip_path)
+        print(f"✅ 儲存到 {release_zip_path}")
+        metrics.count("archive_copied")
+        return result
+
+    # ----------------------------
+    # 增量建置：來源 ZIP 與字典都沒變 → 沿用上次的 ZIP
+    # ----------------------------
+    release_zip_path = os.path.join(RELEASES_DIR, url_path) # ./releases/hahappify/nro/DBI.zip
+    with metrics.stage("hash", os.path.getsize(local_path_hans)):
+        source_hash = file_hash(local_path_hans)
+        release_ok = (previous is not None and os.path.exists(release_zip_path)
+                      and file_hash(release_zip_path) == previous.get("output"))
+    if (release_ok and fingerprints is not None and previous.get("source") == source_hash
+            and previous.get("fingerprint") == archive_fingerprint(previous["members"], fingerprints)
+            and (index is None or indexed_all(index["indexed"], previous["members"]))):
+        print(f"⏩ 無變更，沿用 {release_zip_path}")
+        metrics.count("archive_unchanged")
+        result["manifest"] = previous
+        return result
+
+    previous_zip = zipfile.ZipFile(release_zip_path) if release_ok and fingerprints is not None else None
+    ensure_dir(os.path.dirname(release_zip_path))
+    tmp_zip_path = f"{release_zip_path}.{os.getpid()}.tmp"   # 上次的輸出仍在讀取中
+    with zipfile.ZipFile(local_path_hans) as zin:
+        members, reused = repack_archive(zin, tmp_zip_path, spans, dict_url, result,
+                                         previous if previous_zip else None, previous_zip, fingerprints, index,
+                                         source_hash)
+        bytes_in = sum(info.file_size for info in zin.infolist())
+    with metrics.stage("cleanup"):
+        if previous_zip:
+            previous_zip.close()
+        os.replace(tmp_zip_path, release_zip_path)
+        output_hash = file_hash(release_zip_path)
+    if reused:
+        print(f"⏩ 沿用 {reused}/{len(members)} 個未變更的檔案")
+
+    if url not in dict_url:
+        dict_url[url] = url
+        result["urls"][url] = url
+
+    print(f"📦 儲存到 {release_zip_path}")
+    metrics.count("archive_built")
+    metrics.count("members_reused", reused)
+    metrics.count("bytes_in", bytes_in)
+    metrics.count("bytes_out", os.path.getsize(release_zip_path))
+    result["manifest"] = {
+        "source": source_hash,
+        "output": output_hash,
+        "members": members,
+    }
+    return result
+
+def repack_archive(zin, out, spans, dict_url, result, previous, previous_zip, fingerprints, index,
+                   source=None, matchers=None):
+    """翻譯 zin 並寫入 out（路徑或檔案物件），回傳 (manifest 的 members, 沿用的檔案數)
+
+    直接從來源 ZIP 逐一讀取、轉換並寫入新的 ZIP，不解壓到磁碟：
+    - 未修改的檔案直接複製壓縮後的資料
+    - 只有部分檔案變更時，其餘檔案直接複製上次輸出（previous_zip）的壓縮資料
+    - 有修改的檔案在執行緒中平行壓縮，寫入時依檔名排序
+    - 內層 ZIP 在另一組執行緒中各自遞迴處理（repack_nested），結果寫回這一層
+    - 長駐模式下以 source（zin 的 sha256）查詢上次記錄的檔案雜湊，可沿用的檔案不必解壓
+    - 內層 ZIP 中 NRO 的 DictMatcher 在交給執行緒前解析好（matchers），執行緒不會同時重建字典包
+    """
+    members = {}
+    reused = 0
+    plan = []   # 依序寫入輸出 ZIP 的函數
+    nested = []
+    indexed = index["indexed"] if index is not None else {}
+    archive_source = source
+    with ThreadPoolExecutor(max_workers=COMPRESS_THREADS) as pool, \
+            ThreadPoolExecutor(max_workers=NESTED_THREADS) as archives:
+        infos = sorted((info for info in zin.infolist() if not info.is_dir()), key=lambda info: info.filename)
+        for info in infos:
+            name = info.filename
+            old = previous["members"].get(name) if previous_zip else None
+            source = _warm.member_source(archive_source, name) if _warm is not None else None
+            if (source is not None and can_reuse(name, source, old, previous_zip, fingerprints, index)
+                    and (index is None or indexed.get(name) == source)):
+                members[name] = old
+                plan.append(partial(copy_member, info=info, src_zip=previous_zip,
+                                    src_info=previous_zip.getinfo(name)))
+                reused += 1
+                continue
+            with metrics.stage("read", info.file_size):
+                spool, source = spool_member(zin, info)
+            with contextlib.ExitStack() as owner:
+                owner.enter_context(spool)
+                members[name] = {"source": source}
+                if can_reuse(name, source, old, previous_zip, fingerprints, index):
+                    # release_ok 已確認上次的 ZIP 與 manifest 相符
+                    if index is not None and indexed.get(name) != source:
+                        kind, content = classify_member(name, spool)
+                        result["index"][name] = index_member(kind, content, source)
+                        if isinstance(content, mmap.mmap):
+                            content.close()
+                    members[name] = old
+                    plan.append(partial(copy_member, info=info, src_zip=previous_zip,
+                                        src_info=previous_zip.getinfo(name)))
+                    reused += 1
+                    continue
+                start = time.perf_counter()
+                with metrics.stage("classify"):
+                    kind, content = classify_member(name, spool)
+                if kind == KIND_ARCHIVE:
+                    # 上次輸出的內層 ZIP 在這裡讀出：previous_zip 之後還會在寫入時使用，不能跨執行緒共用
+                    previous_spool = None
+                    if old and "members" in old and old.get("source") == source:
+                        previous_spool, _ = spool_member(previous_zip, previous_zip.getinfo(name))
+                    nested_matchers = nro_matchers(spool)
+                    owner.pop_all()   # spool 交給 repack_nested 關閉
+                    future = archives.submit(repack_nested, name, spool, source, spans, dict_url,
+                                             old if previous_spool else None, previous_spool,
+                                             fingerprints, nested_plan(index, name), nested_matchers)
+                    nested.append((name, info, source, start, future))
+                    plan.append(partial(write_nested, info=info, future=future))
+                    if index is not None:
+                        result["index"][name] = index_member(kind, None, source)
+                    continue
+                nro_spans = None
+                if kind == KIND_NRO:
+                    with metrics.stage("nro_scan", len(content)):
+                        if _warm is not None:
+                            nro_spans = _warm.spans(source, content, translate_nro.extract_string_spans)
+                        else:
+                            nro_spans = translate_nro.extract_string_spans(content)
+                data = transform_member(kind, name, content, spans, dict_url, result, nro_spans, matchers)
+                if index is not None:
+                    result["index"][name] = index_member(kind, content, source, nro_spans)
+                if isinstance(content, mmap.mmap):
+                    content.close()
+                count_kind(result["kinds"], kind, info.file_size, time.perf_counter() - start)
+            if data is None:
+                members[name]["output"] = source
+                plan.append(partial(copy_member, info=info, src_zip=zin, src_info=info))
+            else:
+                members[name]["output"] = hashlib.sha256(data).hexdigest()
+                plan.append(partial(write_deflated, info=info, size=len(data),
+                                    future=pool.submit(deflate_member, data)))
+
+        for name, info, source, start, future in nested:
+            nested_result, nested_members, nested_reused, output = future.result()
+            merge_nested(result, nested_result, name)
+            members[name] = {"source": source, "output": output["sha256"], "members": nested_members}
+            reused += nested_reused
+            count_kind(result["kinds"], KIND_ARCHIVE, info.file_size, time.perf_counter() - start)
+
+        with metrics.stage("zip"), zipfile.ZipFile(out, "w") as zout:
+            for write in plan:
+                write(zout)
+    if _warm is not None:
+        _warm.record_members(archive_source, members)
+    return members, reused
+
+def repack_nested(name, spool, source, spans, dict_url, previous, previous_spool, fingerprints, index,
+                  matchers=None):
+    """處理內層 ZIP（在執行緒中執行）：輸出先寫到 SpooledTemporaryFile，超過 SPOOL_THRESHOLD 才落到 TEMP_DIR
+
+    回傳 (result, members, 沿用的檔案數, deflate_spool 的結果)。
+    """
+    print(f"📂 處理內層 ZIP {name}")
+    result = new_result()
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_THRESHOLD, dir=TEMP_DIR)
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(spool)
+        zin = stack.enter_context(zipfile.ZipFile(spool))
+        previous_zip = None
+        if previous_spool is not None:
+            stack.enter_context(previous_spool)
+            previous_zip = stack.enter_context(zipfile.ZipFile(previous_spool))
+        try:
+            members, reused = repack_archive(zin, out, spans, dict_url, result, previous, previous_zip,
+                                             fingerprints, index, source, matchers)
+        except BaseException:
+            out.close()
+            raise
+    metrics.count("nested_archives")
+    return result, members, reused, deflate_spool(out)
+
+def nro_matchers(spool):
+    """內層 ZIP 直接包含的 NRO / OVL 的 {base: DictMatcher}；讀完後 spool 回到開頭"""
+    matchers = {}
+    with zipfile.ZipFile(spool) as zf:
+        for name in zf.namelist():
+            f = os.path.basename(name)
+            if f.lower().endswith((".nro", ".ovl")) and f not in BLACK_FILE:
+                base = os.path.splitext(f)[0]
+                matchers[base] = translate_nro.get_matcher(base)
+    spool.seek(0)
+    return matchers
+
+def deflate_spool(spool):
+    """串流版的 deflate_member：壓縮後的資料同樣暫存，回傳 {"crc", "size", "sha256", "data"}（用完關閉 data）"""
+    with spool:
+        spool.seek(0)
+        start = time.perf_counter()
+        crc, size, h = 0, 0, hashlib.sha256()
+        compressed = tempfile.SpooledTemporaryFile(max_size=SPOOL_THRESHOLD, dir=TEMP_DIR)
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+        for chunk in iter(lambda: spool.read(COPY_CHUNK), b""):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            h.update(chunk)
+            compressed.write(compressor.compress(chunk))
+        compressed.write(compressor.flush())
+        metrics.active().add("compress", time.perf_counter() - start, size)
+    compressed.seek(0)
+    return {"crc": crc, "size": size, "sha256": h.hexdigest(), "data": compressed}
+
+def write_nested(zout, info, future):
+    """寫入 repack_nested 的結果"""
+    output = future.result()[3]
+    with output["data"] as data:
+        compress_size = data.seek(0, os.SEEK_END)
+        data.seek(0)
+        zinfo = new_zinfo(info, zipfile.ZIP_DEFLATED, output["crc"], output["size"], compress_size)
+        write_raw_member(zout, zinfo, iter(lambda: data.read(COPY_CHUNK), b""))
 
 # ----------------------------
 # 主程式
 # ----------------------------
-def main():
+def main(jobs=1, download=False, converter=None, state=None):
+    """state 為長駐模式在各次建置間保留的物件（片段快取等）；None 表示一般的單次執行"""
+    run_metrics = metrics.Metrics("run")
+    run_started = time.perf_counter()
     ensure_dir(TEMP_DIR)
     ensure_dir(OUTPUT_DIR_HANS)
     # ensure_dir(OUTPUT_DIR_HANT)
@@ -125,206 +811,179 @@ def main():
     ensure_dir("./translation")
     ensure_dir("./dict")
 
-    dict_string = load_json(DICT_STRING_FILE)
+    if state is not None and state.get("cache") is not None:
+        cache = state["cache"]
+        cache.hits = cache.misses = 0
+    else:
+        cache = ConversionCache(SPAN_CACHE_FILE, DICT_STRING_FILE)
+        if state is not None:
+            state["cache"] = cache
+    if converter:
+        os.environ["ZHCONVERT_MODE"] = converter   # 子行程也依此選擇轉換方式
+    if os.environ.get("ZHCONVERT_MODE", offline_converter.MODE) != "remote":
+        # 以目前的片段快取建立本機對照表（有快取時直接載入），子行程讀取同一個快取檔
+        with run_metrics.stage("converter_build"):
+            offline_converter.prepare(cache.spans)
     dict_url = load_json(DICT_URL_FILE)
-    # 從 GitHub 取得最新 dict_url.json
-    try:
-        print("Fetching remote dict_url.json ...")
-        r = requests.get(REMOTE_DICT_U_URL, timeout=10)
-        r.raise_for_status()
-        dict_url_remote = r.json()
-        dict_url.update(dict_url_remote)   # 用遠端更新本地 dict_url
-        print("Loaded remote dict_url.json")
-    except Exception as e:
-        print(f"Failed to fetch remote dict_url.json: {e}")
-
-    black_url = []
-    black_zip = [
-        "emuiibo.zip", # 已有繁體
-        "ftpsrv.zip", # 無簡體翻譯
-        "KeyX.zip", # 已有繁體
-        "dvr-patches.zip", # 不需要翻譯
-        "DBI.zip", # 不使用，改用 ssky 的版本
-        "Breeze.zip", # 無簡體翻譯
-        "AtmoXL-Titel-Installer.zip", # 已有繁體
-        "BBI.zip", # 無簡體翻譯
-
-        "wiliwili.zip", # 已有繁體
-        "Goldleaf.zip", # 已有繁體
-        "aio-switch-updater.zip", # 已有繁體
-        "battery_desync_fix.zip", # 無簡體翻譯
-        "SwitchThemesNX.zip", # 不處理，字體問題
-        "PPSSPP.zip", # 已有繁體
-
-        "NX-Activity-Log.zip", # 已有繁體，但需要修正
-        "NX-Mod-Manager.zip",  # 已有繁體，但需要修正
-    ]
-    balck_file = [
-        "Fizeau.nro",
-        "DClight.ovl",
-        "SysDVR.nro",
-    ]
+    saved_dict_url = dict(dict_url)   # 磁碟上的內容，有變更才寫回
+    # 從 GitHub 取得最新 dict_url.json（長駐模式只在第一次建置時取得）
+    if state is None or not state.get("fetched"):
+        try:
+            print("Fetching remote dict_url.json ...")
+            r = requests.get(REMOTE_DICT_U_URL, timeout=10)
+            r.raise_for_status()
+            dict_url_remote = r.json()
+            dict_url.update(dict_url_remote)   # 用遠端更新本地 dict_url
+            print("Loaded remote dict_url.json")
+        except Exception as e:
+            print(f"Failed to fetch remote dict_url.json: {e}")
+        if state is not None:
+            state["fetched"] = True
+    run_metrics.add("setup", time.perf_counter() - run_started)
 
     # ----------------------------
     # 找出內部 URL
     # ----------------------------
-    url_set = set()
+    url_set = {MAIN_ZIP_URL}
     for k in dict_url.keys():
-        if k.startswith("https://dl.awa.cool/hahappify/nro/") and k not in black_url:
+        if k.startswith(tuple(ARCHIVE_URL_PREFIXES)) and k not in BLACK_URL:
             url_set.add(k)
+    # 固定處理順序，讓平行與循序執行的結果一致
+    urls = sorted(url_set)
 
     # ----------------------------
-    # 下載所有 URL 並繁化
+    # 下載有更新的 ZIP
     # ----------------------------
-    for url in url_set:
-        print(f"\n讀取網址: {url}")
-        url_path = url.replace("https://dl.awa.cool/", "")
-        local_path_hans = os.path.join(OUTPUT_DIR_HANS, url_path)
-        ensure_dir(os.path.dirname(local_path_hans))
-
-        etag_file = local_path_hans + ".etag"
-        etag_local = load_etag(etag_file)
-
-        # 判斷是否需要下載
-        need_download = True
-        etag_remote = None
-
-        need_download = False
-        # try:
-        #     head_resp = requests.head(url, timeout=15)
-        #     etag_remote = head_resp.headers.get("ETag")
-        #     if etag_remote:
-        #         etag_remote = etag_remote.strip('"')  # 去掉雙引號
-        #         if etag_remote == etag_local:
-        #             print("無更新，跳過下載")
-        #             time.sleep(30) # 避免過快重複請求
-        #             need_download = False
-        # except Exception as e:
-        #     print(f"HEAD request failed: {e}, will download")
-        
-        # 下載 ZIP
-        if need_download:
-            try:
-                content = download_file(url)
-                # 儲存 ETag
-                if etag_remote:
-                    save_etag(etag_file, etag_remote)
-            except Exception as e:
-                print(f"Download failed: {e}")
-                continue
-            # 保存原始簡體到 Hans
-            with open(local_path_hans, "wb") as f:
-                f.write(content)
-            print(f"Saved original ZIP: {local_path_hans}")
-        else:
-            with open(local_path_hans, "rb") as f:
-                content = f.read()
-
-        # 取得 ZIP 檔案名稱 (例如 DBI.zip)
-        zip_filename = os.path.basename(local_path_hans) 
-
-        # 排除不需處理的 zip
-        if zip_filename in black_zip:
-            # zip 複製到 releases
-            release_zip_path = os.path.join(RELEASES_DIR, url_path) # ./releases/hahappify/nro/DBI.zip
-            ensure_dir(os.path.dirname(release_zip_path))
-            shutil.copy2(local_path_hans, release_zip_path)
-            print(f"✅ 儲存到 {release_zip_path}")
-            continue
-
-        # 設定 temp 資料夾路徑：
-        # 這裡我們先解壓到一個臨時目錄，然後再移動到您指定的結構。
-        temp_extract_dir = os.path.join(TEMP_DIR, zip_filename + "_extract") # 使用一個臨時解壓目錄
-        extract_zip(content, temp_extract_dir)
-
-        # 根據您的新結構，定義最終的 temp 路徑
-        # url_path: hahappify/nro/DBI.zip
-        final_temp_path = os.path.join(TEMP_DIR, url_path + "/")
-        
-        # 將解壓內容移動到 final_temp_path
-        # 假設 ZIP 內容沒有頂層資料夾
-        if os.path.exists(final_temp_path):
-            shutil.rmtree(final_temp_path)
-        shutil.move(temp_extract_dir, final_temp_path) # 將解壓內容移至新結構路徑
-        
-        # 設定後續處理的目錄為 final_temp_path
-        temp_dir_for_processing = final_temp_path
-
-        # 處理每個文字檔
-        for root, _, files in os.walk(temp_dir_for_processing):
-            for f in files:
-                path = os.path.join(root, f)
-                if f.lower() == "zh-hans.json":
-                    continue  # 跳過簡體字典檔
-                try:
-                    with open(path, "r", encoding="utf8") as file:
-                        lines = file.readlines()
-                    new_lines = []
-                    for line in lines:
-                        # 替換 URL
-                        def replace_url(m):
-                            url = m.group(0)
-                            if url not in dict_url:
-                                dict_url[url] = url  # 預設 value 等於原 URL
-                            return dict_url[url]        
-                        line = re.sub(r"https://dl\.awa\.cool/[^\s\"']+", replace_url, line)
-
-                        # 繁化中文
-                        if line_contains_chinese(line):
-                            if line in dict_string:
-                                new_line = dict_string[line]
-                            else:
-                                new_line = zhconvert(line)
-                                dict_string[line] = new_line
-                                time.sleep(1)
-                            new_lines.append(new_line)
-                        else:
-                            new_lines.append(line)
-                    with open(path, "w", encoding="utf8") as file:
-                        file.writelines(new_lines)
-                except:
-                    continue
+    if download:
+        with run_metrics.stage("download"):
+            stats = download_archives(urls, DOWNLOAD_JOBS)
+        run_metrics.add("download", 0, stats["bytes"], calls=0)
 
-        # ----------------------------
-        # 自動翻譯 *.nro / *.ovl
-        # ----------------------------
-        for root, _, files in os.walk(temp_dir_for_processing):
-            for f in files:
-                path = os.path.join(root, f)
-                if path.lower().endswith((".nro", ".ovl")) and f not in balck_file:
-                    print(f"🔄 正在翻譯 {f} ...")
-                    subprocess.run([
-                        "python", "translate_nro.py", path
-                    ], check=True)
-
-        # 保存 dict_url.json
-        if url not in dict_url:
-            dict_url[url] = url
-        save_json(DICT_STRING_FILE, dict_string)
-        save_json(DICT_URL_FILE, dict_url)
-
-        # ----------------------------
-        # 將處理後的檔案從 Temp 複製/移動到 Hant
-        # ----------------------------
-        # hant_folder_path = os.path.join(OUTPUT_DIR_HANT, url_path + "/") # ./Hant/hahappify/nro/DBI.zip/
-        # ensure_dir(os.path.dirname(hant_folder_path))
-        # if os.path.exists(hant_folder_path):
-        #     shutil.rmtree(hant_folder_path) # 先刪除舊的 Hant 資料夾
-        # shutil.copytree(temp_dir_for_processing, hant_folder_path) # 複製到 Hant
-        # print(f"✅ Copied translated files to Hant folder: {hant_folder_path}")
-
-        # ----------------------------
-        # 壓縮回 ZIP (Releases)
-        # ----------------------------
-        # zip_dir(folder_path, zip_path)
-        release_zip_path = os.path.join(RELEASES_DIR, url_path) # ./releases/hahappify/nro/DBI.zip
-        zip_dir(temp_dir_for_processing, release_zip_path) # <--- 從處理後的 temp 資料夾壓縮
-        print(f"📦 儲存到 {release_zip_path}")
+    # ----------------------------
+    # 下載所有 URL 並繁化
+    # ----------------------------
+    manifest = load_json(MANIFEST_FILE)
+    fingerprints = compute_fingerprints(dict_url, cache.spans)
+    index = string_index.StringIndex(INDEX_FILE)
+    with run_metrics.stage("index"):
+        # 上次記錄後修改的字典項目；只影響用到這些項目的檔案
+        pending = index.diff_keys(index_dictionaries(dict_url, cache.spans))
+        plans = {}
+        for url in urls:
+            key = url_path_of(url)
+            plans[url] = {"indexed": index.sources(key),
+                          "clean": index.clean_members(key, fingerprints["code"], pending)}
+    built = {}
+    kinds = {}
+    records = []
+
+    def merge(url, result):
+        # 唯一的合併/寫檔點
+        cache.update(result["spans"])
+        cache.record(result["hits"], result["misses"])
+        dict_url.update(result["urls"])
+        if dict_url != saved_dict_url:
+            save_json(DICT_URL_FILE, dict_url)
+            saved_dict_url.update(dict_url)
+        merge_kinds(kinds, result["kinds"])
+        if result["manifest"] is not None:
+            built[url_path_of(url)] = result["manifest"]
+            index.update_archive(url_path_of(url), result["index"],
+                                 [name for name, _ in flat_members(result["manifest"]["members"])])
+        run_metrics.merge(result["metrics"])
+        records.append(result["metrics"])
+
+    if jobs <= 1:
+        for url in urls:
+            merge(url, process_archive(url, dict(cache.spans), dict(dict_url),
+                                       manifest.get(url_path_of(url)), fingerprints, plans[url]))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [(url, pool.submit(process_archive, url, dict(cache.spans), dict(dict_url),
+                                         manifest.get(url_path_of(url)), fingerprints, plans[url]))
+                       for url in urls]
+            for url, future in futures:
+                merge(url, future.result())
+
+    # 片段快取只會新增本次遇到的片段，已處理的 ZIP 結果不受影響，
+    # 因此以結束時的指紋記錄，下次執行才能判斷為無變更
+    with run_metrics.stage("manifest"):
+        fingerprints = compute_fingerprints(dict_url, cache.spans)
+        for key, entry in built.items():
+            manifest[key] = finalize_manifest_entry(entry, fingerprints)
+        save_json(MANIFEST_FILE, manifest)
+    with run_metrics.stage("index"):
+        generation = index.record_dictionaries(index_dictionaries(dict_url, cache.spans), fingerprints["code"])
+        for key, entry in built.items():
+            index.mark_built(key, [name for name, _ in flat_members(entry["members"])], generation)
+        index.close()
+
+    print(f"\n{cache.report()}")
+    print(format_kinds(kinds))
+    run_record = dict(run_metrics.to_dict(), type="run", jobs=jobs)
+    print(metrics.format_stages(run_record))
+    print(f"統計報告: {metrics.write_report(records + [run_record])}")
 
-        # ----------------------------
-        # 清理臨時資料夾
-        # ----------------------------
-        shutil.rmtree(temp_dir_for_processing)
+# ----------------------------
+# 長駐模式
+# ----------------------------
+def watch(jobs=1, download=False, converter=None, interval=WATCH_INTERVAL):
+    """建置一次後持續監看字典、翻譯庫與 Hans，有變更就在同一個行程內增量重建
+
+    字典包、DictMatcher、本機轉換對照表與片段快取留在記憶體中；檔案雜湊、ZIP 檔案索引
+    與 NRO 字串表放在有上限的 LRU（warm_cache）。重建時只處理來源或用到的字典有變更的檔案。
+    第一次建置依 jobs 平行處理，之後在主行程中循序處理，快取才會留下。
+    """
+    global _warm
+    _warm = warm_cache.WarmCache()
+    state = {}
+    metrics.run_profiled(main, jobs=jobs, download=download, converter=converter, state=state)
+    stamps = warm_cache.scan_stamps(WATCH_PATHS)
+    print(f"\n👀 監看 {', '.join(WATCH_PATHS)}（Ctrl+C 結束）")
+    try:
+        while True:
+            time.sleep(interval)
+            current = warm_cache.scan_stamps(WATCH_PATHS)
+            if current == stamps:
+                continue
+            # 等檔案寫完：連續兩次輪詢結果相同才開始重建
+            while True:
+                time.sleep(interval)
+                again = warm_cache.scan_stamps(WATCH_PATHS)
+                if again == current:
+                    break
+                current = again
+            changed = warm_cache.changed_paths(stamps, current)
+            print(f"\n🔁 偵測到變更: {', '.join(changed[:5])}{' ...' if len(changed) > 5 else ''}")
+            if os.path.normpath(SPAN_CACHE_FILE) in changed:
+                state["cache"] = None   # 片段快取被外部修改，重新讀取
+            started = time.perf_counter()
+            metrics.run_profiled(main, jobs=1, converter=converter, state=state)
+            translate_nro.release_packs()   # 字典變更後重新編譯的字典包，舊的在這裡關閉
+            # 建置本身會寫入 dict_url.json / 片段快取，以建置後的狀態為準
+            stamps = warm_cache.scan_stamps(WATCH_PATHS)
+            print(f"⏱️ 重建耗時 {time.perf_counter() - started:.2f}s；{_warm.report()}")
+    except KeyboardInterrupt:
+        print("\n結束監看")
+    finally:
+        _warm = None
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="繁化 hahappify 外掛 ZIP")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="同時處理的 ZIP 數量（預設 1 = 循序，0 = CPU 核心數）")
+    parser.add_argument("--download", action="store_true",
+                        help="先以條件式 GET 更新 Hans 下的原始 ZIP")
+    parser.add_argument("--converter", choices=offline_converter.MODES,
+                        help="繁化方式：hybrid = 本機優先、沒把握時送繁化姬（預設），"
+                             "offline = 只在本機轉換，remote = 全部送繁化姬")
+    parser.add_argument("--offline", action="store_const", const="offline", dest="converter",
+                        help="同 --converter offline，不連線繁化姬")
+    parser.add_argument("--watch", action="store_true",
+                        help="建置後持續監看 dict、translation 與 Hans，有變更就只重建受影響的檔案")
+    args = parser.parse_args()
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.watch:
+        watch(jobs=jobs, download=args.download, converter=args.converter)
+    else:
+        metrics.run_profiled(main, jobs=jobs, download=args.download, converter=args.converter)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# 翻譯庫：以「原文 + 前後字串的短雜湊」為鍵保存 NRO 的翻譯，不依賴 offset
+#
+# translation/<base>.txt 以絕對 offset 為鍵，上游每次改版 offset 全部移動，翻譯就得重來。
+# 翻譯庫改以內容為鍵，新版本的 NRO 掃描一次、逐一查表就能把舊翻譯對回新位置：
+#   - 原文與上下文都相同          → 直接沿用（hit）
+#   - 上下文變了，但這個原文只有一種譯法 → 沿用並記下新的上下文（moved）
+#   - 上下文變了，且有多種譯法    → 不套用，列為待確認（ambiguous）
+#   - 翻譯庫沒有這個原文          → 新字串（new）
+#
+# 檔案為 translation/<base>.store.json：{"原文": {"上下文雜湊": "譯文", ...}, ...}
+# 只保存與原文不同的譯文。
+#
+# 用法:
+#   python translation_store.py translation/<base>.store.json          # 統計
+#   python translation_store.py translation/<base>.store.json "原文"   # 查詢
+
+import os
+import sys
+import json
+import hashlib
+
+STORE_FOLDER = "./translation"
+STORE_SUFFIX = ".store.json"
+CONTEXT_SIZE = 6   # 上下文雜湊的 bytes 數（hex 後 12 字元）
+
+
+def store_path(base, folder=STORE_FOLDER):
+    return os.path.join(folder, f"{base}{STORE_SUFFIX}")
+
+
+def context_hash(prev_text, next_text):
+    """前一個與後一個字串的短雜湊；檔案開頭 / 結尾以空字串代替"""
+    h = hashlib.blake2b(digest_size=CONTEXT_SIZE)
+    h.update(prev_text.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(next_text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def string_contexts(strings):
+    """{offset: 上下文雜湊}，strings 為 extract_strings_from_bytes 的結果"""
+    offsets = sorted(strings)
+    texts = [strings[offset] for offset in offsets]
+    contexts = {}
+    for i, offset in enumerate(offsets):
+        prev_text = texts[i - 1] if i > 0 else ""
+        next_text = texts[i + 1] if i + 1 < len(texts) else ""
+        contexts[offset] = context_hash(prev_text, next_text)
+    return contexts
+
+
+class TranslationStore:
+    """一個 NRO 的翻譯庫"""
+
+    def __init__(self, path, entries=None):
+        self.path = path
+        self.entries = entries if entries is not None else {}
+        self.contexts = {}   # 最近一次 anchor 的 {offset: 上下文雜湊}
+        self.stats = {"hit": 0, "moved": 0, "ambiguous": 0, "new": 0}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        """讀取翻譯庫；檔案不存在時回傳空的翻譯庫"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = {}
+        return cls(path, entries)
+
+    def save(self):
+        """有變更時寫回（暫存檔後 os.replace）"""
+        if not self.dirty:
+            return False
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp, self.path)
+        self.dirty = False
+        return True
+
+    def __len__(self):
+        return sum(len(contexts) for contexts in self.entries.values())
+
+    def anchor(self, strings, learn=True):
+        """把翻譯庫對到這個版本的字串上
+
+        回傳 (translations, ambiguous, new)：
+        translations 為 {offset: 譯文}，ambiguous / new 為需要人工確認的 offset 清單。
+        learn 時，上下文改變但譯法唯一的字串會記下新的上下文，下次 save() 時寫入；
+        建置流程以 learn=False 呼叫，不修改共用的 entries。
+        """
+        self.contexts = string_contexts(strings)
+        self.stats = dict.fromkeys(self.stats, 0)
+        translations = {}
+        ambiguous = []
+        new = []
+        for offset, ctx in self.contexts.items():
+            text = strings[offset]
+            known = self.entries.get(text)
+            if not known:
+                self.stats["new"] += 1
+                new.append(offset)
+                continue
+            if ctx in known:
+                self.stats["hit"] += 1
+                translations[offset] = known[ctx]
+                continue
+            choices = set(known.values())
+            if len(choices) == 1:
+                self.stats["moved"] += 1
+                translations[offset] = choices.pop()
+                if learn:
+                    known[ctx] = translations[offset]
+                    self.dirty = True
+            else:
+                self.stats["ambiguous"] += 1
+                ambiguous.append(offset)
+        return translations, ambiguous, new
+
+    def index_entries(self):
+        """反向索引用的 {原文: 各上下文譯文的 JSON}"""
+        return {text: json.dumps(contexts, ensure_ascii=False, sort_keys=True)
+                for text, contexts in self.entries.items()}
+
+    def record(self, strings, offset, new_text):
+        """記錄 offset 處字串的譯文（需先 anchor 同一份 strings）；與原文相同時刪除該上下文的譯文"""
+        text = strings[offset]
+        ctx = self.contexts[offset]
+        known = self.entries.get(text, {})
+        if new_text == text:
+            if known.pop(ctx, None) is None:
+                return False
+            if not known:
+                del self.entries[text]
+        else:
+            if known.get(ctx) == new_text:
+                return False
+            known[ctx] = new_text
+            self.entries[text] = known
+        self.dirty = True
+        return True
+
+
+def load_store(base, folder=STORE_FOLDER):
+    return TranslationStore.load(store_path(base, folder))
+
+
+def store_bases(folder=STORE_FOLDER):
+    """有翻譯庫的 NRO 名稱"""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(f[:-len(STORE_SUFFIX)] for f in os.listdir(folder) if f.endswith(STORE_SUFFIX))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python translation_store.py translation/<base>.store.json [原文]")
+        sys.exit(1)
+    store = TranslationStore.load(sys.argv[1])
+    if len(sys.argv) >= 3:
+        for ctx, value in sorted(store.entries.get(sys.argv[2], {}).items()):
+            print(f"{ctx}  {value}")
+    else:
+        print(f"{store.path}: {len(store.entries)} 個原文，{len(store)} 筆譯文")
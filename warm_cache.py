@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# 長駐模式（translate_plugins.py --watch）的記憶體快取與檔案監看
+#
+# 每次重建都要重新計算的結果改放在行程內，下次修改後直接沿用：
+#   - 檔案 sha256（以 mtime + 大小判斷是否過期）
+#   - ZIP 內各檔案的 sha256，不必再解壓整個 ZIP 才知道哪些檔案沒變
+#   - NRO 的字串位置表 (extract_string_spans)
+# 各快取以 LRU 限制總量，長時間處理約 20 個 ZIP 記憶體也不會一直成長。
+# 字典本身由 dict_pack / translate_nro.get_matcher 在行程內共用（同樣以 LRUCache 限制數量），
+# 不在這裡重複保存。
+#
+# 檔案監看以輪詢 os.stat 實作，不需要額外套件。
+
+import os
+import threading
+from collections import OrderedDict
+
+FILE_HASH_ENTRIES = 512               # 檔案 sha256 的筆數上限
+ARCHIVE_INDEX_ENTRIES = 64            # ZIP 檔案索引的數量上限（含內層 ZIP）
+NRO_SPANS_BYTES = 64 * 1024 * 1024    # NRO 字串位置表的總大小上限
+
+
+class LRUCache:
+    """依使用順序淘汰的快取：總權重超過 max_weight 時移除最久未使用的項目（執行緒安全）"""
+
+    def __init__(self, max_weight):
+        self.max_weight = max_weight
+        self.weight = 0
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self.items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, weight=1):
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.weight -= old[1]
+            if weight > self.max_weight:
+                return
+            self.items[key] = (value, weight)
+            self.weight += weight
+            while self.weight > self.max_weight:
+                _, (_, evicted) = self.items.popitem(last=False)
+                self.weight -= evicted
+
+    def pop(self, key):
+        with self.lock:
+            item = self.items.pop(key, None)
+            if item is None:
+                return None
+            self.weight -= item[1]
+            return item[0]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.weight = 0
+
+    def snapshot(self):
+        """目前的 [(key, value)]，不影響使用順序與命中統計"""
+        with self.lock:
+            return [(key, item[0]) for key, item in self.items.items()]
+
+    def __len__(self):
+        return len(self.items)
+
+    def report(self):
+        total = self.hits + self.misses
+        return f"{len(self.items)} 筆，命中 {self.hits}/{total}"
+
+
+class WarmCache:
+    """translate_plugins 在長駐模式下使用的快取"""
+
+    def __init__(self, file_hashes=FILE_HASH_ENTRIES, archives=ARCHIVE_INDEX_ENTRIES,
+                 nro_spans=NRO_SPANS_BYTES):
+        self.file_hashes = LRUCache(file_hashes)   # 路徑 → ((mtime_ns, 大小), sha256)
+        self.archives = LRUCache(archives)         # ZIP 的 sha256 → {檔名: sha256}
+        self.nro_spans = LRUCache(nro_spans)       # NRO 的 sha256 → (offsets, sizes)
+
+    def file_hash(self, path, compute):
+        """compute(path) 的結果，檔案的 mtime 與大小沒變時沿用"""
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self.file_hashes.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        value = compute(path)
+        self.file_hashes.put(path, (stamp, value))
+        return value
+
+    def member_source(self, archive, name):
+        """archive（ZIP 的 sha256）內 name 的 sha256；沒有記錄時回傳 None"""
+        if archive is None:
+            return None
+        members = self.archives.get(archive)
+        return members.get(name) if members is not None else None
+
+    def record_members(self, archive, members):
+        """記錄 ZIP 內各檔案的 sha256（manifest 的 members）"""
+        if archive is not None:
+            self.archives.put(archive, {name: member["source"] for name, member in members.items()})
+
+    def spans(self, source, content, compute):
+        """NRO 的字串位置表，以檔案內容的 sha256 為鍵"""
+        spans = self.nro_spans.get(source)
+        if spans is None:
+            spans = compute(content)
+            # 沒有 NumPy 時是 array.array（沒有 .nbytes），兩者都支援 memoryview
+            self.nro_spans.put(source, spans, memoryview(spans[0]).nbytes + memoryview(spans[1]).nbytes)
+        return spans
+
+    def report(self):
+        return (f"快取: 檔案雜湊 {self.file_hashes.report()}，ZIP 索引 {self.archives.report()}，"
+                f"NRO 字串表 {self.nro_spans.report()}（{self.nro_spans.weight / 1e6:.1f} MB）")
+
+
+def scan_stamps(paths, skip_hidden=True):
+    """{檔案路徑: (mtime_ns, 大小)}；目錄遞迴列出，略過 . 開頭的項目（例如 dict/.cache）"""
+    stamps = {}
+    for path in paths:
+        if os.path.isfile(path):
+            st = os.stat(path)
+            stamps[os.path.normpath(path)] = (st.st_mtime_ns, st.st_size)
+            continue
+        for root, dirs, files in os.walk(path):
+            if skip_hidden:
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for f in files:
+                if skip_hidden and f.startswith("."):
+                    continue
+                full = os.path.join(root, f)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue   # 列出後被刪除
+                stamps[os.path.normpath(full)] = (st.st_mtime_ns, st.st_size)
+    return stamps
+
+
+def changed_paths(old, new):
+    """新增、刪除或修改的檔案"""
+    return sorted(path for path in old.keys() | new.keys() if old.get(path) != new.get(path))
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# 繁化姬 (api.zhconvert.org) 用戶端：批次、快取、連線池、限速、asyncio
+
+import os
+import re
+import json
+import time
+import asyncio
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ----------------------------
+# 配置
+# ----------------------------
+API_URL = os.environ.get("ZHCONVERT_URL", "https://api.zhconvert.org/convert")
+USER_AGENT = "SwitchScriptTW_Bot/1.0 (+https://github.com/david082321)"
+
+# 詞語模組
+MODULES = '{"Computer":1,"Smooth":1,"Unit":1,"ProperNoun":1,"QuotationMark":1,"InternetSlang":1,"Repeat":1,"RepeatAutoFix":1,"GanToZuo":0}'
+# 保護字詞
+USER_PROTECT_REPLACE = "用戶"
+# 轉換前替換
+USER_PRE_REPLACE = "插件=外掛"
+# 轉換後替換
+USER_POST_REPLACE = "獲取=取得\n添加=新增\n下劃線=底線\n相冊=相簿"
+
+# 批次分隔符：純 ASCII，繁化姬不會轉換；前後換行避免與內文黏在一起
+SEPARATOR = "\n@@ZHSEP{}@@\n"
+SEPARATOR_PATTERN = re.compile(r"\n@@ZHSEP(\d+)@@\n")
+
+BATCH_MAX_CHARS = 20000   # 單次請求最多字元數
+BATCH_MAX_ITEMS = 500     # 單次請求最多行數
+
+
+class ZhConvertError(Exception):
+    """繁化姬回傳錯誤或無法連線"""
+
+
+# ----------------------------
+# 限速
+# ----------------------------
+class TokenBucket:
+    """Token bucket 限速器（執行緒安全）
+
+    rate 為每秒補充的 token 數，capacity 為可累積的上限（允許短暫爆發）。
+    """
+
+    def __init__(self, rate=1.0, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """取得 token，不足時等待；回傳等待秒數"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+# ----------------------------
+# 用戶端
+# ----------------------------
+class ZhConvertClient:
+    """繁化姬用戶端
+
+    - 多行合併成一次請求，以 SEPARATOR 分隔後再切回來；
+      回應切割失敗時自動對半拆開重送，最後退回單行請求
+    - 共用 requests.Session（連線池）
+    - TokenBucket 限速，取代固定 sleep
+    - 記憶體快取，同一行程內相同文字只送一次
+    """
+
+    def __init__(self, url=API_URL, lang="Taiwan", rate=1.0, burst=2,
+                 timeout=30, retries=3, pool_size=8,
+                 max_chars=BATCH_MAX_CHARS, max_items=BATCH_MAX_ITEMS):
+        self.url = url
+        self.lang = lang
+        self.timeout = timeout
+        self.retries = retries
+        self.max_chars = max_chars
+        self.max_items = max_items
+        self.limiter = TokenBucket(rate, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.cache = {}
+        self.stats = {"requests": 0, "texts": 0, "cache_hits": 0, "errors": 0, "wait": 0.0}
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    # ---- 單次請求 ----
+    def _post(self, text):
+        args = {
+            "text": text,
+            "converter": self.lang,
+            "modules": MODULES,
+            "userPreReplace": USER_PRE_REPLACE,
+            "userPostReplace": USER_POST_REPLACE,
+            "userProtectReplace": USER_PROTECT_REPLACE,
+        }
+        last_error = None
+        for attempt in range(self.retries):
+            waited = self.limiter.acquire()
+            with self.lock:
+                self.stats["requests"] += 1
+                self.stats["wait"] += waited
+            try:
+                response = self.session.post(self.url, data=args, timeout=self.timeout)
+                response.raise_for_status()
+                result = json.loads(response.content.decode("utf8"))
+                if result.get("code") == 0:
+                    return result["data"]["text"]
+                last_error = ZhConvertError(f"code {result.get('code')}: {result.get('msg')}")
+            except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+                last_error = ZhConvertError(str(e))
+            with self.lock:
+                self.stats["errors"] += 1
+            if attempt + 1 < self.retries:
+                time.sleep(min(2 ** attempt, 10))
+        raise last_error
+
+    def _convert_batch(self, texts):
+        """轉換一批文字，回傳等長 list"""
+        if len(texts) == 1:
+            return [self._post(texts[0])]
+        payload = "".join(text + SEPARATOR.format(i) for i, text in enumerate(texts))
+        converted = self._post(payload)
+        parts = SEPARATOR_PATTERN.split(converted)
+        # split 結果: [t0, "0", t1, "1", ..., tn-1, "n-1", ""]
+        pieces = parts[0::2]
+        indexes = parts[1::2]
+        if (len(indexes) == len(texts) and pieces[-1] == ""
+                and indexes == [str(i) for i in range(len(texts))]):
+            return pieces[:-1]
+        # 分隔符被改動 → 對半拆開重送
+        mid = len(texts) // 2
+        return self._convert_batch(texts[:mid]) + self._convert_batch(texts[mid:])
+
+    def _batches(self, texts):
+        batch, size = [], 0
+        for text in texts:
+            if batch and (len(batch) >= self.max_items or size + len(text) > self.max_chars):
+                yield batch
+                batch, size = [], 0
+            batch.append(text)
+            size += len(text) + len(SEPARATOR)
+        if batch:
+            yield batch
+
+    def _pending(self, texts):
+        """回傳尚未快取的不重複文字"""
+        pending = []
+        seen = set()
+        for text in texts:
+            if text in self.cache:
+                self.stats["cache_hits"] += 1
+            elif text not in seen:
+                seen.add(text)
+                pending.append(text)
+        self.stats["texts"] += len(pending)
+        return pending
+
+    def _store(self, batch, results):
+        with self.lock:
+            for text, result in zip(batch, results):
+                self.cache[text] = result
+
+    # ---- 公開介面 ----
+    def convert(self, text):
+        return self.convert_many([text])[0]
+
+    def convert_many(self, texts):
+        """轉換多段文字（依順序回傳）；任何批次失敗時拋出 ZhConvertError"""
+        texts = list(texts)
+        for batch in self._batches(self._pending(texts)):
+            self._store(batch, self._convert_batch(batch))
+        return [self.cache[text] for text in texts]
+
+    async def convert_many_async(self, texts, concurrency=4):
+        """與 convert_many 相同，但以最多 concurrency 個請求同時進行"""
+        texts = list(texts)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(batch):
+            async with semaphore:
+                results = await asyncio.to_thread(self._convert_batch, batch)
+            self._store(batch, results)
+
+        await asyncio.gather(*(run(batch) for batch in self._batches(self._pending(texts))))
+        return [self.cache[text] for text in texts]
+
+
+_clients = {}
+
+
+def get_client(lang="Taiwan"):
+    """每個行程、每種轉換器共用一個用戶端"""
+    if lang not in _clients:
+        _clients[lang] = ZhConvertClient(lang=lang)
+    return _clients[lang]
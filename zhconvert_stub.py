@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# 離線測試用：模擬 api.zhconvert.org/convert 的本機伺服器
+#
+# 用法:
+#   python zhconvert_stub.py --port 8765 --latency 0.2 --error-rate 0.1
+#   ZHCONVERT_URL=http://127.0.0.1:8765/convert python translate_plugins.py
+
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 少量常用簡→繁對照，足以驗證流程
+CHAR_TABLE = str.maketrans(
+    "设语网载装错误认戏显择个输时间关闭开启动态帧率电这为发现统连线档数据库页录图标应实战热键颜色简体繁复",
+    "設語網載裝錯誤認戲顯擇個輸時間關閉開啟動態幀率電這為發現統連線檔數據庫頁錄圖標應實戰熱鍵顏色簡體繁復",
+)
+
+
+def parse_rules(text):
+    rules = []
+    for line in text.splitlines():
+        if "=" in line:
+            old, new = line.split("=", 1)
+            rules.append((old, new))
+    return rules
+
+
+def fake_convert(text, pre="", post="", protect=""):
+    """模擬繁化姬：轉換前替換 → 逐字轉換（保護字詞不變）→ 轉換後替換"""
+    for old, new in parse_rules(pre):
+        text = text.replace(old, new)
+    protected = [w for w in protect.splitlines() if w]
+    for i, word in enumerate(protected):
+        text = text.replace(word, f"\x00{i}\x00")
+    text = text.translate(CHAR_TABLE)
+    for i, word in enumerate(protected):
+        text = text.replace(f"\x00{i}\x00", word)
+    for old, new in parse_rules(post):
+        text = text.replace(old, new)
+    return text
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "zhconvert-stub/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf8"), keep_blank_values=True)
+        args = {k: v[0] for k, v in form.items()}
+        with server.lock:
+            server.stats["requests"] += 1
+            server.stats["chars"] += len(args.get("text", ""))
+        if server.latency:
+            time.sleep(server.latency)
+        roll = server.rng.random()
+        if roll < server.http_error_rate:
+            with server.lock:
+                server.stats["errors"] += 1
+            self._reply(500, {"code": 500, "msg": "stub http error"})
+            return
+        if roll < server.http_error_rate + server.error_rate:
+            with server.lock:
+                server.stats["errors"] += 1
+            self._reply(200, {"code": 1, "msg": "stub api error", "data": None})
+            return
+        if "text" not in args:
+            self._reply(200, {"code": 2, "msg": "missing text", "data": None})
+            return
+        text = fake_convert(
+            args["text"],
+            args.get("userPreReplace", ""),
+            args.get("userPostReplace", ""),
+            args.get("userProtectReplace", ""),
+        )
+        self._reply(200, {"code": 0, "msg": "", "data": {"converter": args.get("converter"), "text": text}})
+
+
+def start_stub_server(port=0, latency=0.0, error_rate=0.0, http_error_rate=0.0, seed=0):
+    """在背景執行緒啟動伺服器，回傳 (server, convert_url)；用畢呼叫 server.shutdown()"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.http_error_rate = http_error_rate
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.stats = {"requests": 0, "chars": 0, "errors": 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}/convert"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="api.zhconvert.org 離線替身")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求延遲秒數")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="回傳 code != 0 的比例")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="回傳 HTTP 500 的比例")
+    args = parser.parse_args()
+    server, url = start_stub_server(args.port, args.latency, args.error_rate, args.http_error_rate)
+    print(f"zhconvert stub: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()